@@ -0,0 +1,1120 @@
+'''Модель расстановки ТВЭЛ в узлах правильной треугольной решетки: хранение, преобразование координат,
+геометрические запросы, журнал отмены, чтение и запись файлов. Модуль не зависит от tkinter,
+ошибки сообщаются исключениями ArrangeError (ArrangeFileError - формат файла, ArrangeDataError - параметры расстановки).
+Чтение и запись файлов принимают необязательную функцию progress(сделано, всего, единица), единица - 'bytes' или 'lines';
+исключение ArrangeCancelled из progress прерывает операцию без недописанных файлов.
+Расстановка хранится в файле в текстовом виде в формате:
+1 строка: радиус ТВЭЛ, шаг решетки, внутренний радиус, внешний радиус [, смещение центра (x, y), угол поворота (град) [, mirror - признак отражения] ]
+2 и далее: столбец, ряд, тип ТВЭЛ
+далее для каждого слоя пометок: строка [имя слоя], затем строки: столбец, ряд
+или в двоичном виде (расширение .tvb): заголовок с параметрами расстановки, упакованные массивы столбцов, рядов и типов
+и для каждого слоя пометок - битовая маска по порядку ТВЭЛ в файле
+Координаты хранятся в отдельных файлax для каждого типа твэл и каждого слоя пометок в текстовом виде в формате x,y
+'''
+import math
+import re
+import time
+import numpy as np
+from pathlib import *
+import shutil
+import struct
+from collections import deque
+from itertools import chain, compress, islice
+import os
+import copy
+
+
+#Системные параметры
+COS_60 = 0.5
+SIN_60 = (3**0.5)/2
+OUTPUT_FORMAT = "{:.4f},{:.4f}\n"  # формат сохранения координат
+F_EXT = "tve"
+BIN_EXT = "tvb"  # двоичный формат расстановки
+BIN_MAGIC = b'R360TVB\x00'
+BIN_VERSION = 2
+# заголовок двоичного файла: сигнатура, версия, флаги, радиус ТВЭЛ, шаг, внутренний и внешний радиус, смещение центра (x, y),
+# угол поворота, число ТВЭЛ, число слоев пометок (в версии 1 - число помеченных ТВЭЛ);
+# далее массивы: столбцы, ряды (int32), [версия 1: столбцы и ряды помеченных (int32)], типы (uint16);
+# версия 2: для каждого слоя длина имени (uint16), имя (UTF-8) и битовая маска ТВЭЛ слоя (np.packbits, по порядку ТВЭЛ в файле)
+BIN_HEADER = struct.Struct('<8sII7dQQ')
+BIN_NAME = struct.Struct('<H')
+BIN_MIRROR = 1 # бит поля flags заголовка: расстановка зеркально отражена
+TEXT_MIRROR = 'mirror'  # признак отражения в первой строке текстового файла: нечисловое поле, старые версии отвергают такой файл, а не читают неверно
+HISTORY_BUDGET = 64 * 2**20  # объем журнала отмены по умолчанию, байт (настройка history_budget_mb в ini файле)
+SPATIAL_CELL = 16  # размер ячейки пространственного индекса в узлах решетки (степень 2)
+IO_CHUNK = 4 * 2**20  # размер блока чтения файла, байт (шаг сообщений о ходе чтения)
+IO_LINES = 65536  # число строк текстового файла, записываемых за один шаг
+DEFAULT_LAYER = 'mrkd'  # слой пометок по умолчанию (прежние пометки), имя совпадает с расширением его файла координат
+
+def data_consistency(r_tvel, step, r_in, r_out):
+    return (r_tvel>0 and step>=2*r_tvel and r_in>=0 and r_out>r_in) 
+
+def radius(x,y): return (x*x+y*y)**0.5
+
+def coord_dir(filename):
+    # директория для файлов координат: рядом с файлом расстановки, имя - имя файла без расширения
+    newdir = filename.split('/')[-1].replace("." + F_EXT, '' ).replace("." + BIN_EXT, '' )
+    return Path(filename).parent / newdir, newdir
+
+def write_coord_file(filename, coords):
+    # координаты (N,2) форматируются целиком и записываются одной операцией
+    with open(filename, 'w') as f:
+        f.write("".join(map(OUTPUT_FORMAT.format, coords[:, 0].tolist(), coords[:, 1].tolist()))) # x, y
+
+def read_file(filename, progress=None):
+    # чтение файла блоками IO_CHUNK с сообщением о ходе после каждого блока
+    data = bytearray()
+    with open(filename, 'rb') as f:
+        total = os.fstat(f.fileno()).st_size
+        while chunk := f.read(IO_CHUNK):
+            data += chunk
+            if progress:
+                progress(len(data), total, 'bytes')
+    return data
+
+def write_lines(f, lines, count, progress, done, total):
+    # запись count строк из итератора lines шагами по IO_LINES строк, возвращает число записанных строк с учетом done
+    for start in range(0, count, IO_LINES):
+        f.write("".join(islice(lines, IO_LINES)))
+        if progress:
+            progress(done + min(start + IO_LINES, count), total, 'lines')
+    return done + count
+
+def replace_dir(source, target):
+    # замена директории target на source: старая директория переименовывается и удаляется только после успешной подмены
+    backup = target.with_name(target.name + ".old{}".format(os.getpid()))
+    if target.exists():
+        shutil.rmtree(backup, ignore_errors =True)
+        target.rename(backup)
+    try:
+        source.rename(target)
+    except:
+        if backup.exists():
+            backup.rename(target)
+        raise
+    shutil.rmtree(backup, ignore_errors =True)
+
+def check_layer(name):
+    # имя слоя - расширение его файла координат: буквы, цифры и _, кроме имен файлов координат типов ТВЭЛ
+    if not re.fullmatch(r'\w+', name) or re.fullmatch(F_EXT + r'\d+', name):
+        raise ArrangeDataError("Недопустимое имя слоя пометок: {} (допускаются буквы, цифры и _)".format(name))
+    return name
+
+def pack_indices(i, j):
+    # столбец и ряд упаковываются в один ключ int64 для векторных операций над множествами позиций
+    return (i << 32) | (j & 0xffffffff)
+
+class History():
+    '''Журнал отмены и повтора изменений расстановки. Записи хранят только изменения:
+    ('site', i, j, тип до, тип после, слои до, слои после) - одна позиция (тип None - пусто, слои - кортежи имен слоев пометок позиции),
+    ('bulk', позиции int32 (N,2), типы до uint16 (N), тип после (один или массив), пометки до, пометки после) - пакетная операция
+    (тип 0 - пусто, пометки - словари {слой: массив bool или значение для всех позиций} или None, если не менялись),
+    ('param', значения до, значения после) - параметры преобразования, ('reflect',) - зеркальное отражение.
+    Суммарный объем записей ограничен budget байт, при превышении удаляются самые старые'''
+    ENTRY_SIZE = 128 # оценка объема записи без массивов, байт
+
+    def __init__(self, budget=HISTORY_BUDGET):
+        self.budget = budget
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.size = 0
+
+    def get_size(self, entry):
+        arrays = chain(entry, *(item.values() for item in entry if isinstance(item, dict)))
+        return self.ENTRY_SIZE + sum(item.nbytes for item in arrays if isinstance(item, np.ndarray))
+
+    def record(self, entry):
+        self.size -= sum(self.get_size(item) for item in self.redo_stack)
+        self.redo_stack.clear()
+        self.undo_stack.append(entry)
+        self.size += self.get_size(entry)
+        while self.size > self.budget and len(self.undo_stack) > 1:
+            self.size -= self.get_size(self.undo_stack.popleft())
+
+    def undo(self, arrange):
+        return self.move(arrange, self.undo_stack, self.redo_stack, False)
+
+    def redo(self, arrange):
+        return self.move(arrange, self.redo_stack, self.undo_stack, True)
+
+    def move(self, arrange, source, target, forward):
+        # возвращает список измененных позиций или None, если изменилась геометрия и нужна полная перерисовка
+        if not source:
+            return []
+        entry = source.pop()
+        target.append(entry)
+        arrange.history = None # изменения при отмене/повторе в журнал не записываются
+        try:
+            return self.apply(arrange, entry, forward)
+        finally:
+            arrange.history = self
+
+    def apply(self, arrange, entry, forward):
+        kind = entry[0]
+        if kind == 'param':
+            arrange.set_params(**entry[2 if forward else 1])
+            return None
+        if kind == 'reflect':
+            arrange.reflect()
+            return None
+        if kind == 'site':
+            i, j = entry[1:3]
+            type, marks = (entry[4], entry[6]) if forward else (entry[3], entry[5])
+            if type is None:
+                arrange.pop(i, j)
+            else:
+                arrange.add(i, j, type)
+                current = arrange.get_marks(i, j)
+                for name in current:
+                    if name not in marks:
+                        arrange.unmark(i, j, name)
+                for name in marks:
+                    if name not in current:
+                        arrange.mark(i, j, name)
+            return [(i, j)]
+        indices = entry[1].astype(np.int64)
+        types = np.broadcast_to(entry[3] if forward else entry[2], len(indices))
+        marks = entry[5] if forward else entry[4]
+        for type in np.unique(types).tolist():
+            if type == 0:
+                arrange.pop_many(indices[types == 0])
+            else:
+                arrange.add_many(indices[types == type], type)
+        for name, values in (marks or {}).items():
+            values = np.broadcast_to(values, len(indices))
+            arrange.mark_many(indices[values], True, name)
+            arrange.mark_many(indices[~values], False, name)
+        return list(zip(indices[:, 0].tolist(), indices[:, 1].tolist()))
+
+class SpatialIndex():
+    '''Пространственный индекс позиций ТВЭЛ: равномерная сетка ячеек SPATIAL_CELL x SPATIAL_CELL узлов решетки.
+    Ячейки задаются в индексах решетки и не зависят от поворота, смещения и отражения - запрос переводится
+    в координаты решетки до поворота (как в get_index), где расстояния те же, и проверяются только ячейки,
+    которые могут содержать ответ. Максимальный радиус кэшируется и обновляется при добавлении позиций,
+    при удалении крайней позиции пересчитывается по ячейкам в порядке убывания их дальней границы'''
+    SHIFT = SPATIAL_CELL.bit_length() - 1
+
+    def __init__(self):
+        self.cells = {} # (столбец >> SHIFT, ряд >> SHIFT) -> множество позиций
+        self._max = None # (ключ преобразования, максимальный радиус, позиция)
+
+    def add(self, arrange, items, indices=None):
+        # позиции группируются по ячейкам сортировкой, каждая ячейка пополняется одним вызовом, indices - те же позиции массивом
+        indices = arrange.get_index_array(items) if indices is None else indices
+        cells = indices >> self.SHIFT
+        order = np.lexsort((cells[:, 1], cells[:, 0]))
+        cells = cells[order]
+        bounds = np.flatnonzero((np.diff(cells, axis=0) != 0).any(axis=1)) + 1
+        ordered = [items[k] for k in order.tolist()]
+        for start, stop, key in zip([0, *bounds.tolist()], [*bounds.tolist(), len(items)], cells[[0, *bounds.tolist()]].tolist() if len(items) else []):
+            self.cells.setdefault(tuple(key), set()).update(ordered[start:stop])
+        if self._max is not None and self._max[0] == arrange.get_transform()[0] and items:
+            coords = arrange.get_coords(indices)
+            r = np.hypot(coords[:, 0], coords[:, 1])
+            k = int(r.argmax())
+            if r[k] > self._max[1]:
+                self._max = (self._max[0], float(r[k]), items[k])
+
+    def remove(self, items):
+        for item in items:
+            key = (item[0] >> self.SHIFT, item[1] >> self.SHIFT)
+            cell = self.cells[key]
+            cell.discard(item)
+            if not cell:
+                del self.cells[key]
+            if self._max is not None and item == self._max[2]:
+                self._max = None
+
+    def get_radii(self, arrange, items, x=0, y=0):
+        coords = arrange.get_coords(arrange.get_index_array(items))
+        return np.hypot(coords[:, 0] - x, coords[:, 1] - y)
+
+    def get_bounds(self, arrange, x, y):
+        # ключи ячеек (K,2), наименьшее и наибольшее расстояния от точки (x, y) до ячеек (с запасом в шаг решетки)
+        (step, px, py, _, sx), cos_a, sin_a = arrange.get_transform()
+        lx = x * cos_a + y * sin_a - px
+        ly = - x * sin_a + y * cos_a - py
+        keys = np.array(list(self.cells), dtype=np.int64).reshape(-1, 2)
+        i0, j0 = keys[:, 0] * SPATIAL_CELL, keys[:, 1] * SPATIAL_CELL
+        xa, xb = sx * i0 * step * SIN_60, sx * (i0 + SPATIAL_CELL - 1) * step * SIN_60
+        xlo, xhi = np.minimum(xa, xb) - step, np.maximum(xa, xb) + step
+        ylo, yhi = (j0 - 1) * step, (j0 + SPATIAL_CELL + 1) * step
+        near = np.hypot(np.maximum(np.maximum(xlo - lx, lx - xhi), 0), np.maximum(np.maximum(ylo - ly, ly - yhi), 0))
+        far = np.hypot(np.maximum(np.abs(lx - xlo), np.abs(lx - xhi)), np.maximum(np.abs(ly - ylo), np.abs(ly - yhi)))
+        return keys, near, far
+
+    def collect(self, keys):
+        return [item for key in keys.tolist() for item in self.cells[tuple(key)]]
+
+    def annulus(self, arrange, r1, r2, x=0, y=0):
+        # позиции на расстоянии от r1 до r2 от точки (x, y), при r1 = 0 - круг
+        keys, near, far = self.get_bounds(arrange, x, y)
+        items = self.collect(keys[(near <= r2) & (far >= r1)])
+        r = self.get_radii(arrange, items, x, y)
+        return arrange.get_index_array(items)[(r >= r1) & (r <= r2)]
+
+    def nearest(self, arrange, x, y, k=1):
+        # k ближайших к точке (x, y) позиций в порядке возрастания расстояния
+        keys, near, _ = self.get_bounds(arrange, x, y)
+        order = np.argsort(near, kind='stable')
+        sizes = np.cumsum([len(self.cells[key]) for key in map(tuple, keys[order].tolist())])
+        if not len(sizes) or k <= 0:
+            return np.empty((0, 2), dtype=np.int64)
+        # сначала ячейки, заведомо содержащие k позиций, затем все ячейки ближе найденного k-го расстояния
+        first = self.collect(keys[order[:np.searchsorted(sizes, min(k, sizes[-1])) + 1]])
+        bound = np.sort(self.get_radii(arrange, first, x, y))[min(k, len(first)) - 1]
+        items = self.collect(keys[near <= bound])
+        r = self.get_radii(arrange, items, x, y)
+        best = np.argsort(r, kind='stable')[:k]
+        return arrange.get_index_array(items)[best]
+
+    def max_radius(self, arrange):
+        # наибольшее расстояние от начала координат до центра ТВЭЛ
+        key = arrange.get_transform()[0]
+        if self._max is None or self._max[0] != key:
+            self._max = (key, 0.0, None)
+            keys, _, far = self.get_bounds(arrange, 0, 0)
+            for n in np.argsort(-far, kind='stable').tolist():
+                if far[n] < self._max[1]:
+                    break
+                items = list(self.cells[tuple(keys[n].tolist())])
+                r = self.get_radii(arrange, items)
+                k = int(r.argmax())
+                if r[k] > self._max[1]:
+                    self._max = (key, float(r[k]), items[k])
+        return self._max[1]
+
+class MarkLayers():
+    '''Именованные слои пометок ТВЭЛ (например, ТВЭЛ с датчиками, с выгорающим поглотителем, намеченные к осмотру).
+    Помеченной позиции выделяется ячейка, слой - массив bool по ячейкам, так что объединение, пересечение
+    и подсчет пометок - векторные операции над массивами. При удалении ТВЭЛ ячейка освобождается вместе со всеми пометками'''
+    def __init__(self):
+        self.slots = {} # (i, j) -> ячейка
+        self.sites = np.empty((0, 2), dtype=np.int64) # ячейка -> позиция
+        self.free = [] # свободные ячейки
+        self.masks = {} # имя слоя -> массив bool по ячейкам, в порядке создания слоев
+
+    def copy(self):
+        tmp = MarkLayers()
+        tmp.slots, tmp.sites, tmp.free = dict(self.slots), self.sites.copy(), list(self.free)
+        tmp.masks = {name: mask.copy() for name, mask in self.masks.items()}
+        return tmp
+
+    def add(self, name):
+        self.masks.setdefault(name, np.zeros(len(self.sites), dtype=bool))
+
+    def allocate(self, items):
+        # ячейки позиций, новым позициям выделяются свободные, при нехватке массивы удваиваются
+        new = [item for item in dict.fromkeys(items) if item not in self.slots]
+        if len(new) > len(self.free):
+            size = max(2 * len(self.sites), len(self.sites) + len(new) - len(self.free), 64)
+            self.free.extend(range(size - 1, len(self.sites) - 1, -1))
+            grow = size - len(self.sites)
+            self.sites = np.concatenate((self.sites, np.zeros((grow, 2), dtype=np.int64)))
+            for name in self.masks:
+                self.masks[name] = np.concatenate((self.masks[name], np.zeros(grow, dtype=bool)))
+        slots = [self.free.pop() for _ in new]
+        self.slots.update(zip(new, slots))
+        if new:
+            self.sites[slots] = new
+        return np.fromiter((self.slots[item] for item in items), dtype=np.int64, count=len(items))
+
+    def find(self, items):
+        # ячейки позиций, -1 - позиция не помечена ни в одном слое
+        return np.fromiter((self.slots.get(item, -1) for item in items), dtype=np.int64, count=len(items))
+
+    def get(self, name, items):
+        # принадлежность позиций слою, массив bool
+        slots = self.find(items)
+        if name not in self.masks or not len(self.sites):
+            return np.zeros(len(items), dtype=bool)
+        return (slots >= 0) & self.masks[name][np.maximum(slots, 0)]
+
+    def set(self, name, items, state):
+        self.add(name)
+        if state:
+            slots = self.allocate(items)
+        else:
+            slots = self.find(items)
+            slots = slots[slots >= 0]
+        self.masks[name][slots] = state
+
+    def release(self, items):
+        # снятие всех пометок удаленных позиций
+        slots = [self.slots.pop(item) for item in items if item in self.slots]
+        if slots:
+            for mask in self.masks.values():
+                mask[slots] = False
+            self.free.extend(slots)
+
+    def get_names(self, item):
+        slot = self.slots.get(item)
+        return () if slot is None else tuple(name for name, mask in self.masks.items() if mask[slot])
+
+    def combine(self, names, how='any'):
+        # маска ячеек, помеченных хотя бы в одном (how='any') или во всех (how='all') слоях names
+        masks = [self.masks[name] for name in names if name in self.masks]
+        if not masks or (how == 'all' and len(masks) < len(names)):
+            return np.zeros(len(self.sites), dtype=bool)
+        return np.logical_or.reduce(masks) if how == 'any' else np.logical_and.reduce(masks)
+
+class Comparison():
+    '''Отличия расстановки от эталонной (reference), хранимые множествами позиций: added {позиция: тип},
+    removed {позиция: тип}, retyped {позиция: (тип до, тип после)}. Полный расчет (Arrange.diff) выполняется
+    при создании и в reset, после правок пересчитываются только затронутые позиции (update).
+    Отличия зависят только от позиций (столбец, ряд), поэтому преобразования расстановки их не меняют'''
+    def __init__(self, reference, arrange):
+        self.reference = reference
+        self.reset(arrange)
+
+    def reset(self, arrange):
+        diff = self.reference.diff(arrange)
+        self.added = dict(zip(map(tuple, diff['added'].tolist()), diff['added_types'].tolist()))
+        self.removed = dict(zip(map(tuple, diff['removed'].tolist()), diff['removed_types'].tolist()))
+        self.retyped = dict(zip(map(tuple, diff['retyped'].tolist()), zip(diff['old_types'].tolist(), diff['new_types'].tolist())))
+        self.types = diff['types']
+
+    def update(self, arrange, items):
+        for item in items:
+            for sites in (self.added, self.removed, self.retyped):
+                sites.pop(item, None)
+            old, new = self.reference.get_tvel(*item), arrange.get_tvel(*item)
+            if old is None and new is not None:
+                self.added[item] = new
+            elif new is None and old is not None:
+                self.removed[item] = old
+            elif old != new:
+                self.retyped[item] = (old, new)
+        before, after = self.reference.get_stats()['types'], arrange.get_stats()['types']
+        self.types = {key: (before.get(key, 0), after.get(key, 0)) for key in sorted(before.keys() | after.keys())}
+
+    def get(self):
+        # отличия в том же виде, что и результат Arrange.diff
+        def sites(items):
+            return np.array(list(items), dtype=np.int64).reshape(-1, 2)
+        def types(values):
+            return np.array(list(values), dtype=np.int64).reshape(-1)
+        retyped = types(chain.from_iterable(self.retyped.values())).reshape(-1, 2)
+        return {'added': sites(self.added), 'added_types': types(self.added.values()),
+                'removed': sites(self.removed), 'removed_types': types(self.removed.values()),
+                'retyped': sites(self.retyped), 'old_types': retyped[:, 0], 'new_types': retyped[:, 1], 'types': self.types}
+
+class ArrangeError(Exception):
+    '''Базовое исключение модели расстановки'''
+
+class ArrangeDataError(ArrangeError, ValueError):
+    '''Несогласованные параметры расстановки'''
+
+class ArrangeCancelled(ArrangeError):
+    '''Операция с файлом прервана (исключение из функции progress)'''
+
+class ArrangeFileError(ArrangeError):
+    '''Ошибка формата файла расстановки. problems - список (номер строки, строка, причина),
+    arrange - расстановка, прочитанная без ошибочных строк (None, если файл прочитать нельзя)'''
+    def __init__(self, message, problems=(), arrange=None):
+        super().__init__(message)
+        self.problems = list(problems)
+        self.arrange = arrange
+
+class Arrange():
+    def __init__(self, r_tvel=0, step=0, r_in=0, r_out=0):
+        self.tvel = {} # структура словарь: Ключ - тип ТВЭЛ, значения - позиции ТВЭЛ (dict как упорядоченное множество, сохраняет порядок добавления)
+        self.index = {} # индекс позиция ТВЭЛ -> тип, поиск за O(1)
+        self.layers = MarkLayers() # слои пометок ТВЭЛ
+        #self.flag_changed = False
+        self.r_tvel = r_tvel
+        self.r_in = r_in
+        self.r_out = r_out
+        self.step = step
+        self.position = [0, 0]
+        self.rotation = 0
+        self.mirror = False # зеркальное отражение относительно оси Y применяется при расчете координат, позиции (i, j) не меняются
+        self._transform = None # кэш параметров преобразования индекс -> координаты
+        self.revision = 0 # номер изменения состава расстановки (ТВЭЛ и пометок)
+        self.history = None # журнал отмены изменений (History), подключается интерфейсом
+        self.spatial = SpatialIndex() # пространственный индекс позиций для геометрических запросов
+        self._problems = None # кэш результата validate
+    
+    def copy_attributes(self):
+        tmp = Arrange(self.r_tvel,self.step,self.r_in,self.r_out)
+        tmp.position = self.position
+        tmp.rotation = self.rotation
+        tmp.mirror = self.mirror
+        return tmp
+
+    def snapshot(self):
+        # независимая копия параметров и состава (без журнала отмены), например для записи в другом потоке,
+        # пока исходная расстановка редактируется
+        tmp = self.copy_attributes()
+        tmp.position = list(self.position)
+        tmp.tvel = {key: dict(sites) for key, sites in self.tvel.items()}
+        tmp.index = dict(self.index)
+        tmp.layers = self.layers.copy()
+        tmp.spatial.cells = {key: set(cell) for key, cell in self.spatial.cells.items()}
+        return tmp
+
+    def get_tvel(self, i, j):
+        return self.index.get((i, j))
+    
+    def add(self, i, j, type):
+        key = self.index.get((i, j))
+        if key == type:
+            return
+        if key is not None:
+            self._remove(i, j, key) # смена типа, пометки твэл сохраняются
+        else:
+            self.spatial.add(self, [(i, j)])
+        if type not in self.tvel:
+            self.tvel[type]={}
+        self.tvel[type][(i, j)] = None
+        self.index[(i, j)] = type
+        if key is None:
+            self.update_problems([(i, j)])
+        marks = self.get_marks(i, j)
+        self._record(('site', i, j, key, type, marks, marks))
+        self.revision += 1
+    
+    def pop(self, i, j):
+        key = self.index.get((i, j))
+        if key is not None:
+            marks = self.get_marks(i, j)
+            self._remove(i, j, key)
+            self.spatial.remove([(i, j)])
+            self.update_problems([(i, j)])
+            self.layers.release([(i, j)]) # пометки пустой позиции не имеют смысла
+            self._record(('site', i, j, key, None, marks, ()))
+            self.revision += 1
+
+    def mark(self, i, j, layer=DEFAULT_LAYER):
+        # помечаются только занятые позиции
+        self.set_mark(i, j, layer, True)
+
+    def unmark(self, i, j, layer=DEFAULT_LAYER):
+        self.set_mark(i, j, layer, False)
+
+    def set_mark(self, i, j, layer, state):
+        if (i, j) in self.index and self.is_marked(i, j, layer) != state:
+            before = self.get_marks(i, j)
+            self.layers.set(layer, [(i, j)], state)
+            self._record(('site', i, j, self.index[(i, j)], self.index[(i, j)], before, self.get_marks(i, j)))
+            self.revision += 1
+
+    def is_marked(self, i, j, layer=DEFAULT_LAYER):
+        return layer in self.layers.get_names((i, j))
+
+    def get_marks(self, i, j):
+        # имена слоев, в которых помечена позиция
+        return self.layers.get_names((i, j))
+
+    def add_layer(self, name):
+        self.layers.add(check_layer(name))
+
+    def remove_layer(self, name):
+        # снятие пометок слоя записывается в журнал отмены, при отмене слой создается заново
+        self.mark_many(self.get_layer(name), False, name)
+        self.layers.masks.pop(name, None)
+
+    def get_layers(self):
+        return list(self.layers.masks)
+
+    def get_layer(self, name):
+        # позиции (N,2), помеченные в слое
+        return self.get_marked([name])
+
+    def get_marked(self, names=None, how='any'):
+        # позиции (N,2), помеченные хотя бы в одном (how='any') или во всех (how='all') слоях names, по умолчанию - во всех слоях
+        return self.layers.sites[self.layers.combine(self.get_layers() if names is None else names, how)]
+
+    def _remove(self, i, j, key):
+        del self.index[(i, j)]
+        del self.tvel[key][(i, j)]
+        if not self.tvel[key]:
+            self.tvel.pop(key)
+
+    def _record(self, entry):
+        if self.history is not None:
+            self.history.record(entry)
+
+    def _get_items(self, indices):
+        # позиции массивом (N,2) и списком; повторы позиции отбрасываются до любых изменений и записи в журнал
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1, 2)
+        items = list(dict.fromkeys(zip(indices[:, 0].tolist(), indices[:, 1].tolist())))
+        if len(items) != len(indices):
+            indices = np.array(items, dtype=np.int64).reshape(-1, 2)
+        return indices, items
+
+    def _get_old_types(self, items):
+        # прежние типы позиций для журнала отмены, 0 - пустая позиция
+        return np.fromiter((self.index.get(item, 0) for item in items), dtype=np.uint16, count=len(items))
+        
+    def add_many(self, indices, type):
+        # пакетное добавление ТВЭЛ одного типа, indices - массив (N,2) или список позиций
+        indices, items = self._get_items(indices)
+        if not items:
+            return
+        if self.history is not None:
+            self._record(('bulk', indices.astype(np.int32), self._get_old_types(items), type, None, None))
+        present = self.index.keys() & items
+        for item in present:
+            key = self.index[item]
+            if key != type:
+                self._remove(*item, key)
+        if present:
+            added = [item for item in items if item not in present]
+            self.spatial.add(self, added)
+        else:
+            added = items
+            self.spatial.add(self, items, indices)
+        self.tvel.setdefault(type, {}).update(dict.fromkeys(items))
+        self.index.update(dict.fromkeys(items, type))
+        self.update_problems(added)
+        self.revision += 1
+
+    def pop_many(self, indices):
+        # пакетное удаление ТВЭЛ вместе с пометками
+        indices, items = self._get_items(indices)
+        items = [item for item in items if item in self.index]
+        if not items:
+            return
+        if self.history is not None:
+            marks = {name: self.layers.get(name, items) for name in self.layers.masks}
+            marks = {name: values for name, values in marks.items() if values.any()} or None
+            self._record(('bulk', self._get_items(items)[0].astype(np.int32), self._get_old_types(items), 0,
+                          marks, marks and dict.fromkeys(marks, False)))
+        for item in items:
+            self._remove(*item, self.index[item])
+        self.spatial.remove(items)
+        self.update_problems(items)
+        self.layers.release(items)
+        self.revision += 1
+
+    def mark_many(self, indices, state=True, layer=DEFAULT_LAYER):
+        # пакетная установка (state=True) или снятие пометок слоя layer, учитываются только занятые позиции
+        indices, items = self._get_items(indices)
+        items = [item for item in items if item in self.index]
+        items = [item for item, marked in zip(items, self.layers.get(layer, items).tolist()) if marked != state]
+        if not items:
+            return
+        if self.history is not None:
+            types = self._get_old_types(items)
+            self._record(('bulk', self._get_items(items)[0].astype(np.int32), types, types, {layer: not state}, {layer: state}))
+        self.layers.set(layer, items, state)
+        self.revision += 1
+
+    def set_params(self, **params):
+        # изменение параметров преобразования (step, position, rotation) с записью в журнал отмены
+        before = {name: copy.copy(getattr(self, name)) for name in params}
+        for name in params:
+            setattr(self, name, copy.copy(params[name]))
+        self._record(('param', before, {name: copy.copy(params[name]) for name in params}))
+
+    def reflect(self):
+        # зеркальное отражение относительно оси Y: меняется только признак отражения и смещение центра,
+        # узел (i, j) отображается так же, как узел (-i, j) без отражения, состав расстановки и пометки не меняются
+        self.mirror = not self.mirror
+        self.position = [-self.position[0], self.position[1]]
+        self._record(('reflect',))
+
+    def get_quantity(self, i):
+        if i in self.tvel:
+            return len(self.tvel[i])
+        else:
+            return 0
+    
+    def get_size(self):
+        return len(self.index)
+      
+    def get_tvel_types(self):
+        if self.tvel:
+            return max(self.tvel) #возвращает максимальный значение типа твел, при создании меню и обработке количества ТВЭЛ учитывать, что нумерация типов с 1 (т.е. +1 к длине списка)
+        else:
+            return 0
+    
+    def get_values(self):
+        return list(self.index)
+
+    def get_stats(self):
+        # общее количество, количество по типам и по слоям пометок - O(число типов + число ячеек слоев)
+        return {'total': len(self.index), 'types': {key: len(self.tvel[key]) for key in sorted(self.tvel)},
+                'layers': {name: int(np.count_nonzero(mask)) for name, mask in self.layers.masks.items()}}
+
+    def get_type_array(self):
+        # позиции (N,2) и типы (N) ТВЭЛ массивами в порядке индекса
+        return self.get_index_array(), np.fromiter(self.index.values(), dtype=np.int64, count=len(self.index))
+
+    def diff(self, other):
+        '''Отличия расстановки other от данной по позициям (столбец, ряд): операции над множествами
+        упакованных ключей. Возвращает словарь: 'added', 'removed' - позиции (N,2) и 'added_types', 'removed_types' - их типы,
+        'retyped' - позиции со сменой типа, 'old_types', 'new_types' - типы до и после, 'types' - {тип: (было, стало)}'''
+        old_indices, old_types = self.get_type_array()
+        new_indices, new_types = other.get_type_array()
+        _, old_common, new_common = np.intersect1d(pack_indices(old_indices[:, 0], old_indices[:, 1]), pack_indices(new_indices[:, 0], new_indices[:, 1]),
+                                                   assume_unique=True, return_indices=True)
+        removed = np.ones(len(old_indices), dtype=bool)
+        removed[old_common] = False
+        added = np.ones(len(new_indices), dtype=bool)
+        added[new_common] = False
+        changed = old_types[old_common] != new_types[new_common]
+        before, after = self.get_stats()['types'], other.get_stats()['types']
+        return {'added': new_indices[added], 'added_types': new_types[added],
+                'removed': old_indices[removed], 'removed_types': old_types[removed],
+                'retyped': old_indices[old_common[changed]], 'old_types': old_types[old_common[changed]], 'new_types': new_types[new_common[changed]],
+                'types': {key: (before.get(key, 0), after.get(key, 0)) for key in sorted(before.keys() | after.keys())}}
+
+    def region_mask(self, coords, region):
+        '''Маска точек (массив (N,2) координат), попадающих в область region. Углы в градусах от оси X против часовой стрелки:
+        ('ring', r1, r2) - кольцо r1 <= r <= r2, ('sector', a1, a2) - сектор от луча a1 до луча a2,
+        ('beam', a) - полуплоскость слева от луча из начала координат под углом a, ('polygon', [(x, y), ...]) - многоугольник'''
+        x, y = coords[:, 0], coords[:, 1]
+        kind = region[0]
+        if kind == 'ring':
+            r = np.hypot(x, y)
+            return (r >= region[1]) & (r <= region[2])
+        if kind == 'sector':
+            if region[2] - region[1] >= 360:
+                return np.ones(len(coords), dtype=bool)
+            return (np.degrees(np.arctan2(y, x)) - region[1]) % 360 <= (region[2] - region[1]) % 360
+        if kind == 'beam':
+            angle = region[1]/180*math.pi
+            return x * math.sin(angle) - y * math.cos(angle) <= 0
+        if kind == 'polygon':
+            # правило четности: луч из точки вдоль оси X пересекает границу нечетное число раз
+            vx, vy = np.asarray(region[1], dtype=float).reshape(-1, 2).T
+            inside = np.zeros(len(coords), dtype=bool)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                for k in range(len(vx)):
+                    x1, y1, x2, y2 = vx[k - 1], vy[k - 1], vx[k], vy[k]
+                    inside ^= ((y1 > y) != (y2 > y)) & (x < x1 + (y - y1) * (x2 - x1) / (y2 - y1))
+            return inside
+        raise ValueError("unknown region {}".format(kind))
+
+    def validate(self):
+        '''Проверка геометрии. Возвращает словарь массивов позиций (N,2): 'outside' - ТВЭЛ выходят за r_out,
+        'inside' - заходят внутрь r_in. Пересечения ТВЭЛ не проверяются: step >= 2*r_tvel обеспечивается data_consistency
+        и изменением шага. Полная проверка выполняется после изменения параметров преобразования или радиусов,
+        при изменении состава проверяются только затронутые позиции (update_problems)'''
+        key = (self.get_transform()[0], self.r_tvel, self.r_in, self.r_out)
+        if self._problems is None or self._problems[0] != key:
+            indices = self.get_index_array()
+            items = list(self.index)
+            self._problems = (key, {name: dict.fromkeys(compress(items, mask.tolist())) for name, mask in self.check_sites(indices).items()})
+        return {name: self.get_index_array(sites) for name, sites in self._problems[1].items()}
+
+    def check_sites(self, indices):
+        # маски позиций (N,2), нарушающих границы расстановки
+        r = np.hypot(*self.get_coords(indices).T)
+        eps = 1e-9 * max(self.r_out, 1) # допуск на погрешность округления, как в annulus_sites
+        inside = r - self.r_tvel < self.r_in - eps if self.r_in != 0 else np.zeros(len(r), dtype=bool)
+        return {'outside': r + self.r_tvel > self.r_out + eps, 'inside': inside}
+
+    def update_problems(self, items):
+        # результат validate для измененных позиций: удаленные исключаются, занятые проверяются заново.
+        # Если результат устарел из-за изменения параметров, он будет пересчитан целиком при следующем вызове validate
+        if self._problems is None or self._problems[0] != (self.get_transform()[0], self.r_tvel, self.r_in, self.r_out):
+            self._problems = None
+            return
+        problems = self._problems[1]
+        for sites in problems.values():
+            for item in items:
+                sites.pop(item, None)
+        present = [item for item in items if item in self.index]
+        if present:
+            for name, mask in self.check_sites(self.get_index_array(present)).items():
+                problems[name].update(dict.fromkeys(compress(present, mask.tolist())))
+
+    def sites_in_ring(self, r1, r2, x=0, y=0):
+        # позиции ТВЭЛ на расстоянии от r1 до r2 от точки (x, y) по пространственному индексу
+        return self.spatial.annulus(self, r1, r2, x, y)
+
+    def nearest(self, x, y, k=1):
+        return self.spatial.nearest(self, x, y, k)
+
+    def max_radius(self):
+        return self.spatial.max_radius(self)
+
+    def select(self, region, lattice=False):
+        # позиции ТВЭЛ (или все узлы решетки в границах расстановки при lattice=True), попадающие в область
+        if region[0] == 'ring' and not lattice:
+            return self.sites_in_ring(*region[1:3])
+        sites = self.annulus_sites(self.r_in, self.r_out, self.r_tvel) if lattice else self.get_index_array()
+        return sites[self.region_mask(self.get_coords(sites), region)]
+
+    def apply_region(self, region, action, type=None, layer=DEFAULT_LAYER):
+        '''Пакетное изменение области одной операцией журнала отмены. action: 'fill' - заполнить все узлы области ТВЭЛ типа type,
+        'retype' - заменить тип имеющихся ТВЭЛ, 'clear' - удалить, 'mark'/'unmark' - поставить/снять пометки слоя layer.
+        Возвращает список затронутых позиций'''
+        sites = self.select(region, lattice = action == 'fill')
+        if action in ('fill', 'retype'):
+            self.add_many(sites, type)
+        elif action == 'clear':
+            self.pop_many(sites)
+        elif action in ('mark', 'unmark'):
+            self.mark_many(sites, action == 'mark', layer)
+        else:
+            raise ValueError("unknown action {}".format(action))
+        return self._get_items(sites)[1]
+
+    @classmethod
+    def load(cls, filename, progress=None):
+        # при ошибках формата - исключение ArrangeFileError, при ошибках чтения - OSError
+        data = read_file(filename, progress)
+        if data.startswith(BIN_MAGIC): # формат определяется по сигнатуре, а не по расширению
+            return cls.parse_binary(data, str(filename))
+        return cls.parse_text(data.decode(errors='replace').splitlines())
+
+    @classmethod
+    def parse_text(cls, lines):
+        '''Разбор текстового формата целиком: строки ТВЭЛ преобразуются в массив одним вызовом,
+        построчная проверка выполняется только если файл содержит ошибки.
+        Все ошибочные строки и повторы позиций собираются в ArrangeFileError.problems'''
+        if not lines:
+            raise ArrangeFileError("Пустой файл!")
+        # first line - tvel radius, step, radius inner, radius out [, position(list), angle_of_rotation ]
+        fields = lines[0].rstrip().split(",")
+        # признак отражения - 8 поле TEXT_MIRROR
+        mirror = len(fields) == 8 and fields[7].strip() == TEXT_MIRROR
+        try:
+            data = [float(item) for item in (fields[:7] if mirror else fields)]
+        except ValueError:
+            raise ArrangeFileError("Строка 1: неверный формат параметров расстановки!")
+        if len(data) < 4 or not data_consistency(*data[0:4]):
+            raise ArrangeFileError("Несогласованные данные!")
+        tmp = Arrange(*data[0:4])
+        if mirror:
+            tmp.position=data[4:6]
+            tmp.rotation=data[6]
+            tmp.mirror=True
+        elif(len(data)>4): # в старых версиях position(list), angle_of_rotation в файле данных отсутствовало, для совместимости
+            tmp.position=data[-3:-1]
+            tmp.rotation=data[-1]
+        # строки ТВЭЛ - до первого раздела слоя пометок [имя слоя]
+        sections = [n for n, line in enumerate(lines) if line.startswith('[')]
+        body = lines[1:sections[0]] if sections else lines[1:]
+        problems = []
+        try:
+            table = np.loadtxt(body, delimiter=',', dtype=np.int64, comments=None, ndmin=2) if body else np.empty((0, 3), dtype=np.int64) # x, y, tvel type
+            if table.shape[1] != 3:
+                raise ValueError
+            numbers = None # номера строк нужны только для сообщений об ошибках
+        except ValueError:
+            table, numbers = [], []
+            for n, line in enumerate(body, 2):
+                fields = line.split(",")
+                if not line.strip():
+                    continue
+                if len(fields) != 3:
+                    problems.append((n, line, "ожидается 3 поля: столбец, ряд, тип"))
+                    continue
+                try:
+                    table.append([int(item) for item in fields])
+                    numbers.append(n)
+                except ValueError:
+                    problems.append((n, line, "ожидаются целые числа"))
+            table = np.array(table, dtype=np.int64).reshape(-1, 3)
+        def source(k): # номер и текст строки для k-й строки таблицы
+            nonlocal numbers
+            if numbers is None:
+                numbers = [n for n, line in enumerate(body, 2) if line.strip()]
+            return numbers[k], lines[numbers[k] - 1]
+        valid = np.flatnonzero(table[:, 2] >= 1)
+        for k in np.flatnonzero(table[:, 2] < 1).tolist():
+            problems.append((*source(k), "тип ТВЭЛ должен быть положительным"))
+        # повторы позиции: сохраняется первое вхождение, последующие считаются ошибочными строками
+        keys = pack_indices(table[valid, 0], table[valid, 1])
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        repeated = np.ones(len(keys), dtype=bool)
+        repeated[first] = False
+        for k in np.flatnonzero(repeated).tolist():
+            problems.append((*source(valid[k]), "повтор позиции ({}, {}), первое вхождение в строке {}".format(
+                *table[valid[k], 0:2].tolist(), source(valid[first[inverse[k]]])[0])))
+        table = table[valid[~repeated]]
+        _, first = np.unique(table[:, 2], return_index=True)
+        for type in table[np.sort(first), 2].tolist():
+            tmp.add_many(table[table[:, 2] == type, 0:2], type)
+        for start, stop in zip(sections, [*sections[1:], len(lines)]):
+            tmp.parse_layer(lines, start, stop, problems)
+        if problems:
+            problems.sort()
+            raise ArrangeFileError("Ошибки в файле расстановки: {}".format(len(problems)), problems, tmp)
+        return tmp
+
+    def parse_layer(self, lines, start, stop, problems):
+        # раздел слоя пометок текстового файла: строка [имя слоя] и строки столбец, ряд; ошибки добавляются в problems
+        name = lines[start].strip()
+        name = name[1:-1] if name.endswith(']') else name
+        try:
+            self.add_layer(name)
+        except ArrangeDataError as error:
+            problems.append((start + 1, lines[start], str(error)))
+            return
+        sites = []
+        for n in range(start + 1, stop):
+            fields = lines[n].split(",")
+            if not lines[n].strip():
+                continue
+            try:
+                if len(fields) != 2:
+                    raise ValueError
+                sites.append([int(item) for item in fields])
+            except ValueError:
+                problems.append((n + 1, lines[n], "ожидается 2 целых числа: столбец, ряд"))
+                continue
+            if tuple(sites[-1]) not in self.index:
+                problems.append((n + 1, lines[n], "пометка слоя {} в пустой позиции".format(name)))
+        self.mark_many(np.array(sites, dtype=np.int64).reshape(-1, 2), True, name)
+
+    @classmethod
+    def parse_binary(cls, data, filename=''):
+        # размеры заголовка и массивов проверяются до чтения, при ошибке - ArrangeFileError с именем файла и причиной
+        def fail(reason):
+            raise ArrangeFileError("{}: {}".format(filename or "двоичный файл расстановки", reason))
+        def need(offset, size, what):
+            if offset + size > len(data):
+                fail("файл обрезан: {} - ожидается {} байт, есть {}".format(what, size, max(len(data) - offset, 0)))
+        need(0, BIN_HEADER.size, "заголовок")
+        magic, version, flags, *params, n, m = BIN_HEADER.unpack_from(data)
+        if magic != BIN_MAGIC:
+            fail("неверная сигнатура")
+        if version > BIN_VERSION:
+            fail("версия формата {} не поддерживается (поддерживается до {})".format(version, BIN_VERSION))
+        if not data_consistency(*params[0:4]):
+            fail("несогласованные параметры расстановки в заголовке")
+        tmp = Arrange(*params[0:4])
+        tmp.position = list(params[4:6])
+        tmp.rotation = params[6]
+        tmp.mirror = bool(flags & BIN_MIRROR)
+        arrays = []
+        offset = BIN_HEADER.size
+        marked = m if version < 2 else 0 # в версии 1 - одна пометка без имени (слой по умолчанию) позициями
+        need(offset, 10 * n + 8 * marked, "массивы ТВЭЛ")
+        for dtype, count in (('<i4', n), ('<i4', n), ('<i4', marked), ('<i4', marked), ('<u2', n)):
+            arrays.append(np.frombuffer(data, dtype=dtype, count=count, offset=offset))
+            offset += arrays[-1].nbytes
+        cols, rows, marked_cols, marked_rows, types = arrays
+        if n and types.min() < 1:
+            fail("тип ТВЭЛ должен быть положительным")
+        indices = np.column_stack((cols, rows))
+        # ТВЭЛ записаны группами по типам, каждая группа добавляется одним вызовом
+        bounds = np.flatnonzero(np.diff(types)) + 1
+        for start, stop in zip([0, *bounds.tolist()], [*bounds.tolist(), len(types)] if n else []):
+            tmp.add_many(indices[start:stop], int(types[start]))
+        if marked:
+            tmp.mark_many(np.column_stack((marked_cols, marked_rows)))
+        for k in range(m if version >= 2 else 0):
+            need(offset, BIN_NAME.size, "слой пометок {}".format(k + 1))
+            (size,) = BIN_NAME.unpack_from(data, offset)
+            need(offset, BIN_NAME.size + size + (n + 7) // 8, "слой пометок {}".format(k + 1))
+            try:
+                name = check_layer(bytes(data[offset + BIN_NAME.size:offset + BIN_NAME.size + size]).decode())
+            except (UnicodeDecodeError, ArrangeDataError) as error:
+                fail("слой пометок {}: {}".format(k + 1, error))
+            offset += BIN_NAME.size + size
+            bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8, count=(n + 7) // 8, offset=offset), count=n).astype(bool)
+            offset += (n + 7) // 8
+            tmp.add_layer(name)
+            tmp.mark_many(indices[bits], True, name)
+        return tmp
+
+    def save_binary(self, filename, progress=None):
+        if self.get_tvel_types() > np.iinfo(np.uint16).max:
+            raise ValueError("tvel type out of range")
+        indices = [self.get_index_array(self.tvel[key]) for key in self.tvel]
+        indices = np.concatenate(indices) if indices else np.empty((0, 2), dtype=np.int64)
+        types = np.repeat(np.array(list(self.tvel), dtype='<u2'), [len(self.tvel[key]) for key in self.tvel])
+        items = list(zip(indices[:, 0].tolist(), indices[:, 1].tolist()))
+        arrays = [array.astype('<i4') for array in (indices[:, 0], indices[:, 1])] + [types]
+        for name in self.get_layers(): # маска слоя по порядку ТВЭЛ в файле
+            label = name.encode()
+            arrays += [np.frombuffer(BIN_NAME.pack(len(label)) + label, dtype=np.uint8), np.packbits(self.layers.get(name, items))]
+        total = BIN_HEADER.size + sum(array.nbytes for array in arrays)
+        with open(filename, 'wb') as f:
+            f.write(BIN_HEADER.pack(BIN_MAGIC, BIN_VERSION, BIN_MIRROR if self.mirror else 0, self.r_tvel, self.step, self.r_in, self.r_out,
+                                    self.position[0], self.position[1], self.rotation, len(indices), len(self.get_layers())))
+            for array in arrays:
+                f.write(array.tobytes())
+                if progress:
+                    progress(f.tell(), total, 'bytes')
+
+    def save_text(self, filename, progress=None):
+        layers = {name: self.get_layer(name) for name in self.get_layers()}
+        total = self.get_size() + sum(map(len, layers.values()))
+        with open(filename,'w', encoding='utf-8') as f:
+            f.write("{},{},{},{},{},{},{}{}\n".format(self.r_tvel, self.step, self.r_in, self.r_out, self.position[0], self.position[1], self.rotation,
+                                                    "," + TEXT_MIRROR if self.mirror else "")) # признак отражения пишется только для отраженной расстановки
+            done = 0
+            for key in self.tvel:
+                lines = ("{},{},{}\n".format(i, j, key) for i, j in self.tvel[key]) # x, y, tvel type
+                done = write_lines(f, lines, len(self.tvel[key]), progress, done, total)
+            for name, sites in layers.items():
+                f.write("[{}]\n".format(name))
+                done = write_lines(f, map("{},{}\n".format, *sites.T.tolist()), len(sites), progress, done, total)
+
+    def save(self, filename, progress=None):
+        # ошибки записи передаются вызывающему. Расстановка пишется во временный файл, который затем заменяет прежний:
+        # при ошибке или отмене прежний файл остается нетронутым
+        outpath, newdir = coord_dir(filename)
+        tmpname = "{}.tmp{}".format(filename, os.getpid())
+        try:
+            if Path(filename).suffix == "." + BIN_EXT:
+                self.save_binary(tmpname, progress)
+            else:
+                self.save_text(tmpname, progress)
+            os.replace(tmpname, filename)
+        except:
+            Path(tmpname).unlink(missing_ok = True)
+            raise
+        shutil.rmtree(outpath, ignore_errors =True) # удаляем директорию со старыми данными координат, чтобы сохранение координат и расстановки были синхронизированы
+
+    def write_coord(self, filename, progress=None):
+        # запись файлов координат, ошибки передаются вызывающему.
+        # Файлы пишутся во временную директорию рядом с целевой, которая затем заменяет старую целиком:
+        # при ошибке записи прежние файлы координат остаются нетронутыми
+        outpath, newdir = coord_dir(filename)
+        tmppath = outpath.with_name("{}.tmp{}".format(newdir, os.getpid()))
+        shutil.rmtree(tmppath, ignore_errors =True)
+        tmppath.mkdir()
+        layers = {name: self.get_layer(name) for name in self.get_layers()}
+        total, done = self.get_size() + sum(map(len, layers.values())), 0
+        try:
+            for key in self.tvel:
+                write_coord_file(tmppath / "{}.{}{}".format(newdir, F_EXT, key), self.get_coords(self.get_index_array(self.tvel[key])))
+                done += len(self.tvel[key])
+                if progress:
+                    progress(done, total, 'lines')
+            for name, sites in layers.items(): # файл слоя пометок: <имя расстановки>.<имя слоя>
+                if len(sites):
+                    write_coord_file(tmppath / "{}.{}".format(newdir, name), self.get_coords(sites))
+                    done += len(sites)
+                    if progress:
+                        progress(done, total, 'lines')
+            replace_dir(tmppath, outpath)
+        except:
+            shutil.rmtree(tmppath, ignore_errors =True)
+            raise
+
+    @classmethod
+    def new(cls, r_tvel, step, r_in, r_out):
+        if not data_consistency(r_tvel, step, r_in, r_out):
+            raise ArrangeDataError("Несогласованные данные!")
+        tmp = Arrange(r_tvel, step, r_in, r_out)
+        tmp.add_many(tmp.annulus_sites(r_in, r_out, r_tvel), 1)
+        if tmp.tvel == {}:
+            raise ArrangeDataError("При данных параметрах расстановка не содержит твелов!")
+        return tmp
+    
+    def annulus_sites(self, r_in, r_out, pad=0):
+        '''Узлы решетки (массив (N,2)), для которых r + pad <= r_out и (r - pad >= r_in или r_in == 0),
+        где r - расстояние от начала координат до узла. Порядок как при обходе по столбцам, затем по рядам.
+        Для каждого столбца диапазоны рядов вычисляются аналитически с запасом в один узел,
+        точное условие проверяется только для найденных кандидатов.'''
+        (step, px, py, _, sx), cos_a, sin_a = self.get_transform()
+        r_max = r_out - pad
+        if r_max < 0:
+            return np.empty((0, 2), dtype=np.int64)
+        dx = step * SIN_60
+        i = np.arange(math.floor((-r_max - px) / dx) - 1, math.ceil((r_max - px) / dx) + 2, dtype=np.int64)
+        if sx < 0: # при отражении номера столбцов -i: обход в обратном порядке сохраняет возрастание номеров
+            i = i[::-1]
+        x0 = i * dx + px
+        offset = i % 2 * COS_60
+        y_out = np.sqrt(np.maximum(r_max * r_max - x0 * x0, 0))
+        lo = np.floor((-y_out - py) / step - offset).astype(np.int64) - 1
+        hi = np.ceil((y_out - py) / step - offset).astype(np.int64) + 1
+        # внутренний вырез: ряды, заведомо лежащие внутри r_in + pad, не проверяются
+        cut_lo, cut_hi = hi + 1, hi
+        if r_in != 0:
+            r_min = r_in + pad
+            y_in = np.sqrt(np.maximum(r_min * r_min - x0 * x0, 0))
+            inside = np.abs(x0) < r_min
+            cut_lo = np.where(inside, np.ceil((-y_in - py) / step - offset).astype(np.int64) + 1, cut_lo)
+            cut_hi = np.where(inside, np.floor((y_in - py) / step - offset).astype(np.int64) - 1, cut_hi)
+            empty = cut_lo > cut_hi
+            cut_lo, cut_hi = np.where(empty, hi + 1, cut_lo), np.where(empty, hi, cut_hi)
+        # два отрезка рядов на столбец: [lo, cut_lo - 1] и [cut_hi + 1, hi]
+        starts = np.column_stack((lo, cut_hi + 1)).ravel()
+        stops = np.column_stack((np.minimum(cut_lo - 1, hi), hi)).ravel()
+        counts = np.maximum(stops - starts + 1, 0)
+        cols = np.repeat(np.repeat(sx * i, 2), counts) # при отражении столбец с абсциссой x0 имеет номер -i
+        rows = np.repeat(starts, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        sites = np.column_stack((cols, rows))
+        coords = self.get_coords(sites)
+        r = np.sqrt(coords[:, 0] * coords[:, 0] + coords[:, 1] * coords[:, 1])
+        # np.sqrt и возведение в степень 0.5 в radius() могут расходиться в последнем знаке,
+        # поэтому вблизи границ радиус пересчитывается тем же способом, что и при поштучной проверке
+        eps = 1e-9 * max(r_out, 1)
+        near = np.abs(r + pad - r_out) <= eps
+        if r_in != 0:
+            near |= np.abs(r - pad - r_in) <= eps
+        for k in np.flatnonzero(near).tolist():
+            r[k] = radius(*coords[k].tolist())
+        mask = r + pad <= r_out
+        if r_in != 0:
+            mask &= r - pad >= r_in
+        return sites[mask]
+
+    def get_transform(self):
+        # параметры преобразования пересчитываются только при изменении шага, смещения центра, угла поворота или отражения
+        key = (self.step, self.position[0], self.position[1], self.rotation, -1 if self.mirror else 1)
+        if self._transform is None or self._transform[0] != key:
+            angle = self.rotation/180*math.pi
+            self._transform = (key, math.cos(angle), math.sin(angle))
+        return self._transform
+
+    def get_index_array(self, items=None):
+        # позиции ТВЭЛ в виде массива (N,2): столбец, ряд
+        if items is None:
+            items = self.index
+        return np.fromiter(chain.from_iterable(items), dtype=np.int64, count=2 * len(items)).reshape(-1, 2)
+
+    def get_coord(self, i, j):
+        (step, px, py, _, sx), cos_a, sin_a = self.get_transform()
+        x0 = sx * i * step * SIN_60 + px
+        y0 = (j + i % 2 * COS_60) * step + py
+        x = x0 * cos_a - y0 * sin_a
+        y = x0 * sin_a + y0 * cos_a
+        return x, y
+
+    def get_coords(self, indices):
+        # пакетный вариант get_coord: массив (N,2) индексов -> массив (N,2) координат, порядок операций как в get_coord
+        (step, px, py, _, sx), cos_a, sin_a = self.get_transform()
+        indices = np.asarray(indices).reshape(-1, 2)
+        i, j = indices[:, 0], indices[:, 1]
+        x0 = sx * i * step * SIN_60 + px
+        y0 = (j + i % 2 * COS_60) * step + py
+        return np.column_stack((x0 * cos_a - y0 * sin_a, x0 * sin_a + y0 * cos_a))
+
+    def get_index(self, x, y):
+        (step, px, py, _, sx), cos_a, sin_a = self.get_transform()
+        x0 = x * cos_a + y * sin_a - px
+        y0 = - x * sin_a + y * cos_a - py
+        i = round(x0/ step/ SIN_60)
+        j = round(y0/ step - i % 2 * COS_60)
+        return sx * i, j
+
+    def get_indices(self, xy):
+        # пакетный вариант get_index: массив (N,2) координат -> массив (N,2) ближайших узлов решетки
+        (step, px, py, _, sx), cos_a, sin_a = self.get_transform()
+        xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        x, y = xy[:, 0], xy[:, 1]
+        x0 = x * cos_a + y * sin_a - px
+        y0 = - x * sin_a + y * cos_a - py
+        i = np.rint(x0/ step/ SIN_60).astype(np.int64)
+        j = np.rint(y0/ step - i % 2 * COS_60).astype(np.int64)
+        return np.column_stack((sx * i, j))
+    
+
+def diff_report(diff):
+    # отличия (результат Arrange.diff) в виде, пригодном для JSON: итоги и списки позиций
+    return {'added': len(diff['added']), 'removed': len(diff['removed']), 'retyped': len(diff['retyped']),
+            'types': {str(key): {'old': old, 'new': new, 'delta': new - old} for key, (old, new) in diff['types'].items()},
+            'sites': {'added': np.column_stack((diff['added'], diff['added_types'])).tolist(),
+                      'removed': np.column_stack((diff['removed'], diff['removed_types'])).tolist(),
+                      'retyped': np.column_stack((diff['retyped'], diff['old_types'], diff['new_types'])).tolist()}}
+
+def export_coord(filename):
+    # задание для пакетного режима: чтение расстановки и запись координат, выполняется в отдельном процессе
+    start = time.perf_counter()
+    arrange = Arrange.load(filename)
+    arrange.write_coord(filename)
+    return arrange.get_size(), time.perf_counter() - start
+
@@ -0,0 +1,286 @@
+'''Замеры производительности основных операций reactor360 на синтетических расстановках.
+Работает без графического интерфейса: отрисовка выполняется на заменителе холста Tk, который только хранит элементы.
+
+Запуск:
+    python benchmark.py [--sizes 1000 10000 100000] [--types 3] [--repeat 3] [--output результат.json]
+                        [--baseline прежний.json] [--threshold 0.25]
+    python benchmark.py --compare прежний.json новый.json [--threshold 0.25]
+Результат - JSON: параметры запуска и для каждой операции и размера лучшее и медианное время, с.
+При сравнении операции, замедлившиеся больше чем на threshold (доля), считаются регрессией, код возврата 1.
+Перед замерами проверяется, что reactor360 и arrange360 импортируются без tkinter быстрее --import-budget секунд.
+'''
+import argparse
+import json
+import math
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from arrange360 import Arrange, Comparison, SIN_60, BIN_EXT, F_EXT
+from gui360 import CanvasRenderer
+from export360 import export_image
+from sweep360 import LatticeCache, sweep
+
+
+class OffscreenCanvas():
+    '''Заменитель холста Tk для CanvasRenderer: элементы хранятся в словаре, теги - в множествах'''
+    width = 1000
+    height = 800
+
+    def __init__(self):
+        self.items = {}
+        self.count = 0
+
+    def create(self, coords, tags=(), **options):
+        self.count += 1
+        self.items[self.count] = [list(coords), {tags} if isinstance(tags, str) else set(tags)]
+        return self.count
+
+    def create_oval(self, *coords, **options):
+        return self.create(coords, **options)
+
+    create_rectangle = create_line = create_image = create_oval
+
+    def select(self, tag):
+        if isinstance(tag, int):
+            return [tag] if tag in self.items else []
+        if tag == 'all':
+            return list(self.items)
+        return [id for id, item in self.items.items() if tag in item[1]]
+
+    def delete(self, *tags):
+        for tag in tags:
+            for id in self.select(tag):
+                del self.items[id]
+
+    def move(self, tag, dx, dy):
+        for id in self.select(tag):
+            coords = self.items[id][0]
+            coords[0::2] = [x + dx for x in coords[0::2]]
+            coords[1::2] = [y + dy for y in coords[1::2]]
+
+    def scale(self, tag, x0, y0, fx, fy):
+        for id in self.select(tag):
+            coords = self.items[id][0]
+            coords[0::2] = [x0 + (x - x0) * fx for x in coords[0::2]]
+            coords[1::2] = [y0 + (y - y0) * fy for y in coords[1::2]]
+
+    def coords(self, tag, *coords):
+        for id in self.select(tag):
+            self.items[id][0] = list(coords)
+
+    def itemconfig(self, tag, tags=None, **options):
+        if tags is not None:
+            for id in self.select(tag):
+                self.items[id][1] = {tags} if isinstance(tags, str) else set(tags)
+
+    def tag_raise(self, *args):
+        pass
+
+    tag_lower = tag_raise
+
+    def cget(self, option):
+        return 'white'
+
+    def winfo_rgb(self, color):
+        value = int(color[1:], 16) if color.startswith('#') else 0
+        return ((value >> 16) * 257, (value >> 8 & 255) * 257, (value & 255) * 257)
+
+
+class OffscreenImage():
+    def __init__(self, master=None, width=0, height=0, data=b'', format=None):
+        self.data = data
+
+    def put(self, color, to=None):
+        pass
+
+
+def synthetic(size, types, seed=0):
+    '''Расстановка из примерно size ТВЭЛ с types типами, распределенными случайно'''
+    r_tvel, step = 0.4, 1.0
+    r_out = math.sqrt(size * step * step * SIN_60 / math.pi) + r_tvel
+    arrange = Arrange.new(r_tvel, step, 0, r_out)
+    indices = arrange.get_index_array()
+    kinds = np.random.default_rng(seed).integers(1, types + 1, len(indices))
+    for type in range(2, types + 1):
+        arrange.add_many(indices[kinds == type], type)
+    for item in indices[::97].tolist():
+        arrange.mark(*item)
+    arrange.mark_many(indices[::13], True, 'absorber')
+    return arrange
+
+
+def timing(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {'best': min(times), 'median': statistics.median(times)}
+
+
+def operations(arrange, types, folder):
+    '''Замеряемые операции: имя -> функция без аргументов'''
+    colors = ['#ffffff', *('#{:06x}'.format(0x101010 * (k + 1) % 0xffffff) for k in range(types))]
+    items = arrange.get_values()
+    text, binary = str(folder / ('bench.' + F_EXT)), str(folder / ('bench.' + BIN_EXT)) # имена файлов строками, как из диалога
+    arrange.save(text)
+    arrange.save(binary)
+    scale = min(OffscreenCanvas.width, OffscreenCanvas.height) / (2 * arrange.max_radius() + arrange.step)
+    def draw(view):
+        # как App.draw_arrange: полное построение холста и проверка геометрии
+        renderer = CanvasRenderer(OffscreenCanvas())
+        renderer.draw(arrange, colors, view)
+        renderer.set_overlay('flag', np.concatenate(list(arrange.validate().values())), 'red')
+        return renderer
+    center = (OffscreenCanvas.width / 2, OffscreenCanvas.height / 2)
+    panned = draw((*center, scale * 8))
+    def pan():
+        for k in range(10):
+            panned.draw(arrange, colors, (center[0] + k, center[1] - k, scale * 8))
+    def get_tvel():
+        for item in items:
+            arrange.get_tvel(*item)
+    def validate():
+        arrange._problems = None
+        arrange.validate()
+    def edit():
+        # как щелчок в интерфейсе: удаление и возврат ТВЭЛ с повторной проверкой затронутой позиции
+        item, type = items[len(items) // 2], arrange.get_tvel(*items[len(items) // 2])
+        for _ in range(10):
+            arrange.pop(*item)
+            arrange.validate()
+            arrange.add(*item, type)
+            arrange.validate()
+    reference = arrange.snapshot()
+    reference.pop_many(items[:200:2])
+    comparison = Comparison(reference, arrange)
+    def compare_edit():
+        # как щелчок в режиме сравнения: отличия обновляются только для затронутой позиции
+        item, type = items[len(items) // 2], arrange.get_tvel(*items[len(items) // 2])
+        for _ in range(10):
+            arrange.pop(*item)
+            comparison.update(arrange, [item])
+            comparison.get()
+            arrange.add(*item, type)
+            comparison.update(arrange, [item])
+            comparison.get()
+    return {
+        'new': lambda: Arrange.new(arrange.r_tvel, arrange.step, arrange.r_in, arrange.r_out),
+        'load_text': lambda: Arrange.load(text),
+        'load_binary': lambda: Arrange.load(binary),
+        'save_text': lambda: arrange.save(text),
+        'save_binary': lambda: arrange.save(binary),
+        'save_coord': lambda: arrange.write_coord(text),
+        'snapshot': arrange.snapshot, # копия для записи в рабочем потоке, выполняется в главном
+        'get_values': arrange.get_values,
+        'get_tvel': get_tvel,
+        'reflect': lambda: (arrange.reflect(), arrange.reflect()), # туда и обратно, чтобы не менять расстановку для следующих замеров
+        'validate': validate,
+        'validate_edit': edit,
+        'diff': lambda: reference.diff(arrange),
+        'compare_edit': compare_edit,
+        'layers': lambda: (len(arrange.get_marked()), len(arrange.get_marked(how='all')), arrange.get_stats()), # объединение, пересечение, подсчет
+        'export_png': lambda: export_image(arrange, folder / 'bench.png', colors, dpi=100),
+        'export_svg': lambda: export_image(arrange, folder / 'bench.svg', colors),
+        'export_pdf': lambda: export_image(arrange, folder / 'bench.pdf', colors),
+        'sweep': lambda: sweep([arrange.r_tvel * k for k in (0.8, 0.9, 1)], [arrange.step * k for k in (1, 1.05, 1.1, 1.15, 1.2)],
+                               [0], np.linspace(arrange.r_out / 2, arrange.r_out, 50).tolist(), jobs=1),
+        'preview': lambda: [LatticeCache().select(arrange.r_tvel, arrange.step, arrange.r_in, arrange.r_out * k) for k in (0.95, 1)], # ввод Rout
+        'draw_fit': lambda: draw((*center, scale)),
+        'draw_zoom': lambda: draw((*center, scale * 8)),
+        'pan_zoom': pan,
+    }
+
+
+IMPORT_BUDGET = 0.5  # допустимое время импорта модели без интерфейса по умолчанию, с
+IMPORT_CHECK = '''import sys, time
+start = time.perf_counter()
+import reactor360, arrange360
+print(time.perf_counter() - start, 'tkinter' in sys.modules)'''
+
+
+def check_import(budget):
+    '''Время импорта точки входа и модели в отдельном процессе. Ошибка, если импорт загружает tkinter
+    или занимает больше budget секунд'''
+    output = subprocess.run([sys.executable, '-c', IMPORT_CHECK], cwd=Path(__file__).parent,
+                            capture_output=True, text=True, check=True).stdout.split()
+    elapsed, tkinter = float(output[0]), output[1] == 'True'
+    problems = []
+    if tkinter:
+        problems.append("импорт модели загружает tkinter")
+    if elapsed > budget:
+        problems.append("импорт занимает {:.3f} с, допустимо {:.3f} с".format(elapsed, budget))
+    return elapsed, problems
+
+
+def run(sizes, types, repeat):
+    results = {}
+    elapsed = min(check_import(math.inf)[0] for _ in range(repeat))
+    results['import/model'] = {'best': elapsed, 'median': elapsed}
+    print("{:<24}{:>12.4f} с".format('import/model', elapsed), flush=True)
+    for size in sizes:
+        arrange = synthetic(size, types)
+        with tempfile.TemporaryDirectory() as folder:
+            for name, func in operations(arrange, types, Path(folder)).items():
+                results['{}/{}'.format(name, size)] = timing(func, repeat)
+                print("{:<24}{:>12.4f} с".format('{}/{}'.format(name, size), results['{}/{}'.format(name, size)]['best']), flush=True)
+    return {'meta': {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+                     'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'sizes': sizes, 'types': types, 'repeat': repeat},
+            'results': results}
+
+
+def compare(old, new, threshold):
+    '''Сравнение двух запусков по лучшему времени, возвращает список регрессий (имя, было, стало)'''
+    regressions = []
+    print("{:<24}{:>12}{:>12}{:>9}".format("операция", "было, с", "стало, с", "раз"))
+    for name in sorted(old['results'].keys() & new['results'].keys()):
+        before, after = old['results'][name]['best'], new['results'][name]['best']
+        ratio = after / before if before > 0 else math.inf
+        flag = ratio > 1 + threshold
+        if flag:
+            regressions.append((name, before, after))
+        print("{:<24}{:>12.4f}{:>12.4f}{:>9.2f}{}".format(name, before, after, ratio, "  РЕГРЕССИЯ" if flag else ""))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры производительности reactor360")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help="число ТВЭЛ в синтетических расстановках")
+    parser.add_argument('--types', type=int, default=3, help="число типов ТВЭЛ")
+    parser.add_argument('--repeat', type=int, default=3, help="число повторов каждой операции")
+    parser.add_argument('--output', help="файл для результатов в формате JSON")
+    parser.add_argument('--baseline', help="прежний результат для сравнения с текущим запуском")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="сравнить два сохраненных результата")
+    parser.add_argument('--threshold', type=float, default=0.25, help="допустимое замедление (доля)")
+    parser.add_argument('--import-budget', type=float, default=IMPORT_BUDGET, help="допустимое время импорта модели без интерфейса, с")
+    args = parser.parse_args(argv)
+    CanvasRenderer.photo_image = OffscreenImage
+    problems = []
+    if not args.compare:
+        problems = check_import(args.import_budget)[1]
+        for problem in problems:
+            print("Ошибка: " + problem)
+    if args.compare:
+        old, new = (json.loads(Path(name).read_text()) for name in args.compare)
+    else:
+        new = run(args.sizes, args.types, args.repeat)
+        if args.output:
+            Path(args.output).write_text(json.dumps(new, indent=1))
+        if not args.baseline:
+            return 1 if problems else 0
+        old = json.loads(Path(args.baseline).read_text())
+    regressions = compare(old, new, args.threshold)
+    if regressions:
+        print("Регрессий: {}".format(len(regressions)))
+    return 1 if regressions or problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
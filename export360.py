@@ -0,0 +1,230 @@
+'''Изображение расстановки без tkinter: растровое PNG с заданным разрешением и векторные SVG и PDF.
+Координаты расстановки считаются миллиметрами: размер листа - диаметр внешней окружности (или расстановки, если она больше)
+с полями EXPORT_MARGIN, разрешение PNG задается в точках на дюйм.
+Рисуются ТВЭЛ цветами своих типов с черным контуром, пометки - черным крестом, внутренняя и внешняя окружности - пунктиром,
+как на экране. Все ТВЭЛ одного типа выводятся одной операцией: в PNG - векторный расчет покрытия пикселей пакетами позиций,
+в SVG - одна группа, в PDF - один путь.
+'''
+import math
+import struct
+import zlib
+from pathlib import Path
+import numpy as np
+from arrange360 import ArrangeDataError
+
+
+#Системные параметры
+IMAGE_FORMATS = ('png', 'svg', 'pdf')
+EXPORT_DPI = 300  # разрешение PNG по умолчанию, точек на дюйм (настройка export_dpi в ini файле)
+EXPORT_MARGIN = 0.03  # поля изображения (доля диаметра)
+EXPORT_LINE = 0.15  # толщина контура ТВЭЛ, мм; пометки и окружности - вдвое толще
+EXPORT_MAX_PIXELS = 2**28  # наибольшее число пикселей PNG (около 800 МБ в памяти)
+EXPORT_BATCH = 2**22  # число пикселей, обрабатываемых за один шаг растеризации
+MM_PER_INCH = 25.4
+PT_PER_MM = 72 / MM_PER_INCH
+BEZIER_CIRCLE = 0.5523  # смещение управляющих точек кривой Безье, приближающей четверть окружности единичного радиуса
+BACKGROUND = 'white'
+
+# цвета Tk, используемые по умолчанию и в палитре программы, со значениями из таблицы цветов Tk - как на экране:
+# имена X11 (green - 0,255,0, gray - 190,190,190), а также lime, olive, silver, teal, добавленные в Tk 8.6 со значениями CSS;
+# прочие цвета задаются в виде #rrggbb
+COLOR_NAMES = {'white': (255, 255, 255), 'black': (0, 0, 0), 'red': (255, 0, 0), 'green': (0, 255, 0), 'lime': (0, 255, 0),
+               'blue': (0, 0, 255), 'yellow': (255, 255, 0), 'magenta': (255, 0, 255), 'cyan': (0, 255, 255),
+               'orange': (255, 165, 0), 'gray': (190, 190, 190), 'grey': (190, 190, 190), 'brown': (165, 42, 42),
+               'pink': (255, 192, 203), 'purple': (160, 32, 240), 'violet': (238, 130, 238), 'navy': (0, 0, 128),
+               'maroon': (176, 48, 96), 'olive': (128, 128, 0), 'teal': (0, 128, 128), 'silver': (192, 192, 192)}
+
+def to_rgb(color):
+    # цвет в формате Tk (#rgb, #rrggbb, #rrrrggggbbbb или имя из COLOR_NAMES) -> (r, g, b) 0..255
+    if color.startswith('#') and len(color) in (4, 7, 13):
+        n = (len(color) - 1) // 3
+        try:
+            return tuple(int(color[1 + k*n: 1 + (k+1)*n], 16) * 255 // (16**n - 1) for k in range(3))
+        except ValueError:
+            pass
+    name = color.replace(' ', '').lower()
+    if name in COLOR_NAMES:
+        return COLOR_NAMES[name]
+    raise ArrangeDataError("Неизвестный цвет: {}".format(color))
+
+def to_hex(rgb):
+    return '#%02x%02x%02x' % tuple(rgb)
+
+def get_palette(colors, types):
+    '''Цвета типов 1..types в виде (r, g, b): из списка colors (нулевой элемент - цвет выделения, не используется),
+    недостающие - по золотому сечению оттенка, одинаковые при каждом вызове'''
+    palette = [to_rgb(color) for color in colors[1:types + 1]]
+    for k in range(len(palette), types):
+        h = (k * 0.618034) % 1 * 6
+        x = 1 - abs(h % 2 - 1)
+        rgb = [(1, x, 0), (x, 1, 0), (0, 1, x), (0, x, 1), (x, 0, 1), (1, 0, x)][int(h)]
+        palette.append(tuple(int(64 + 160 * c) for c in rgb))
+    return [None, *palette]
+
+def get_scene(arrange, colors):
+    '''Содержимое изображения в координатах расстановки: половина стороны листа, слои ТВЭЛ (цвет, координаты (N,2)),
+    координаты пометок (всех слоев), радиусы окружностей'''
+    types = max(arrange.tvel, default=0)
+    palette = get_palette(colors, types)
+    layers = [(palette[type], arrange.get_coords(arrange.get_index_array(arrange.tvel[type]))) for type in arrange.tvel]
+    marks = arrange.get_coords(arrange.get_marked())
+    extent = max(arrange.r_out, arrange.max_radius() + arrange.r_tvel if arrange.get_size() else 0)
+    return extent * (1 + 2 * EXPORT_MARGIN), layers, marks, [r for r in (arrange.r_in, arrange.r_out) if r > 0]
+
+def dash_points(r, dash, spacing):
+    # точки пунктирной окружности радиуса r (отрезки и промежутки длиной dash) с шагом spacing по дуге
+    t = np.arange(0, 2 * math.pi * r, spacing)
+    t = t[(t // dash) % 2 == 0]
+    return np.column_stack((r * np.cos(t / r), r * np.sin(t / r)))
+
+def stamp(image, centers, half, layers, progress=None, done=0, total=0):
+    '''Нанесение одинаковых фигур с центрами centers (N,2, пиксели) на изображение (H,W,3) uint8.
+    half - половина размера фигуры, layers - список (функция покрытия от смещений пикселя dx, dy, цвет (r, g, b)),
+    слои накладываются по порядку с учетом доли покрытия (сглаживание), для пикселя, общего для нескольких фигур пакета,
+    берется наибольшая доля. Позиции обрабатываются пакетами, так что объем промежуточных массивов не превышает
+    EXPORT_BATCH элементов'''
+    height, width = image.shape[:2]
+    pixels = image.reshape(-1, 3)
+    k = int(math.ceil(half)) + 1
+    oy, ox = (offset.ravel() for offset in np.mgrid[-k:k + 1, -k:k + 1])
+    batch = max(1, EXPORT_BATCH // len(ox))
+    for start in range(0, len(centers), batch):
+        c = centers[start:start + batch]
+        base = np.floor(c).astype(np.int64)
+        px, py = base[:, 0:1] + ox, base[:, 1:2] + oy
+        dx, dy = px + 0.5 - c[:, 0:1], py + 0.5 - c[:, 1:2]
+        alphas = [np.clip(func(dx, dy), 0, 1) for func, rgb in layers]
+        mask = (px >= 0) & (px < width) & (py >= 0) & (py < height) & (sum(alphas) > 0)
+        index, inverse = np.unique((py * width + px)[mask], return_inverse=True)
+        values = pixels[index].astype(np.float32)
+        for alpha, (func, rgb) in zip(alphas, layers):
+            merged = np.zeros(len(index), dtype=np.float32)
+            np.maximum.at(merged, inverse, alpha[mask])
+            values = values * (1 - merged[:, None]) + np.array(rgb, dtype=np.float32) * merged[:, None]
+        pixels[index] = np.round(values).astype(np.uint8)
+        if progress:
+            progress(done + start + len(c), total, 'sites')
+
+def render_png(arrange, colors, dpi=EXPORT_DPI, progress=None):
+    # растровое изображение (H,W,3) uint8, ТВЭЛ одного типа наносятся пакетами одной функцией stamp
+    half, layers, marks, circles = get_scene(arrange, colors)
+    scale = dpi / MM_PER_INCH # пикселей на мм
+    size = max(1, int(math.ceil(2 * half * scale)))
+    if size * size > EXPORT_MAX_PIXELS:
+        raise ArrangeDataError("Изображение {0}x{0} точек слишком велико, уменьшите разрешение".format(size))
+    image = np.empty((size, size, 3), dtype=np.uint8)
+    image[:] = to_rgb(BACKGROUND)
+    to_pixels = lambda coords: np.column_stack(((coords[:, 0] + half) * scale, (half - coords[:, 1]) * scale))
+    r, line = arrange.r_tvel * scale, max(1.0, EXPORT_LINE * scale)
+    fill = lambda dx, dy: r + 0.5 - np.hypot(dx, dy)
+    outline = lambda dx, dy: line / 2 + 0.5 - np.abs(np.hypot(dx, dy) - r + line / 2)
+    total, done = arrange.get_size(), 0
+    for rgb, coords in layers:
+        stamp(image, to_pixels(coords), r, [(fill, rgb), (outline, (0, 0, 0))], progress, done, total)
+        done += len(coords)
+    bar = lambda a, b: np.minimum(r / 2 + 0.5 - np.abs(a), line + 0.5 - np.abs(b)) # отрезок креста длиной r, толщиной 2*line
+    stamp(image, to_pixels(marks), r / 2 + line, [(lambda dx, dy: np.maximum(bar(dx, dy), bar(dy, dx)), (0, 0, 0))])
+    for radius in circles:
+        points = dash_points(radius, arrange.step, line / scale / 2)
+        stamp(image, to_pixels(points), line, [(lambda dx, dy: line + 0.5 - np.hypot(dx, dy), (0, 0, 0))])
+    return image
+
+def png_bytes(image, dpi):
+    # кодирование PNG (RGB, 8 бит) без сторонних библиотек: строки без фильтра, сжатие zlib, разрешение в блоке pHYs
+    height, width = image.shape[:2]
+    raw = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    raw[:, 1:] = image.reshape(height, -1)
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    ppm = int(round(dpi / MM_PER_INCH * 1000)) # точек на метр
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)) +
+            chunk(b'pHYs', struct.pack('>IIB', ppm, ppm, 1)) + chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)) + chunk(b'IEND', b''))
+
+def format_rows(template, *columns):
+    # форматирование столбцов чисел построчно по шаблону одной операцией
+    return "".join(map(template.format, *(np.round(column, 4).tolist() for column in columns)))
+
+def svg_text(arrange, colors, progress=None):
+    half, layers, marks, circles = get_scene(arrange, colors)
+    r, line = arrange.r_tvel, EXPORT_LINE
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n',
+             '<svg xmlns="http://www.w3.org/2000/svg" width="{0}mm" height="{0}mm" viewBox="{1} {1} {0} {0}">\n'.format(2 * half, -half),
+             '<rect x="{1}" y="{1}" width="{0}" height="{0}" fill="{2}"/>\n'.format(2 * half, -half, to_hex(to_rgb(BACKGROUND)))]
+    total, done = arrange.get_size(), 0
+    for rgb, coords in layers: # ось Y в SVG направлена вниз
+        parts.append('<g fill="{}" stroke="black" stroke-width="{}">\n'.format(to_hex(rgb), line))
+        parts.append(format_rows('<circle cx="{{}}" cy="{{}}" r="{}"/>\n'.format(r - line / 2), coords[:, 0], -coords[:, 1]))
+        parts.append('</g>\n')
+        done += len(coords)
+        if progress:
+            progress(done, total, 'sites')
+    if len(marks):
+        parts.append('<path fill="none" stroke="black" stroke-width="{}" d="'.format(2 * line))
+        parts.append(format_rows('M{{}} {{}}h{0}M{{}} {{}}v{0}'.format(r), marks[:, 0] - r / 2, -marks[:, 1], marks[:, 0], -marks[:, 1] - r / 2))
+        parts.append('"/>\n')
+    for radius in circles:
+        parts.append('<circle cx="0" cy="0" r="{}" fill="none" stroke="black" stroke-width="{}" stroke-dasharray="{}"/>\n'.format(
+                     radius, 2 * line, arrange.step))
+    parts.append('</svg>\n')
+    return "".join(parts)
+
+def circle_path(x, y, r):
+    # окружности с центрами x, y (массивы) радиуса r как замкнутые пути PDF из четырех кривых Безье
+    k = r * BEZIER_CIRCLE
+    return format_rows("{} {} m {} {} {} {} {} {} c {} {} {} {} {} {} c {} {} {} {} {} {} c {} {} {} {} {} {} c h\n",
+                       x + r, y, x + r, y + k, x + k, y + r, x, y + r, x - k, y + r, x - r, y + k, x - r, y,
+                       x - r, y - k, x - k, y - r, x, y - r, x + k, y - r, x + r, y - k, x + r, y)
+
+def pdf_bytes(arrange, colors, progress=None):
+    # одностраничный PDF: содержимое в координатах расстановки (мм) через матрицу cm, поток сжат FlateDecode
+    half, layers, marks, circles = get_scene(arrange, colors)
+    r, line = arrange.r_tvel, EXPORT_LINE
+    color = lambda rgb: "{:.4f} {:.4f} {:.4f}".format(*(c / 255 for c in rgb))
+    parts = ["{0} 0 0 {0} {1} {1} cm\n".format(PT_PER_MM, half * PT_PER_MM),
+             "{0} rg {1} {1} {2} {2} re f\n".format(color(to_rgb(BACKGROUND)), -half, 2 * half), "0 G {} w\n".format(line)]
+    total, done = arrange.get_size(), 0
+    for rgb, coords in layers:
+        parts.append("{} rg\n".format(color(rgb)))
+        parts.append(circle_path(coords[:, 0], coords[:, 1], r - line / 2))
+        parts.append("B\n")
+        done += len(coords)
+        if progress:
+            progress(done, total, 'sites')
+    parts.append("{} w\n".format(2 * line))
+    if len(marks):
+        parts.append(format_rows("{} {} m {} {} l {} {} m {} {} l\n", marks[:, 0] - r/2, marks[:, 1], marks[:, 0] + r/2, marks[:, 1],
+                                 marks[:, 0], marks[:, 1] - r/2, marks[:, 0], marks[:, 1] + r/2))
+        parts.append("S\n")
+    parts.append("[{0} {0}] 0 d\n".format(arrange.step))
+    for radius in circles:
+        parts.append(circle_path(np.zeros(1), np.zeros(1), radius) + "S\n")
+    stream = zlib.compress("".join(parts).encode('ascii'), 6)
+    size = 2 * half * PT_PER_MM
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>",
+               b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+               "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {0:.2f} {0:.2f}] /Contents 4 0 R >>".format(size).encode('ascii'),
+               b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream"]
+    data = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for n, item in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n" % n + item + b"\nendobj\n"
+    xref = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1) + b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    data += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(data)
+
+def export_image(arrange, filename, colors, dpi=EXPORT_DPI, progress=None):
+    '''Запись изображения расстановки, формат - по расширению filename (png, svg, pdf).
+    colors - цвета типов ТВЭЛ как в ini файле, dpi - разрешение PNG. Файл записывается целиком после построения
+    изображения: при ошибке или отмене (ArrangeCancelled из progress) он не создается'''
+    kind = Path(filename).suffix.lower().lstrip('.')
+    if kind == 'png':
+        data = png_bytes(render_png(arrange, colors, dpi, progress), dpi)
+    elif kind == 'svg':
+        data = svg_text(arrange, colors, progress).encode('utf-8')
+    elif kind == 'pdf':
+        data = pdf_bytes(arrange, colors, progress)
+    else:
+        raise ArrangeDataError("Формат изображения должен быть одним из: {}".format(", ".join(IMAGE_FORMATS)))
+    Path(filename).write_bytes(data)
@@ -0,0 +1,1730 @@
+'''Программа для формирования картограммы размещения ТВЭЛ в узлах правильной треугольной решетки.
+Позволяет создавать и редактировать расстановки с неограниченным числом типов ТВЭЛ,
+а также различным образом манипулировать с расстановкой на координатной плоскости.
+Расстановка хранится в файле в текстовом виде в формате:
+1 строка: радиус ТВЭЛ, шаг решетки, внутренний радиус, внешний радиус [, смещение центра (x, y), угол поворота (град) [, mirror - признак отражения] ]
+2 и далее: столбец, ряд, тип ТВЭЛ
+далее для каждого слоя пометок: строка [имя слоя], затем строки: столбец, ряд
+или в двоичном виде (расширение .tvb): заголовок с параметрами расстановки, упакованные массивы столбцов, рядов, типов и маски слоев пометок
+Координаты хранятся в отдельных файлax для каждого типа твэл и каждого слоя пометок в текстовом виде в формате x,y
+
+Пакетная запись координат без графического интерфейса: reactor360.py --coords файлы_или_директории [--jobs N]
+Замеры операций интерфейса: reactor360.py --profile [трасса.json | статистика.prof], просмотр - меню Помощь/Профилирование
+Подбор параметров решетки: меню Сервис/Подбор параметров или reactor360.py --sweep радиусы шаги Rin Rout [--output таблица.csv|json]
+Изображение расстановки (PNG, SVG, PDF): меню Расстановка/Экспорт изображения или reactor360.py --image файл изображение [--dpi N]
+
+Пометки ТВЭЛ ведутся в именованных слоях (меню Сервис/Слои пометок): текущий слой, показ на холсте, создание и удаление.
+При вводе параметров в диалоге "Создать" на холсте показываются контуры будущей расстановки и число ТВЭЛ.
+
+Чтение и запись файлов выполняются в фоне, ход операции показывается в строке состояния, кнопка "Прервать" отменяет ее.
+
+Управление: добавить/удалить элемент - левая кнопка мышки, изменение масштаба - колесико мышки, сдвижка экрана - перемещение мыши с зажатой правой кнопкой
+'''
+VERSION_INFO = "Версия 3.0 релиз Python\n (C)&(P) Ванюков Е.Е.\n\t2005 - 2022"
+
+from random import randint
+from tkinter import filedialog, messagebox, colorchooser, PhotoImage
+from tkinter.ttk import Combobox, Treeview
+from tkinter import *
+import math
+import json
+import time
+import numpy as np
+from pathlib import *
+from collections import deque
+import functools
+import cProfile
+import queue
+import threading
+from arrange360 import (Arrange, ArrangeError, Comparison, ArrangeCancelled, ArrangeFileError, History, HISTORY_BUDGET, F_EXT, BIN_EXT, SIN_60,
+                        DEFAULT_LAYER, data_consistency, diff_report)
+from export360 import IMAGE_FORMATS, EXPORT_DPI, export_image, stamp, to_hex
+from sweep360 import SWEEP_FIELDS, TABLE_FORMATS, LatticeCache, parse_values, sweep, write_table
+
+
+#Системные параметры
+ICON_NAME = 'reactor360.ico'
+INI_FILE = 'reactor360.ini'
+DEFAULT_NAME = '' #'noname.' + F_EXT
+LOD_SQUARE = 4  # радиус ТВЭЛ на экране (пикс.), ниже которого ТВЭЛ рисуются квадратами без контура
+LOD_RASTER = 1.5  # радиус ТВЭЛ на экране (пикс.), ниже которого расстановка выводится растровым изображением
+LOD_MAX_ITEMS = 20000  # наибольшее число ТВЭЛ в окне, выводимых отдельными элементами холста, при большем - растровое изображение
+CULL_MARGIN = 0.25  # запас отрисовки за краями окна (доля размера окна)
+MAX_PROBLEMS = 20  # число ошибочных строк, показываемых при открытии файла
+FRAME_INTERVAL = 16  # минимальный интервал между кадрами перерисовки, мс
+PROFILE_SAMPLES = 10000  # число последних замеров операции для расчета p50/p95 и записей в трассе
+IO_POLL_INTERVAL = 100  # интервал опроса операции с файлом в рабочем потоке, мс
+IO_QUIT_TIMEOUT = 5  # наибольшее время ожидания прерванной операции с файлом при выходе, с
+JOB_UNITS = {'lines': "строк", 'sites': "твэл", 'rows': "вариантов"} # единицы хода операции (кроме байт)
+SWEEP_CHART_HEIGHT = 260  # высота графика подбора параметров, пикс.
+PREVIEW_DELAY = 150  # пауза во вводе параметров создаваемой расстановки, после которой обновляется предпросмотр, мс
+PREVIEW_MAX_SITES = 2000000  # наибольшее число узлов решетки в предпросмотре создаваемой расстановки
+PREVIEW_COLOR = '#b0b0b0'  # цвет контуров ТВЭЛ и границ в предпросмотре
+LAYER_COLORS = ['black', 'blue', 'darkorange', 'purple', 'brown', 'teal'] # цвета пометок слоев в порядке создания слоев
+SWEEP_COLORS = ['blue', 'red', 'green', 'magenta', 'orange', 'black', 'cyan', 'brown'] # цвета линий графика подбора параметров
+PROGRAM_NAME = ' А.З. '
+
+# Меню
+M_ARRANGE = 'Расстановка'
+M_CREATE = 'Создать'
+M_OPEN = 'Открыть...'
+M_SAVE = 'Сохранить'
+M_SAVE_AS = 'Сохранить как...'
+M_SAVE_COORD = 'Сохранить координаты'
+M_EXPORT_IMAGE = 'Экспорт изображения...'
+M_COMPARE = 'Сравнить с...'
+M_COMPARE_OFF = 'Скрыть сравнение'
+M_QUIT = "Выйти"
+M_PUT = 'Твэл'
+M_CLEAR = 'Очистить'
+M_TVEL = 'тип '
+M_TVEL_ADD_TYPE = "Добавить тип"
+M_SERVIS = "Сервис"
+M_ROTATE = "Повернуть"
+M_MOVE_CENTER = "Сместить центр"
+M_REBUILD = "Перестроить с другим шагом"
+M_REFLECT = "Зеркально относительно Y"
+M_RESET = "Вернуть в исходное"
+M_UNDO = "Отменить (Ctrl+Z)"
+M_REDO = "Повторить (Ctrl+Y)"
+M_BEAM = "Луч"
+M_CIRCLE = "Окружность"
+M_SCALE = "Изменить масштаб"
+M_MARK = "Отметить твэл"
+M_REGION_RING = "Область: кольцо"
+M_REGION_SECTOR = "Область: сектор"
+M_REGION_BEAM = "Область: слева от луча"
+M_REGION_POLYGON = "Область: многоугольник"
+M_SWEEP = "Подбор параметров"
+M_LAYERS = "Слои пометок..."
+REGION_ACTIONS = {'retype': "Заменить тип на выбранный", 'fill': "Заполнить выбранным типом",
+                  'clear': "Удалить", 'mark': "Пометить", 'unmark': "Снять пометку"} # действия над областью, тип - из меню Твэл, пометки - в текущем слое
+M_OPTIONS = "Настройки"
+M_COLORS = "Цвета твэл"
+M_HELP = "Помощь"
+M_ABOUT = 'О программе'
+M_VERSION = "Версия"
+M_PROFILE = "Профилирование"
+M_PROFILE_SAVE = "Сохранить профиль..."
+BASE_COLORS = ['magenta', 'red', 'green', 'yellow']
+BASE_MENU = {M_ARRANGE: [M_CREATE, M_OPEN, M_SAVE, M_SAVE_AS, M_SAVE_COORD, M_EXPORT_IMAGE, M_COMPARE, M_COMPARE_OFF, M_QUIT],
+                M_PUT: [M_CLEAR, M_TVEL_ADD_TYPE],
+                M_SERVIS : [M_UNDO, M_REDO, M_ROTATE, M_MOVE_CENTER, M_REFLECT, M_REBUILD, M_RESET, M_BEAM ,M_CIRCLE, M_SCALE,  M_MARK, M_LAYERS,
+                             M_REGION_RING, M_REGION_SECTOR, M_REGION_BEAM, M_REGION_POLYGON, M_SWEEP],  
+                M_OPTIONS: [M_COLORS],
+                M_HELP: [M_ABOUT, M_VERSION, M_PROFILE, M_PROFILE_SAVE],
+                }
+
+#Параметры
+PARAM_RADIUS = "Радиус твэл:"
+PARAM_STEP = "Шаг решетки:"
+PARAM_RIN = "Внутренний радиус:"
+PARAM_ROUT = "Внешний радиус:"
+SWEEP_HEADINGS = ("Радиус твэл", "Шаг", "Rin", "Rout", "Число твэл", "Крайний радиус", "Заполнение") # заголовки столбцов SWEEP_FIELDS
+
+parameters = [PARAM_RADIUS, PARAM_STEP, PARAM_RIN, PARAM_ROUT]
+
+def RGB(red,green,blue): return '#%02x%02x%02x' % (int(red), int(green) , int(blue))
+
+def rand_color(): return RGB(randint(0,255), randint(0,255), randint(0,255))
+
+class Profiler():
+    '''Замеры длительности операций интерфейса, включаются ключом --profile или настройкой "profile": true в ini файле.
+    Для каждой операции хранятся число вызовов, суммарное время и последние PROFILE_SAMPLES длительностей (для p50/p95),
+    счетчики значений (например, число элементов холста, созданных при перерисовке) и трасса вызовов.
+    В выключенном состоянии обертка profiled только проверяет флаг enabled'''
+    def __init__(self):
+        self.enabled = False
+        self.start = time.perf_counter()
+        self.stats = {} # имя -> [число вызовов, сумма, deque последних значений]
+        self.trace = deque(maxlen=PROFILE_SAMPLES) # (имя, начало, длительность), с от включения
+        self.cprofile = None
+
+    def enable(self, cprofile=False):
+        self.enabled = True
+        self.start = time.perf_counter()
+        if cprofile:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def record(self, name, start, duration):
+        self.count(name, duration)
+        self.trace.append((name, start - self.start, duration))
+
+    def count(self, name, value):
+        item = self.stats.setdefault(name, [0, 0, deque(maxlen=PROFILE_SAMPLES)])
+        item[0] += 1
+        item[1] += value
+        item[2].append(value)
+
+    def report(self):
+        # имя -> число, сумма, p50, p95 (для длительностей - в секундах)
+        return {name: {'count': count, 'total': total, 'p50': float(np.percentile(values, 50)), 'p95': float(np.percentile(values, 95))}
+                for name, (count, total, values) in sorted(self.stats.items())}
+
+    def dump(self, filename):
+        '''Запись профиля сессии: .prof - статистика cProfile (если включен), иначе JSON в формате
+        Trace Event (открывается в chrome://tracing) с итоговой таблицей в поле "stats"'''
+        if Path(filename).suffix == ".prof":
+            if self.cprofile is None:
+                raise ValueError("cProfile is not enabled")
+            self.cprofile.dump_stats(filename)
+            return
+        events = [{'name': name, 'ph': 'X', 'ts': start * 1e6, 'dur': duration * 1e6, 'pid': 0, 'tid': 0}
+                  for name, start, duration in self.trace]
+        Path(filename).write_text(json.dumps({'traceEvents': events, 'stats': self.report()}, indent=1))
+
+PROFILER = Profiler()
+
+def profiled(name):
+    # декоратор замера длительности вызова
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                PROFILER.record(name, start, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+class ServiceDialog():
+    def __init__(self, parrent, *args, title = "", geometry = "250x250+200+200", func = lambda: True, choices = (), on_change = None):
+        self.dlg = Toplevel(parrent, bd = 3)
+        self.dlg.title(title)
+        self.dlg.geometry(geometry)
+        self.dlg.resizable(width = False, height= False)
+        if (Path(ICON_NAME).exists()):
+            self.dlg.iconbitmap(ICON_NAME)
+        self.dlg.grab_set()
+        #self.window = Label(self.dlg)
+        labels = []
+        self.entrys = []
+        for i in range(len(args)):
+            labels.append(Label(self.dlg, text = args[i]))
+            #label_r.place(relx=0, rely=0.5, height=20, width=100)
+            labels[i].pack(pady=5)
+            self.entrys.append(Entry(self.dlg, width=10))
+            self.entrys[i].pack(pady=3)
+        self.choice = None
+        if choices: # выбор из списка под полями ввода
+            self.choice = Combobox(self.dlg, values = list(choices), state = 'readonly')
+            self.choice.current(0)
+            self.choice.pack(pady=5)
+        self.info = None
+        if on_change: # строка сведений под полями ввода, on_change(диалог) вызывается при каждом изменении полей
+            self.info = Label(self.dlg, text = "")
+            self.info.pack(pady=3)
+            for entry in self.entrys:
+                entry.bind("<KeyRelease>", lambda event: on_change(self))
+        
+        last = self.entrys[-1] if self.entrys else self.choice
+        (self.entrys[0] if self.entrys else self.choice).focus_set() 
+        last.bind("<Return>", lambda obj=self: func(self))
+              
+        button_ok = Button( self.dlg, text = "Ок", command = lambda obj=self: func(self)) 
+        button_ok.bind("<Return>", lambda obj=self: func(self))
+        button_ok.pack(side='left', pady = 10, padx=20)
+        button_cancel = Button(self.dlg, text="Отмена", command = self.destroy) 
+        button_cancel.bind("<Return>", self.destroy)
+        button_cancel.pack(side='right',pady = 10, padx=20)
+        self.dlg.bind("<Escape>", self.destroy)
+    
+    def get_value(self):
+        try:
+            return [float(i.get()) for i in self.entrys]
+        except:
+            messagebox.showerror("Ошибка типа данных!", "Попробуйте еще раз...")
+    
+    def get_choice(self):
+        return self.choice.current()
+
+    def destroy(self, *args):
+        self.dlg.destroy()
+       
+
+class ResizingCanvas(Canvas):
+    def __init__(self,parent,**kwargs):
+        Canvas.__init__(self,parent,**kwargs)
+        self.bind("<Configure>", self.on_resize)
+        self.height = self.winfo_reqheight()
+        self.width = self.winfo_reqwidth()
+        self.parent = parent
+        self.x0 = 0
+        self.y0 = 0
+
+    def on_resize(self,event):
+        # determine the ratio of old width/height to new width/height
+        wscale = float(event.width)/self.width
+        hscale = float(event.height)/self.height
+
+        self.width = event.width 
+        self.height = event.height 
+
+        # resize the canvas 
+        self.config(width=self.width, height=self.height)
+        # rescale all the objects tagged with the "all" tag
+        # self.scale("all",0,0,wscale,hscale)
+        if(self.parent.arrange != None):
+            self.parent.frames.request('resize', self.fit)
+            self.parent.frames.request('draw', self.parent.draw_arrange)
+
+    def fit(self):
+        self.parent.get_scale()
+        self.set_center()
+    
+    def get_center(self):
+        return self.width/2 + self.x0, self.height/2 - self.y0
+    
+    def set_center(self, *args):
+        if args == ():
+            self.x0 = 0
+            self.y0 = 0
+        else:
+            self.x0 = args[0]
+            self.y0 = args[1]
+
+class FrameScheduler():
+    '''Объединение запросов на перерисовку: запросы, поступившие до очередного кадра, выполняются один раз
+    (повторный запрос задачи заменяет предыдущий) в порядке ORDER, кадры - не чаще одного за interval мс'''
+    ORDER = ('resize', 'draw', 'motion')
+
+    def __init__(self, widget, interval=FRAME_INTERVAL):
+        self.widget = widget
+        self.interval = interval
+        self.pending = {}
+        self.job = None
+        self.last = 0
+
+    def request(self, name, func):
+        self.pending[name] = func
+        if self.job is None:
+            delay = int(self.interval - (time.perf_counter() - self.last) * 1000)
+            if delay > 0:
+                self.job = self.widget.after(delay, self.flush)
+            else:
+                self.job = self.widget.after_idle(self.flush)
+
+    def flush(self):
+        self.job = None
+        self.last = time.perf_counter()
+        pending, self.pending = self.pending, {}
+        for name in sorted(pending, key=lambda name: self.ORDER.index(name) if name in self.ORDER else len(self.ORDER)):
+            pending[name]()
+
+
+class SweepWindow():
+    '''Результаты подбора параметров: таблица вариантов (сортировка - щелчок по заголовку), график числа ТВЭЛ
+    от параметра с наибольшим числом значений (линия соединяет варианты с одинаковыми остальными параметрами),
+    открытие выбранного варианта как новой расстановки (кнопка или двойной щелчок) и запись таблицы в CSV/JSON'''
+    def __init__(self, parent, rows, open_row, save_table):
+        self.rows = rows
+        self.dlg = Toplevel(parent, bd = 3)
+        self.dlg.title("{}: {} вариантов".format(M_SWEEP, len(rows)))
+        self.dlg.geometry('720x620' + parent.start_position_askdialog)
+        if (Path(ICON_NAME).exists()):
+            self.dlg.iconbitmap(ICON_NAME)
+        buttons = Frame(self.dlg)
+        buttons.pack(side=BOTTOM, fill=X, pady=5)
+        Button(buttons, text = "Открыть", command = lambda: self.selected() is not None and open_row(rows[self.selected()])).pack(side=LEFT, padx=10)
+        Button(buttons, text = "Сохранить таблицу...", command = lambda: save_table(rows)).pack(side=LEFT, padx=10)
+        Button(buttons, text = "Закрыть", command = self.dlg.destroy).pack(side=RIGHT, padx=10)
+        self.chart = Canvas(self.dlg, bg='white', height=SWEEP_CHART_HEIGHT)
+        self.chart.pack(side=BOTTOM, fill=X)
+        frame = Frame(self.dlg)
+        frame.pack(fill=BOTH, expand=True)
+        self.table = Treeview(frame, columns=SWEEP_FIELDS, show='headings')
+        for name, text in zip(SWEEP_FIELDS, SWEEP_HEADINGS):
+            self.table.heading(name, text=text, command=lambda name=name: self.sort(name))
+            self.table.column(name, width=90, anchor=E)
+        scroll = Scrollbar(frame, command=self.table.yview)
+        self.table.configure(yscrollcommand=scroll.set)
+        scroll.pack(side=RIGHT, fill=Y)
+        self.table.pack(fill=BOTH, expand=True)
+        for n, row in enumerate(rows):
+            self.table.insert('', 'end', iid=str(n), values=("{:g}".format(row['r_tvel']), "{:g}".format(row['step']), "{:g}".format(row['r_in']),
+                              "{:g}".format(row['r_out']), row['count'], "{:.3f}".format(row['max_radius']), "{:.4f}".format(row['fill'])))
+        self.order = None
+        self.points = np.empty((0, 2))
+        self.table.bind('<<TreeviewSelect>>', self.draw_selection)
+        self.table.bind('<Double-1>', lambda event: self.selected() is not None and open_row(rows[self.selected()]))
+        self.chart.bind('<Configure>', self.draw_chart)
+        self.chart.bind('<Button-1>', self.pick)
+
+    def selected(self):
+        selection = self.table.selection()
+        return int(selection[0]) if selection else None
+
+    def sort(self, name):
+        # повторный щелчок по заголовку меняет порядок на обратный
+        reverse = self.order == (name, False)
+        self.order = (name, reverse)
+        for index, n in enumerate(sorted(range(len(self.rows)), key=lambda n: self.rows[n][name], reverse=reverse)):
+            self.table.move(str(n), '', index)
+
+    def draw_chart(self, event=None):
+        chart = self.chart
+        chart.delete('all')
+        width, height = chart.winfo_width(), chart.winfo_height()
+        left, right, top, bottom = 60, 15, 15, 30
+        x_name = max(SWEEP_FIELDS[:4], key=lambda name: len({row[name] for row in self.rows}))
+        x = np.array([row[x_name] for row in self.rows])
+        y = np.array([row['count'] for row in self.rows], dtype=float)
+        x_lo, x_hi = x.min(), x.max() if x.max() > x.min() else x.min() + 1
+        y_hi = max(y.max(), 1)
+        self.points = np.column_stack((left + (x - x_lo) / (x_hi - x_lo) * (width - left - right), height - bottom - y / y_hi * (height - top - bottom)))
+        chart.create_line(left, top, left, height - bottom, width - right, height - bottom)
+        chart.create_text(left - 5, top, text="{:g}".format(y_hi), anchor=E)
+        chart.create_text(left - 5, height - bottom, text="0", anchor=E)
+        chart.create_text(left, height - bottom + 5, text="{:g}".format(x_lo), anchor=N)
+        chart.create_text(width - right, height - bottom + 5, text="{:g}".format(x_hi), anchor=NE)
+        chart.create_text((left + width - right) / 2, height - bottom + 5, text="{} -> {}".format(SWEEP_HEADINGS[SWEEP_FIELDS.index(x_name)], SWEEP_HEADINGS[4]), anchor=N)
+        series = {}
+        for n, row in enumerate(self.rows):
+            series.setdefault(tuple(row[name] for name in SWEEP_FIELDS[:4] if name != x_name), []).append(n)
+        for k, members in enumerate(series.values()):
+            color = SWEEP_COLORS[k % len(SWEEP_COLORS)]
+            members.sort(key=lambda n: x[n])
+            if len(members) > 1:
+                chart.create_line(*self.points[members].ravel().tolist(), fill=color)
+            else:
+                px, py = self.points[members[0]].tolist()
+                chart.create_oval(px - 2, py - 2, px + 2, py + 2, fill=color, outline=color)
+        self.draw_selection()
+
+    def draw_selection(self, event=None):
+        self.chart.delete('selected')
+        n = self.selected()
+        if n is not None and n < len(self.points):
+            px, py = self.points[n].tolist()
+            self.chart.create_oval(px - 5, py - 5, px + 5, py + 5, width=2, outline='red', tags='selected')
+
+    def pick(self, event):
+        # выбор варианта, ближайшего к точке щелчка на графике
+        if len(self.points):
+            n = int(np.hypot(self.points[:, 0] - event.x, self.points[:, 1] - event.y).argmin())
+            self.table.selection_set(str(n))
+            self.table.see(str(n))
+
+
+class FileJob():
+    '''Операция с файлом в рабочем потоке: func(progress) выполняется в потоке, сообщения о ходе, результат или исключение
+    передаются через очередь, которую интерфейс опрашивает методом poll (tkinter вызывается только из главного потока).
+    Отмена устанавливает флаг, при очередном сообщении о ходе модель получает ArrangeCancelled и удаляет недописанные файлы.
+    done(результат) и failed(исключение) вызываются интерфейсом по завершении, write - операция записи'''
+    def __init__(self, name, title, func, done, failed, write=False):
+        self.name = name # имя для замеров профилирования
+        self.title = title
+        self.done = done
+        self.failed = failed
+        self.write = write
+        self.messages = queue.Queue()
+        self.cancelled = threading.Event()
+        self.progress = None # последнее сообщение о ходе: (сделано, всего, единица)
+        self.start = time.perf_counter()
+        self.thread = threading.Thread(target=self.run, args=(func,), daemon=True)
+        self.thread.start()
+
+    def run(self, func):
+        try:
+            self.messages.put(('done', func(self.report)))
+        except Exception as error:
+            self.messages.put(('error', error))
+
+    def report(self, done, total, unit):
+        if self.cancelled.is_set():
+            raise ArrangeCancelled("Операция прервана")
+        self.messages.put(('progress', (done, total, unit)))
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def poll(self):
+        # разбор накопившихся сообщений, по завершении возвращает ('done', результат) или ('error', исключение), иначе None
+        try:
+            while True:
+                kind, value = self.messages.get_nowait()
+                if kind != 'progress':
+                    return kind, value
+                self.progress = value
+        except queue.Empty:
+            return None
+
+    def status(self):
+        if self.progress is None:
+            return "  {}...".format(self.title)
+        done, total, unit = self.progress
+        if unit == 'bytes':
+            return "  {}: {:.1f} из {:.1f} МБ".format(self.title, done / 2**20, total / 2**20)
+        return "  {}: {} из {} {}".format(self.title, done, total, JOB_UNITS[unit])
+
+
+class CanvasRenderer():
+    '''Отрисовка расстановки в удерживаемом режиме: элемент холста создается один раз на позицию ТВЭЛ
+    и хранится в таблице (i, j) -> id. Сдвиг и масштаб выполняются средствами холста (move/scale),
+    полная перестройка - при изменении геометрии расстановки (шаг, поворот, смещение центра, радиус ТВЭЛ),
+    уровня детализации или при выходе окна за пределы отрисованной области.
+    Рисуются только ТВЭЛ в пределах окна (с запасом CULL_MARGIN). Уровень детализации зависит от радиуса ТВЭЛ на экране:
+    'oval' - круги с контуром, 'square' - квадраты без контура, 'raster' - одно растровое изображение всей видимой области
+    (также при числе ТВЭЛ в окне больше LOD_MAX_ITEMS).
+    Теги элементов: 'site' - все, что привязано к узлам решетки, 't<тип>' - ТВЭЛ данного типа,
+    'mark' и 'layer_<имя слоя>' - пометки слоя (скрытые слои - в состоянии hidden), 'cursor' - указатель, 'decor' - оси и границы (перерисовываются при каждом изменении вида),
+    'overlay' и '<имя слоя>' - контуры позиций слоев выделения (нарушения геометрии, отличия при сравнении),
+    'preview' - предпросмотр создаваемой расстановки'''
+    photo_image = PhotoImage # фабрика изображений для растрового режима
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.arrange = None
+        self.items = {} # (i, j) -> id элемента ТВЭЛ
+        self.marks = {} # (i, j) -> [id] линий пометок всех слоев
+        self.hidden = set() # скрытые слои пометок
+        self.geometry = None
+        self.colors = []
+        self.view = None # (x0, y0, scale), для которых рассчитаны координаты элементов холста
+        self.lod = None
+        self.lod_level = None # уровень детализации по радиусу ТВЭЛ на экране, self.lod - фактический
+        self.region = None # (xmin, xmax, ymin, ymax) - область расстановки, для которой созданы элементы
+        self.image = None
+        self.cursor = None
+        self.overlays = {} # имя слоя -> (позиции (N,2), цвет контура, радиус контура в радиусах ТВЭЛ)
+        self.preview = None
+
+    def get_geometry(self, arrange):
+        return (arrange.step, arrange.rotation, tuple(arrange.position), arrange.r_tvel, arrange.mirror)
+
+    def get_lod(self, scale):
+        r = self.arrange.r_tvel * scale
+        if r < LOD_RASTER:
+            return 'raster'
+        if r < LOD_SQUARE:
+            return 'square'
+        return 'oval'
+
+    def get_window(self, view, margin=0):
+        # видимая область окна (с запасом margin от размера окна) в координатах расстановки
+        x0, y0, scale = view
+        dx, dy = self.canvas.width * margin, self.canvas.height * margin
+        return ((-dx - x0)/scale, (self.canvas.width + dx - x0)/scale, (y0 - self.canvas.height - dy)/scale, (y0 + dy)/scale)
+
+    def covers(self, view):
+        xmin, xmax, ymin, ymax = self.get_window(view)
+        return (self.region[0] <= xmin and xmax <= self.region[1] and self.region[2] <= ymin and ymax <= self.region[3])
+
+    def in_region(self, coords):
+        r = self.arrange.r_tvel
+        xmin, xmax, ymin, ymax = self.region
+        return ((coords[:, 0] >= xmin - r) & (coords[:, 0] <= xmax + r) & (coords[:, 1] >= ymin - r) & (coords[:, 1] <= ymax + r))
+
+    def draw(self, arrange, colors, view):
+        if arrange is self.arrange and self.geometry is not None and self.get_geometry(arrange) != self.geometry:
+            self.follow(arrange)
+        if (arrange is not self.arrange or self.get_geometry(arrange) != self.geometry or self.get_lod(view[2]) != self.lod_level
+                or not self.covers(view) or (self.lod == 'raster' and (view[2] != self.view[2] or list(colors) != self.colors))):
+            self.rebuild(arrange, colors, view)
+            return
+        if list(colors) != self.colors:
+            self.recolor(colors)
+        if view != self.view:
+            self.set_view(view)
+
+    def follow(self, arrange):
+        '''Смещение центра и отражение расстановки (при угле поворота, кратном 180) переводятся в перемещение
+        уже созданных элементов холста: новые координаты u' = S*u + t, S - отражение по оси X или единичное'''
+        step, rotation, position, r_tvel, mirror = self.geometry
+        if self.lod == 'raster' or (step, rotation, r_tvel) != (arrange.step, arrange.rotation, arrange.r_tvel):
+            return
+        flip = mirror != arrange.mirror
+        if flip and rotation % 180 != 0:
+            return
+        _, cos_a, sin_a = arrange.get_transform()
+        rotate = lambda x, y: (x * cos_a - y * sin_a, x * sin_a + y * cos_a) # узел (0, 0) находится в повернутой точке смещения центра
+        old, new = rotate(*position), rotate(*arrange.position)
+        tx, ty = new[0] - (-old[0] if flip else old[0]), new[1] - old[1]
+        x0, y0, scale = self.view
+        xmin, xmax, ymin, ymax = self.region
+        if flip:
+            self.canvas.scale('site', x0, y0, -1, 1)
+            xmin, xmax = -xmax, -xmin
+        self.canvas.move('site', tx * scale, - ty * scale)
+        self.region = (xmin + tx, xmax + tx, ymin + ty, ymax + ty)
+        self.geometry = self.get_geometry(arrange)
+
+    def to_screen(self, coords):
+        x0, y0, scale = self.view
+        return np.column_stack((x0 + coords[:, 0] * scale, y0 - coords[:, 1] * scale))
+
+    @profiled('render.rebuild')
+    def rebuild(self, arrange, colors, view):
+        self.canvas.delete("all")
+        self.items.clear()
+        self.marks.clear()
+        self.image = None
+        self.arrange = arrange
+        self.geometry = self.get_geometry(arrange)
+        self.colors = list(colors)
+        self.view = view
+        self.lod = self.lod_level = self.get_lod(view[2])
+        self.region = self.get_window(view, CULL_MARGIN)
+        visible = []
+        if self.lod != 'raster':
+            for type in arrange.tvel:
+                indices = arrange.get_index_array(arrange.tvel[type])
+                coords = arrange.get_coords(indices)
+                mask = self.in_region(coords)
+                visible.append((type, indices[mask], coords[mask]))
+            if sum(len(item[1]) for item in visible) > LOD_MAX_ITEMS:
+                self.lod = 'raster'
+        self.draw_decor()
+        if self.lod == 'raster':
+            self.draw_raster()
+        else:
+            r = arrange.r_tvel * view[2]
+            for type, indices, coords in visible:
+                for i, j, x, y in zip(*indices.T.tolist(), *self.to_screen(coords).T.tolist()):
+                    self.items[(i, j)] = self.create_tvel(x, y, r, type)
+            for name in arrange.get_layers():
+                indices = arrange.get_layer(name)
+                coords = arrange.get_coords(indices)
+                visible = self.in_region(coords)
+                for i, j, x, y in zip(*indices[visible].T.tolist(), *self.to_screen(coords[visible]).T.tolist()):
+                    self.marks.setdefault((i, j), []).extend(self.create_mark(x, y, r, name))
+        for name in self.overlays:
+            self.draw_overlay(name)
+        self.cursor = self.canvas.create_oval(0, 0, 0, 0, width=1, outline='black', state='hidden', tags=('site', 'cursor'))
+        if PROFILER.enabled:
+            PROFILER.count('render.items', len(self.items) + sum(map(len, self.marks.values())) + (self.image is not None))
+
+    def set_overlay(self, name, indices, color, size=1.3):
+        # слой выделения позиций, перерисовывается только при изменении его содержимого
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1, 2)
+        if name in self.overlays and self.overlays[name][1:] == (color, size) and np.array_equal(self.overlays[name][0], indices):
+            return
+        self.overlays[name] = (indices, color, size)
+        self.draw_overlay(name)
+
+    def clear_overlay(self, name):
+        self.overlays.pop(name, None)
+        self.canvas.delete(name)
+
+    def draw_overlay(self, name):
+        # контуры позиций слоя рисуются поверх ТВЭЛ при любом уровне детализации
+        self.canvas.delete(name)
+        indices, color, size = self.overlays[name]
+        if self.view is None or not len(indices):
+            return
+        coords = self.arrange.get_coords(indices)
+        r = max(self.arrange.r_tvel * self.view[2] * size, 3)
+        for x, y in self.to_screen(coords[self.in_region(coords)]).tolist():
+            self.canvas.create_oval(x - r, y - r, x + r, y + r, width=2, outline=color, tags=('site', 'overlay', name))
+        self.canvas.tag_raise(name)
+
+    @profiled('render.preview')
+    def draw_preview(self, coords, r_tvel, step, r_in, r_out):
+        '''Предпросмотр создаваемой расстановки: контуры ТВЭЛ в позициях coords (N,2) одним растровым изображением
+        на весь холст поверх текущей расстановки, масштаб - по внешнему радиусу, как после создания'''
+        width, height = int(self.canvas.width), int(self.canvas.height)
+        scale = min(width, height) / (2 * r_out + step)
+        x0, y0 = width / 2, height / 2
+        image = np.empty((height, width, 3), dtype=np.uint8)
+        image[:] = self.get_rgb(self.canvas.cget('background'))
+        rgb = self.get_rgb(PREVIEW_COLOR)
+        centers = np.column_stack((x0 + coords[:, 0] * scale, y0 - coords[:, 1] * scale))
+        r = r_tvel * scale
+        if r < LOD_RASTER: # ТВЭЛ - точка
+            x, y = np.floor(centers).astype(np.int64).T
+            inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+            image[y[inside], x[inside]] = rgb
+        else:
+            stamp(image, centers, r, [(lambda dx, dy: 1 - np.abs(np.hypot(dx, dy) - r + 0.5), rgb)])
+        self.canvas.delete('preview')
+        self.preview = self.photo_image(master=self.canvas, width=width, height=height,
+                                        data=b'P6 %d %d 255 ' % (width, height) + image.tobytes(), format='PPM')
+        self.canvas.create_image(0, 0, image=self.preview, anchor='nw', tags='preview')
+        for radius in (r_out, r_in):
+            if radius > 0:
+                self.canvas.create_oval(x0 - radius*scale, y0 - radius*scale, x0 + radius*scale, y0 + radius*scale,
+                                        width=2, outline=PREVIEW_COLOR, dash=(6, 4), tags='preview')
+        self.canvas.tag_raise('preview')
+
+    def clear_preview(self):
+        self.canvas.delete('preview')
+        self.preview = None
+
+    def create_tvel(self, x, y, r, type):
+        tags = ('site', 't{}'.format(type))
+        if self.lod == 'square':
+            return self.canvas.create_rectangle(x - r, y - r, x + r, y + r, width=0,
+                                                activefill=self.colors[0], fill=self.colors[type], tags=tags)
+        return self.canvas.create_oval(x - r, y - r, x + r, y + r, width=1, outline='black',
+                                        activefill=self.colors[0], fill=self.colors[type], tags=tags)
+
+    def create_mark(self, x, y, r, name):
+        options = dict(width=2, fill=self.get_layer_color(name), state='hidden' if name in self.hidden else 'normal',
+                       tags=('site', 'mark', 'layer_' + name))
+        return (self.canvas.create_line(x - r/2, y, x + r/2, y, **options), self.canvas.create_line(x, y - r/2, x, y + r/2, **options))
+
+    def get_layer_color(self, name):
+        layers = self.arrange.get_layers()
+        return LAYER_COLORS[layers.index(name) % len(LAYER_COLORS)] if name in layers else LAYER_COLORS[0]
+
+    def show_layer(self, name, visible):
+        # включение/выключение слоя пометок, в растровом режиме изображение строится заново
+        if visible:
+            self.hidden.discard(name)
+        else:
+            self.hidden.add(name)
+        if self.arrange is None:
+            return
+        if self.lod == 'raster':
+            self.rebuild(self.arrange, self.colors, self.view)
+        else:
+            self.canvas.itemconfig('layer_' + name, state='normal' if visible else 'hidden')
+
+    def get_rgb(self, color):
+        return [c // 256 for c in self.canvas.winfo_rgb(color)]
+
+    def get_pixels(self, coords):
+        # левый верхний угол квадрата ТВЭЛ в пикселях растрового изображения
+        scale, size = self.view[2], self.pixel_size
+        return (np.round((coords[:, 0] - self.region[0]) * scale - size/2).astype(np.int64),
+                np.round((self.region[3] - coords[:, 1]) * scale - size/2).astype(np.int64))
+
+    def draw_raster(self):
+        # вся видимая область выводится одним изображением PPM, сформированным векторно
+        x0, y0, scale = self.view
+        xmin, xmax, ymin, ymax = self.region
+        width, height = int(math.ceil((xmax - xmin) * scale)), int(math.ceil((ymax - ymin) * scale))
+        self.pixel_size = max(1, int(round(2 * self.arrange.r_tvel * scale)))
+        image = np.empty((height, width, 3), dtype=np.uint8)
+        image[:] = self.get_rgb(self.canvas.cget('background'))
+        layers = [(self.arrange.get_index_array(self.arrange.tvel[type]), self.get_rgb(self.colors[type]), self.pixel_size) for type in self.arrange.tvel]
+        layers += [(self.arrange.get_layer(name), self.get_rgb(self.get_layer_color(name)), 1)
+                   for name in self.arrange.get_layers() if name not in self.hidden]
+        for indices, rgb, size in layers:
+            coords = self.arrange.get_coords(indices)
+            px, py = self.get_pixels(coords)
+            if size == 1: # пометка - центральная точка
+                px, py = px + self.pixel_size // 2, py + self.pixel_size // 2
+            for dx in range(size):
+                for dy in range(size):
+                    x, y = px + dx, py + dy
+                    inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+                    image[y[inside], x[inside]] = rgb
+        self.image = self.photo_image(master=self.canvas, width=width, height=height,
+                                      data=b'P6 %d %d 255 ' % (width, height) + image.tobytes(), format='PPM')
+        self.canvas.create_image(x0 + xmin * scale, y0 - ymax * scale, image=self.image, anchor='nw', tags=('site', 'raster'))
+        self.canvas.tag_raise('decor')
+
+    def draw_decor(self):
+        self.canvas.delete('decor')
+        x0, y0, scale = self.view
+        arrowshape = (scale/2, scale/2*1/0.8, scale/2*0.2/0.8) # arrowshape see https://anzeljg.github.io/rin2/book2/2405/docs/tkinter/create_line.html
+        self.canvas.create_line(x0, y0, x0 + 2*scale, y0 , arrow='last', arrowshape=arrowshape, tags='decor')
+        self.canvas.create_line(x0, y0, x0 , y0 - 2*scale , arrow='last', arrowshape=arrowshape, tags='decor')
+        for r in (self.arrange.r_out, self.arrange.r_in):
+            self.canvas.create_oval(x0 - r*scale, y0 - r*scale, x0 + r*scale, y0 + r*scale,
+                                    width=2, outline='black', dash=int(scale), tags='decor')
+        if self.lod == 'raster':
+            self.canvas.tag_raise('decor')
+        else:
+            self.canvas.tag_lower('decor')
+
+    def set_view(self, view):
+        x0, y0, scale = self.view
+        if view[2] != scale:
+            f = view[2] / scale
+            self.canvas.scale('site', x0, y0, f, f)
+        self.canvas.move('site', view[0] - x0, view[1] - y0)
+        self.view = view
+        self.draw_decor()
+
+    def recolor(self, colors):
+        self.colors = list(colors)
+        for type in self.arrange.tvel:
+            self.canvas.itemconfig('t{}'.format(type), fill=self.colors[type], activefill=self.colors[0])
+
+    def update_site(self, i, j):
+        # перерисовка одной позиции после изменения расстановки
+        item = (i, j)
+        type = self.arrange.get_tvel(i, j)
+        coords = self.arrange.get_coords(item)
+        if not self.in_region(coords)[0]:
+            return
+        if self.lod == 'raster':
+            px, py = (int(v[0]) for v in self.get_pixels(coords))
+            color = self.canvas.cget('background') if type is None else self.colors[type]
+            self.image.put(color, to=(max(px, 0), max(py, 0), px + self.pixel_size, py + self.pixel_size))
+            names = [name for name in self.arrange.get_marks(i, j) if name not in self.hidden]
+            if names: # последний из слоев позиции, как при построении изображения
+                px, py = px + self.pixel_size // 2, py + self.pixel_size // 2
+                self.image.put(self.get_layer_color(names[-1]), to=(max(px, 0), max(py, 0), px + 1, py + 1))
+            return
+        x, y = self.to_screen(coords).tolist()[0]
+        r = self.arrange.r_tvel * self.view[2]
+        if type is None:
+            if item in self.items:
+                self.canvas.delete(self.items.pop(item))
+        elif item in self.items:
+            self.canvas.itemconfig(self.items[item], fill=self.colors[type], tags=('site', 't{}'.format(type)))
+        else:
+            self.items[item] = self.create_tvel(x, y, r, type)
+        for id in self.marks.pop(item, ()):
+            self.canvas.delete(id)
+        for name in self.arrange.get_marks(i, j):
+            self.marks.setdefault(item, []).extend(self.create_mark(x, y, r, name))
+        self.canvas.tag_raise('cursor')
+
+    def update_sites(self, items):
+        # перерисовка нескольких позиций, при большом числе дешевле перестроить все
+        if len(items) > LOD_MAX_ITEMS // 4:
+            self.rebuild(self.arrange, self.colors, self.view)
+            return
+        for item in items:
+            self.update_site(*item)
+
+    def invalidate(self):
+        # состав расстановки изменен целиком - при следующей отрисовке элементы будут созданы заново
+        self.geometry = None
+
+    def set_cursor(self, i, j):
+        # контур пустой позиции под указателем мыши, над ТВЭЛ подсветка выполняется через activefill
+        if self.arrange.get_tvel(i, j) is not None:
+            self.canvas.itemconfig(self.cursor, state='hidden')
+            return
+        x, y = self.to_screen(self.arrange.get_coords((i, j))).tolist()[0]
+        r = self.arrange.r_tvel * self.view[2]
+        self.canvas.coords(self.cursor, x - r, y - r, x + r, y + r)
+        self.canvas.itemconfig(self.cursor, state='normal')
+        self.canvas.tag_raise('cursor')
+
+
+class App(Tk):
+    global parameters
+    menuitem={}
+
+    def __init__(self):
+        super().__init__()
+        self.configure(bg='blue')
+        self.title( PROGRAM_NAME + " - " + DEFAULT_NAME)
+        if (Path(ICON_NAME).exists()):
+            #print(ICON_NAME)
+            #self.tk.call('wm', 'iconphoto', self._w, PhotoImage(file=ICON_NAME))
+            #self.iconphoto(False, PhotoImage(file = "reactor360.png"))
+            self.iconbitmap(ICON_NAME)
+        else:
+            print("No icon")
+            pass
+        screen_height=int(self.wm_maxsize()[1])  # получаем размер экрана и вычисляем размер окна приложения
+        self.start_position_askdialog="+{}+{}".format(int(screen_height/3), int(screen_height/3))
+        self.geometry('{}x{}+{}+{}'.format(int(screen_height*0.9), int(screen_height*0.9), 0, 0))
+        self.state("zoomed") #- окно на весь экран над панелью задач
+        self.minsize(400, 400)
+        self.arrange = None 
+        self.scale = 0
+        self.filename = ''
+        self.mouse_position=[0,0]
+        self.mouse_xy = ()
+        self.mouse_event_xy = (0, 0)
+        self.comparison = self.diff = self.diff_key = None # отличия от расстановки для сравнения (Comparison)
+        self.last_dir = Path.cwd()
+        self.colors = BASE_COLORS
+        self.settings = {} # дополнительные настройки из ini файла
+        self.tvel_types = ["{}{}".format(M_TVEL,i) for i in range(len(self.colors))]
+        self.menu_ = BASE_MENU
+        self.menu_[M_PUT] = [M_CLEAR, *[self.tvel_types[i] for i in range(1,len(self.tvel_types))], M_TVEL_ADD_TYPE]
+        
+        self.screen = ResizingCanvas(self, bg='white')
+        self.renderer = CanvasRenderer(self.screen)
+        self.lattice = LatticeCache() # узлы решетки для предпросмотра создаваемой расстановки
+        self.preview_job = None
+        self.frames = FrameScheduler(self)
+        self.statusbar = Frame(self, bd=3, relief=SUNKEN)
+        self.status = {part: Label(self.statusbar, text="", anchor=W, font="Arial 10") for part in ('params', 'cursor', 'counts', 'job')}
+        self.status_keys = {}
+        for part in self.status:
+            self.status[part].pack(side=LEFT)
+        self.job = None # текущая операция с файлом (FileJob), одновременно выполняется только одна
+        self.cancel_button = Button(self.statusbar, text="Прервать", font="Arial 10", command=self.cancel_job) # показывается во время операции
+        self.status['params']['text'] = "  No data"
+        self.statusbar.pack(side=BOTTOM, fill=X)
+        self.screen.pack(fill="both", expand=True)
+        self.screen.bind("<Button-1>", self.mouse_pressed)
+        self.screen.bind("<Motion>", self.mouse_move)
+        self.screen.bind("<MouseWheel>", self.mouse_wheel)
+        self.screen.bind("<Button-3>", self.mouse_B3)
+        self.screen.bind("<B3-Motion>", self.mouse_B3motion)
+        for key in ("<Control-z>", "<Control-Z>"):
+            self.bind(key, self.undo)
+        for key in ("<Control-y>", "<Control-Y>"):
+            self.bind(key, self.redo)
+        self.layer = DEFAULT_LAYER # слой пометок для режима пометки и действий над областью
+        self.lasso = None # вершины многоугольника выделения в координатах расстановки, None - режим выделения выключен
+        self.bind("<Return>", self.finish_lasso)
+        self.bind("<Escape>", self.cancel_lasso)
+
+       
+        self.load_ini()
+        if self.settings.get('profile') and not PROFILER.enabled:
+            PROFILER.enable()
+        # create menu
+        self.mainmenu = Menu(self, bd=3)
+        self.tvel_var = IntVar()
+        self.mark = BooleanVar(False)
+        self.tvel_var.set(0)
+        
+        for key in self.menu_:
+            App.menuitem[key] = Menu(self.mainmenu, tearoff=0, bd=1)
+            if key!=M_PUT:
+                for tag in self.menu_[key]:
+                    if tag!=M_MARK:
+                        App.menuitem[key].add_command(label=tag, command=lambda x=tag: self.callback(x)) #https://webdevblog.ru/kak-ispolzovat-v-python-lyambda-funkcii/ - почему lambda надо писать так
+                    else:
+                        App.menuitem[key].add_checkbutton(label=tag, variable = self.mark)
+            else:
+                self.create_menu_tvel()
+            self.mainmenu.add_cascade(label=key, menu=App.menuitem[key])
+        
+        self.config(menu=self.mainmenu)
+
+    def update(self):
+        # строка состояния из трех частей, каждая перерисовывается только при изменении своих данных:
+        # режим и параметры расстановки, данные под указателем мыши, количество элементов
+        self.set_status('title', PROGRAM_NAME + " - " + self.filename, lambda: self.title(PROGRAM_NAME + " - " + self.filename))
+        if not (self.arrange):
+            for part in ('params', 'cursor', 'counts'):
+                self.set_status(part, None, lambda: "  No data" if part == 'params' else "")
+            return
+        arrange = self.arrange
+        self.set_status('params', (self.mark.get(), self.layer, self.lasso is not None, arrange.r_tvel, arrange.step, arrange.r_in, arrange.r_out, tuple(arrange.position), arrange.rotation),
+            lambda: ("РЕЖИМ ВЫДЕЛЕНИЯ (Enter - завершить, Esc - отменить)\t" if self.lasso is not None else
+                     "РЕЖИМ ПОМЕТКИ (слой {})\t".format(self.layer) if self.mark.get() else "РЕЖИМ РАССТАНОВКИ\t") +
+                "Радиус твэл: {RTVEL}  Шаг: {STEP}  Rin: {RIN}  Rout: {ROUT}  Центр: {CNTR}  Поворот: {ANGLE}".format(
+                RTVEL = arrange.r_tvel, STEP = arrange.step, RIN = arrange.r_in, ROUT = arrange.r_out, CNTR = arrange.position, ANGLE = arrange.rotation))
+        self.set_status('cursor', (arrange, arrange.get_transform(), tuple(self.mouse_position), arrange.get_tvel(*self.mouse_position)), self.cursor_status)
+        self.set_status('counts', (arrange, arrange.revision, arrange.get_transform()[0]), self.counts_status)
+
+    def set_status(self, part, key, func):
+        if self.status_keys.get(part, ()) != key:
+            self.status_keys[part] = key
+            text = func()
+            if part in self.status:
+                self.status[part]['text'] = text
+
+    def cursor_status(self):
+        current_tvel_type = self.arrange.get_tvel(*self.mouse_position)
+        current_tvel_type = "пусто" if current_tvel_type == None else M_TVEL + str(current_tvel_type)
+        x, y = self.arrange.get_coord(*self.mouse_position)
+        return "  Указатель на {curtvel}  X= {X:.4f}  Y= {Y:.4f}  столбец= {COLUMN}  ряд= {LINE}".format(
+            COLUMN = self.mouse_position[0], LINE = self.mouse_position[1], curtvel = current_tvel_type, X = x, Y = y)
+
+    def counts_status(self):
+        stats = self.arrange.get_stats()
+        status = "   Количество элементов: {NUM}".format(NUM = stats['total'])
+        for i, num in stats['types'].items():
+            status += "  "+ self.tvel_types[i]+": "+str(num)
+        for name, num in stats['layers'].items():
+            if num:
+                status += "  {}: {}".format(name, num)
+        problems = self.arrange.validate()
+        for name, text in (('outside', "за Rout"), ('inside', "внутри Rin")):
+            if len(problems[name]):
+                status += "  {}: {}".format(text, len(problems[name]))
+        return status
+        
+    def load_ini(self):
+        #global COLORS, TVEL
+        try:
+            with open(INI_FILE,'r') as f:
+                self.last_dir = f.readline().rstrip()
+                self.colors = json.loads(f.readline())
+                line = f.readline()
+                if line.strip():
+                    self.settings = json.loads(line)
+                self.tvel_types = ["{}{}".format(M_TVEL,i) for i in range(len(self.colors))]
+                self.menu_[M_PUT] = [M_CLEAR, *[self.tvel_types[i] for i in range(1,len(self.colors))], M_TVEL_ADD_TYPE]
+        except:
+            print("Ошибка чтения ini файла")
+        
+    def save_ini(self):
+        try:
+            with open(INI_FILE,'w') as f:
+                f.write("{}\n".format(self.last_dir))
+                f.write("{}\n".format(json.dumps(self.colors)))
+                f.write("{}".format(json.dumps(self.settings)))
+        except:
+            pass
+        
+    def create_menu_tvel(self):
+        add_pos=len(self.menu_[M_PUT])-1
+        for tag in range(add_pos):
+            App.menuitem[M_PUT].add_radiobutton(label=self.menu_[M_PUT][tag], variable=self.tvel_var, value=tag)#: добавляет в меню переключатель
+        App.menuitem[M_PUT].add_command(label=self.menu_[M_PUT][add_pos], command=self.add_menu_tvel)
+
+    def add_menu_tvel(self):
+        (rgb, hx) = colorchooser.askcolor(title = "Выберите цвет для нового типа твел")
+        if (rgb!= None):
+            self.colors.append(RGB(*rgb))
+            add_pos = len(self.menu_[M_PUT])-1
+            for tag in range(add_pos+1):
+                App.menuitem[M_PUT].delete(self.menu_[M_PUT][tag]) #удаляем старые пункты
+            self.menu_[M_PUT].insert(add_pos, "{}{}".format(M_TVEL, add_pos))
+            self.tvel_var.set(add_pos)
+            self.tvel_types.append("{}{}".format(M_TVEL,add_pos)) #"{}{}".format(M_TVEL,i) for i in range(0,len(self.colors))
+            self.create_menu_tvel()
+    
+    def mark_tvel(self):
+        self.mark.set(not self.mark.get())
+
+    def mouse_wheel(self, event):
+        if self.arrange != None:
+            self.scale *= (1+event.delta/120*0.03)
+            self.frames.request('draw', self.draw_arrange)
+    
+    def mouse_B3motion(self, event):
+        if self.arrange != None:
+            self.screen.set_center(event.x - self.mouse_xy[0], -(event.y - self.mouse_xy[1]))
+            self.frames.request('draw', self.draw_arrange)
+
+    def mouse_B3(self, event):
+        self.mouse_xy = (event.x, event.y)
+
+    @profiled('mouse_pressed')
+    def mouse_pressed(self, event):
+        tvel_type = self.tvel_var.get()
+        if self.arrange and self.lasso is not None:
+            x0, y0 = self.screen.get_center()
+            self.lasso.append(((event.x - x0)/self.scale, (y0-event.y)/self.scale))
+            self.draw_lasso()
+        elif(self.arrange):
+            x0, y0 = self.screen.get_center()
+            i, j = self.arrange.get_index((event.x - x0)/self.scale, (y0-event.y)/self.scale)
+                
+            if (not self.mark.get()):
+                if tvel_type != 0:
+                    self.arrange.add(i, j, tvel_type)
+                else:
+                    self.arrange.pop(i, j)
+            else:
+                if not self.arrange.is_marked(i, j, self.layer):
+                    self.arrange.mark(i, j, self.layer)
+                else:
+                    self.arrange.unmark(i, j, self.layer)
+            self.renderer.update_site(i, j)
+            self.renderer.set_cursor(i, j)
+            self.draw_overlays([(i, j)])
+        self.update()
+
+    def mouse_move(self,  event):
+        # обрабатывается только последнее положение мыши к моменту очередного кадра
+        self.mouse_event_xy = (event.x, event.y)
+        self.frames.request('motion', self.process_motion)
+
+    @profiled('process_motion')
+    def process_motion(self):
+        if(self.arrange):
+            x0, y0 = self.screen.get_center()
+            i, j = self.arrange.get_index((self.mouse_event_xy[0] - x0)/self.scale, (y0-self.mouse_event_xy[1])/self.scale)
+            if [i,j] !=self.mouse_position:
+                self.renderer.set_cursor(i, j)
+                self.mouse_position = [i,j]
+        self.update()
+       
+    def circle(self, x , y , radius, fill=None, width=1, outline='black', dash = None , activefill = None, tags = ('site', 'guide')):
+        scale=self.scale
+        x0, y0 = self.screen.get_center()
+        self.screen.create_oval( (x0 + x * scale) - radius * scale,
+                                (y0 - y * scale) - radius * scale,
+                                (x0 + x * scale) + radius * scale,
+                                (y0 - y * scale) + radius * scale,
+                                width= width, outline= outline, fill=fill, dash = dash, activefill = activefill, tags = tags)
+
+    @profiled('draw_arrange')
+    def draw_arrange(self):
+        if (self.arrange != None):
+            # элементы холста пересоздаются только при изменении геометрии, иначе сдвигаются/масштабируются
+            self.renderer.draw(self.arrange, self.colors, (*self.screen.get_center(), self.scale))
+            self.draw_overlays()
+ 
+    def draw_overlays(self, sites=None):
+        # проверка геометрии и отличия от эталона после любого изменения выделяются на холсте,
+        # sites - позиции, измененные после прежней отрисовки (None - неизвестно какие)
+        self.renderer.set_overlay('flag', np.concatenate(list(self.arrange.validate().values())), 'red')
+        if self.comparison is not None:
+            self.draw_compare(sites)
+
+    @profiled('get_scale')
+    def get_scale(self):
+        if (self.arrange!= None):
+            max_radius = max(self.arrange.max_radius(), self.arrange.r_out)
+            if (self.arrange.r_out != 0):
+                self.scale = min(self.screen.width, self.screen.height) / (2*max_radius + self.arrange.step)
+
+    def create(self):
+        def ok(object):
+            try:
+                data = object.get_value()
+                tmp = Arrange.new(*data)
+                object.destroy()
+                self.show_new(tmp)
+            except ArrangeError as error:
+                messagebox.showerror("Ошибка ввода данных!", str(error))
+            except:
+                pass
+        def changed(object):
+            # предпросмотр обновляется после паузы во вводе
+            if self.preview_job is not None:
+                self.after_cancel(self.preview_job)
+            self.preview_job = self.after(PREVIEW_DELAY, lambda: self.preview(object))
+        def closed(event):
+            if event.widget is dlg.dlg:
+                self.close_preview()
+        dlg = ServiceDialog(self, *parameters, title = M_CREATE, geometry = '280x330' + self.start_position_askdialog, func = ok, on_change = changed)
+        dlg.dlg.bind("<Destroy>", closed, add = '+')
+
+    @profiled('preview')
+    def preview(self, dialog):
+        # число ТВЭЛ и контуры расстановки, которая будет создана по текущим значениям полей диалога
+        self.preview_job = None
+        try:
+            data = [float(entry.get()) for entry in dialog.entrys]
+        except ValueError:
+            data = None
+        if data is None or not data_consistency(*data):
+            dialog.info['text'] = "Несогласованные данные" if data else "Введите все параметры"
+            self.renderer.clear_preview()
+            return
+        estimate = math.pi * data[3]**2 / (data[1]**2 * SIN_60)
+        if estimate > PREVIEW_MAX_SITES:
+            dialog.info['text'] = "Около {:.0f} твэл, предпросмотр недоступен".format(estimate)
+            self.renderer.clear_preview()
+            return
+        coords = self.lattice.select(*data)
+        dialog.info['text'] = "Число твэл: {}".format(len(coords))
+        self.renderer.draw_preview(coords, *data)
+
+    def close_preview(self):
+        if self.preview_job is not None:
+            self.after_cancel(self.preview_job)
+            self.preview_job = None
+        self.renderer.clear_preview()
+
+    def show_new(self, arrange):
+        self.set_arrange(arrange)
+        self.filename=''
+        self.get_scale()
+        self.draw_arrange()
+
+    def sweep_params(self):
+        # перебор сочетаний параметров в рабочем потоке (расчет - в пуле процессов), результат - в окне SweepWindow
+        def ok(object):
+            try:
+                values = [parse_values(entry.get()) for entry in object.entrys]
+            except ArrangeError as error:
+                messagebox.showerror("Ошибка ввода данных!", str(error))
+                return
+            object.destroy()
+            self.start_job('sweep', M_SWEEP, lambda progress: sweep(*values, progress=progress),
+                           lambda rows: SweepWindow(self, rows, self.open_sweep_row, self.save_sweep_table),
+                           lambda error: messagebox.showerror(M_SWEEP, str(error)))
+        dlg = ServiceDialog(self, *["{} от:до:шаг или список".format(name) for name in parameters], title = M_SWEEP,
+                            geometry = '300x300' + self.start_position_askdialog, func = ok)
+
+    def open_sweep_row(self, row):
+        try:
+            self.show_new(Arrange.new(row['r_tvel'], row['step'], row['r_in'], row['r_out']))
+        except ArrangeError as error:
+            messagebox.showerror(M_SWEEP, str(error))
+        self.update()
+
+    def save_sweep_table(self, rows):
+        filename = filedialog.asksaveasfilename(initialdir = self.last_dir, title = M_SWEEP, defaultextension = ".csv",
+                                                filetypes = [(kind.upper(), "*." + kind) for kind in TABLE_FORMATS])
+        if filename != '':
+            try:
+                write_table(rows, filename)
+            except (ArrangeError, OSError) as error:
+                messagebox.showerror("Ошибка записи файла!", str(error))
+
+    def rebuild_new_step(self):
+        def ok(object):
+            try:
+                tmp = object.get_value()[0]
+                if (tmp<2*self.arrange.r_tvel):
+                    messagebox.showerror(
+                        "Ошибка ввода данных!",
+                        "Недопустимо, пересечение твелов!")
+                else:
+                    self.arrange.set_params(step = tmp)
+                    object.destroy()
+                    self.get_scale()
+                    self.draw_arrange()
+            except:
+                pass
+        if self.arrange:
+            dlg = ServiceDialog(self, "Введите новый шаг", title = M_REBUILD, geometry = '250x120' + self.start_position_askdialog, func = ok)
+    
+    def draw_beam(self):
+        def ok(object):
+            try:
+                angle = object.get_value()[0]
+                x0, y0 = self.screen.get_center()
+                scale = self.scale
+                self.screen.create_line(x0, y0, x0 * (1 + math.cos(angle/180*math.pi)), y0 *(1 - math.sin(angle/180*math.pi)) , dash = int(scale), tags = ('site', 'guide'))
+                object.destroy()
+            except:
+                pass
+        if self.arrange:
+            dlg = ServiceDialog(self, "Введите угол наклона луча", title = M_BEAM, geometry = '250x120' + self.start_position_askdialog, func = ok)
+   
+    def draw_circle(self):
+        def ok(object):
+            try:
+                radius = object.get_value()[0]
+                if (radius>0.0):
+                    object.destroy()
+                    self.circle(0, 0, radius, width=2, outline='black', dash = int(self.scale))
+                else:
+                    messagebox.showerror(
+                        "Ошибка ввода данных!",
+                        "Требуется положительное значение!")
+            except:
+                pass
+        if self.arrange:
+            dlg = ServiceDialog(self, "Введите радиус окружности", title = M_CIRCLE, geometry = '250x120' + self.start_position_askdialog, func = ok)
+    
+    def select_region(self, kind):
+        # пакетное изменение области: параметры области и действие задаются в диалоге
+        prompts = {M_REGION_RING: ("Внутренний радиус", "Внешний радиус"), M_REGION_SECTOR: ("Начальный угол", "Конечный угол"),
+                   M_REGION_BEAM: ("Угол наклона луча",)}
+        def ok(object):
+            values = object.get_value()
+            if values is None:
+                return
+            region = {M_REGION_RING: 'ring', M_REGION_SECTOR: 'sector', M_REGION_BEAM: 'beam'}[kind]
+            if self.apply_region((region, *values), list(REGION_ACTIONS)[object.get_choice()]):
+                object.destroy()
+        if self.arrange:
+            dlg = ServiceDialog(self, *prompts[kind], title = kind, geometry = '250x{}'.format(90 + 60*len(prompts[kind])) + self.start_position_askdialog,
+                                func = ok, choices = REGION_ACTIONS.values())
+
+    @profiled('apply_region')
+    def apply_region(self, region, action):
+        tvel_type = self.tvel_var.get()
+        if action in ('fill', 'retype') and tvel_type == 0:
+            messagebox.showerror("Ошибка ввода данных!", "Выберите тип ТВЭЛ в меню {}!".format(M_PUT))
+            return False
+        sites = self.arrange.apply_region(region, action, tvel_type, self.layer)
+        self.renderer.update_sites(sites)
+        self.draw_overlays(sites)
+        self.update()
+        return True
+
+    def start_lasso(self):
+        # вершины многоугольника задаются левой кнопкой мыши, Enter - выбор действия, Esc - отмена
+        if self.arrange:
+            self.lasso = []
+
+    def draw_lasso(self):
+        self.screen.delete('lasso')
+        x0, y0 = self.screen.get_center()
+        points = [(x0 + x * self.scale, y0 - y * self.scale) for x, y in self.lasso]
+        if len(points) > 1:
+            self.screen.create_line(*points, *points[0], dash = 4, tags = ('site', 'lasso'))
+
+    def finish_lasso(self, *args):
+        def ok(object):
+            if self.apply_region(('polygon', points), list(REGION_ACTIONS)[object.get_choice()]):
+                object.destroy()
+        if self.lasso is None:
+            return
+        points = self.lasso
+        self.cancel_lasso()
+        if len(points) >= 3:
+            dlg = ServiceDialog(self, title = M_REGION_POLYGON, geometry = '250x100' + self.start_position_askdialog,
+                                func = ok, choices = REGION_ACTIONS.values())
+
+    def cancel_lasso(self, *args):
+        self.lasso = None
+        self.screen.delete('lasso')
+        self.update()
+
+    def rotate(self):
+        def ok(object):
+            try:
+                self.arrange.set_params(rotation = self.arrange.rotation + object.get_value()[0])
+                object.destroy()
+                self.draw_arrange()
+            except:
+                pass
+        if self.arrange:
+            dlg = ServiceDialog(self, "Введите угол поворота", title = M_ROTATE, geometry = '250x120' + self.start_position_askdialog, func = ok)
+
+    def change_scale(self):
+        def ok(object):
+            try:
+                new_scale = object.get_value()[0]
+                if (new_scale>0.0):
+                    self.scale *= new_scale
+                    object.destroy()
+                    self.draw_arrange()
+                else:
+                    messagebox.showerror(
+                        "Ошибка ввода данных!",
+                        "Требуется положительное значение!")
+            except:
+                pass
+        if self.arrange:
+            dlg = ServiceDialog(self, "Введите изменение масштаба", title = M_SCALE, geometry = '250x120' + self.start_position_askdialog, func = ok)
+
+    def move_center(self):
+        def ok(object):
+            try:
+                new_position = object.get_value()
+                self.arrange.set_params(position = [self.arrange.position[0] + new_position[0], self.arrange.position[1] + new_position[1]])
+                object.destroy()
+                self.get_scale()
+                self.draw_arrange()
+            except:
+                pass
+        if self.arrange:
+            dlg = ServiceDialog(self, "Смещение по X", "Смещение по Y", title = M_MOVE_CENTER, geometry = '250x200' + self.start_position_askdialog, func = ok)
+
+    def reflect(self):
+        if self.arrange:
+            self.arrange.reflect()
+            self.draw_arrange()
+
+    def set_arrange(self, arrange):
+        # новая расстановка: свой журнал отмены, сравнение с прежней расстановкой снимается
+        self.arrange = arrange
+        self.arrange.history = History(self.settings.get('history_budget_mb', HISTORY_BUDGET / 2**20) * 2**20)
+        self.close_compare()
+
+    def compare_file(self):
+        # сравнение текущей расстановки с расстановкой из файла (например, предыдущей загрузки)
+        if not self.arrange:
+            return
+        filename = filedialog.askopenfilename(initialdir = self.last_dir, title = M_COMPARE, filetypes = (("tvel files","*.{} *.{}".format(F_EXT, BIN_EXT)),("all files","*.*")))
+        self.open_arrange(filename, self.show_compare)
+
+    def show_compare(self, reference):
+        self.comparison = Comparison(reference, self.arrange)
+        self.diff_key, self.diff = (self.arrange, self.arrange.revision), self.comparison.get()
+        self.draw_compare()
+        report = diff_report(self.diff)
+        lines = ["Добавлено: {added}  удалено: {removed}  сменили тип: {retyped}".format(**report)]
+        lines.extend("{}{}: {old} -> {new} ({delta:+})".format(M_TVEL, key, **item) for key, item in report['types'].items() if item['delta'])
+        messagebox.showinfo(title = M_COMPARE, message = "\n".join(lines) + "\n\nДобавленные - зеленый контур, удаленные - синий, со сменой типа - оранжевый")
+
+    def draw_compare(self, sites=None):
+        # при изменении состава текущей расстановки пересчитываются только позиции sites,
+        # целиком - если они неизвестны (изменения вне правок интерфейса)
+        if self.diff_key != (self.arrange, self.arrange.revision):
+            if sites is None or self.diff_key is None or self.diff_key[0] is not self.arrange:
+                self.comparison.reset(self.arrange)
+            else:
+                self.comparison.update(self.arrange, sites)
+            self.diff_key = (self.arrange, self.arrange.revision)
+            self.diff = self.comparison.get()
+        for name, color in (('added', 'green'), ('removed', 'blue'), ('retyped', 'orange')):
+            self.renderer.set_overlay('diff_' + name, self.diff[name], color, 1.15)
+
+    def close_compare(self):
+        self.comparison = self.diff = self.diff_key = None
+        for name in ('added', 'removed', 'retyped'):
+            self.renderer.clear_overlay('diff_' + name)
+
+    @profiled('undo')
+    def undo(self, *args):
+        if self.arrange:
+            self.repaint(self.arrange.history.undo(self.arrange))
+
+    @profiled('redo')
+    def redo(self, *args):
+        if self.arrange:
+            self.repaint(self.arrange.history.redo(self.arrange))
+
+    def repaint(self, sites):
+        # перерисовка после отмены/повтора: только затронутые позиции или все, если изменилась геометрия
+        if sites is None:
+            self.renderer.invalidate()
+            self.draw_arrange()
+        else:
+            self.renderer.update_sites(sites)
+            self.draw_overlays(sites)
+        self.update()
+
+    def reset(self):
+        if self.arrange:
+            self.arrange.set_params(rotation = 0, position = [0, 0])
+            self.screen.set_center()
+            self.get_scale()
+            self.draw_arrange()
+
+    def choose_colors(self):
+        def get_choice(event):
+            tvel_type = combo_choice.get()
+            try:
+                num = int(tvel_type[len(M_TVEL):])
+            except:
+                num = 0
+            color_tvel.config(bg=self.colors[num])
+            
+        def change_color():
+            tvel_type = combo_choice.get()
+            try:
+                num = int(tvel_type[len(M_TVEL):])
+            except:
+                num = 0
+            (rgb, hx) = colorchooser.askcolor(title = "Выберите цвет")
+            # print(rgb) 
+            if (rgb!= None):
+                self.colors[num] = RGB(*rgb)
+            color_tvel.config(bg=self.colors[num])
+            self.draw_arrange()
+        
+        def close(*args):
+            dialog.destroy()
+            #self.draw_arrange()
+            
+        dialog = Toplevel(self, bd = 3 ) 
+        dialog.geometry('280x100'+self.start_position_askdialog)
+        dialog.title("Выбрать цвета")
+        dialog.focus_set()
+        if (Path(ICON_NAME).exists()):
+            dialog.iconbitmap(ICON_NAME)
+        dialog.grab_set()
+        dialog.protocol("WM_DELETE_WINDOW", close)
+        dialog.resizable(width = False, height= False)
+        Button(dialog, text = "Ок", width= 10, command = close).place(relx=0.35, rely=0.65)
+        items_choice = ['курсор'] + self.menu_[M_PUT][1:-1]
+        default_choice = 0
+        combo_choice = Combobox(dialog, values = items_choice, state = 'readonly')
+        combo_choice.current(default_choice)
+        combo_choice.place(relx=0.1, rely=0.23)
+        combo_choice.bind("<<ComboboxSelected>>", get_choice)
+        color_tvel=Button(dialog, width = 1, height= 1, bg= self.colors[default_choice], command = change_color)
+        color_tvel.place(relx=0.8, rely=0.18)
+        dialog.bind("<Escape>", close)        
+       
+    def choose_layers(self):
+        # слои пометок: выбор текущего слоя (пометка мышью и действия над областью), создание, удаление и показ на холсте
+        def get_names():
+            return list(dict.fromkeys([*self.arrange.get_layers(), self.layer]))
+
+        def get_choice(event=None):
+            self.layer = combo_choice.get()
+            visible.set(self.layer not in self.renderer.hidden)
+            counts = self.arrange.get_stats()['layers']
+            info.config(text="Помечено: {}, в любом из слоев: {}".format(counts.get(self.layer, 0), len(self.arrange.get_marked())))
+            self.update()
+
+        def add_layer():
+            name = entry_name.get().strip()
+            try:
+                self.arrange.add_layer(name)
+            except ArrangeError as error:
+                messagebox.showerror("Ошибка ввода данных!", str(error), parent=dialog)
+                return
+            combo_choice.config(values=get_names())
+            combo_choice.set(name)
+            get_choice()
+
+        def remove_layer():
+            count = self.arrange.get_stats()['layers'].get(self.layer, 0)
+            if count and not messagebox.askyesno(M_LAYERS, "Снять {} пометок слоя {}?".format(count, self.layer), parent=dialog):
+                return
+            self.arrange.remove_layer(self.layer)
+            self.layer = (self.arrange.get_layers() or [DEFAULT_LAYER])[0]
+            self.renderer.invalidate() # цвета слоев зависят от их порядка
+            self.draw_arrange()
+            combo_choice.config(values=get_names())
+            combo_choice.set(self.layer)
+            get_choice()
+
+        def close(*args):
+            dialog.destroy()
+
+        if not self.arrange:
+            return
+        dialog = Toplevel(self, bd = 3)
+        dialog.geometry('300x170'+self.start_position_askdialog)
+        dialog.title(M_LAYERS)
+        dialog.focus_set()
+        if (Path(ICON_NAME).exists()):
+            dialog.iconbitmap(ICON_NAME)
+        dialog.grab_set()
+        dialog.protocol("WM_DELETE_WINDOW", close)
+        dialog.resizable(width = False, height= False)
+        combo_choice = Combobox(dialog, values = get_names(), state = 'readonly', width = 18)
+        combo_choice.set(self.layer)
+        combo_choice.place(relx=0.05, rely=0.05)
+        combo_choice.bind("<<ComboboxSelected>>", get_choice)
+        visible = BooleanVar(dialog, True)
+        Checkbutton(dialog, text = "Показывать", variable = visible,
+                    command = lambda: self.renderer.show_layer(self.layer, visible.get())).place(relx=0.65, rely=0.04)
+        info = Label(dialog, text = "")
+        info.place(relx=0.05, rely=0.25)
+        entry_name = Entry(dialog, width = 20)
+        entry_name.place(relx=0.05, rely=0.48)
+        entry_name.bind("<Return>", lambda event: add_layer())
+        Button(dialog, text = "Добавить", width = 10, command = add_layer).place(relx=0.65, rely=0.45)
+        Button(dialog, text = "Удалить слой", width = 12, command = remove_layer).place(relx=0.05, rely=0.72)
+        Button(dialog, text = "Ок", width = 10, command = close).place(relx=0.65, rely=0.72)
+        dialog.bind("<Escape>", close)
+        get_choice()
+
+    def show_version(self):
+        messagebox.showinfo(title = PROGRAM_NAME, message = VERSION_INFO)       
+    
+    def show_about(self):
+        messagebox.showinfo(title = PROGRAM_NAME, message = __doc__)       
+
+    def show_profile(self):
+        if not PROFILER.enabled:
+            messagebox.showinfo(title = M_PROFILE, message = "Профилирование выключено. Запустите программу с ключом --profile "
+                                "или добавьте \"profile\": true в настройки (третья строка {}).".format(INI_FILE))
+            return
+        lines = []
+        for name, item in PROFILER.report().items():
+            if name.endswith('.items'): # счетчик, а не длительность
+                lines.append("{}: {} раз, в среднем {:.0f}, p50 {:.0f}, p95 {:.0f}".format(name, item['count'], item['total'] / item['count'], item['p50'], item['p95']))
+            else:
+                lines.append("{}: {} выз., всего {:.3f} с, p50 {:.1f} мс, p95 {:.1f} мс".format(name, item['count'], item['total'], item['p50'] * 1e3, item['p95'] * 1e3))
+        messagebox.showinfo(title = M_PROFILE, message = "\n".join(lines) or "Нет данных")
+
+    def save_profile(self):
+        filename = filedialog.asksaveasfilename(initialdir = self.last_dir, title = M_PROFILE_SAVE, defaultextension = ".json",
+                                                filetypes = (("trace","*.json"),("cProfile","*.prof"),("all files","*.*")))
+        if filename != '':
+            try:
+                PROFILER.dump(filename)
+            except ValueError:
+                messagebox.showerror("Ошибка записи профиля!", "Статистика cProfile собирается только при запуске с ключом --profile файл.prof")
+            except OSError as error:
+                messagebox.showerror("Ошибка записи профиля!", str(error))
+
+    def start_job(self, name, title, func, done, failed, write=False):
+        # запуск операции с файлом в рабочем потоке; done(результат) или failed(исключение) вызываются в главном потоке.
+        # Пока операция выполняется, расстановку можно редактировать, новые операции с файлами не запускаются
+        if self.job is not None:
+            messagebox.showinfo(title = title, message = "Дождитесь окончания операции \"{}\" или прервите ее.".format(self.job.title))
+            return
+        self.job = FileJob(name, title, func, done, failed, write)
+        self.status['job']['text'] = self.job.status()
+        self.cancel_button.pack(side=RIGHT)
+        self.after(IO_POLL_INTERVAL, self.poll_job)
+
+    def poll_job(self):
+        job = self.job
+        result = job.poll()
+        if result is None:
+            self.status['job']['text'] = job.status()
+            self.after(IO_POLL_INTERVAL, self.poll_job)
+            return
+        self.job = None
+        self.cancel_button.pack_forget()
+        self.status['job']['text'] = ""
+        if PROFILER.enabled:
+            PROFILER.record(job.name, job.start, time.perf_counter() - job.start)
+        kind, value = result
+        # запись, успевшая завершиться до отмены, сообщается как выполненная; результат прерванного чтения отбрасывается
+        if isinstance(value, ArrangeCancelled) or job.cancelled.is_set() and not job.write:
+            self.status['job']['text'] = "  {}: прервано".format(job.title)
+        elif kind == 'done':
+            job.done(value)
+        else:
+            job.failed(value)
+        self.update()
+
+    def cancel_job(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.status['job']['text'] = "  {}: прерывание...".format(self.job.title)
+
+    def open_arrange(self, filename, done):
+        # чтение файла расстановки в рабочем потоке, done(расстановка) вызывается после чтения;
+        # при ошибочных строках предлагается открыть остальное
+        if filename=='':
+            return
+        def failed(error):
+            arrange = self.read_error(error)
+            if arrange:
+                done(arrange)
+        self.start_job('open_file.io', "Чтение " + Path(filename).name, lambda progress: Arrange.load(filename, progress), done, failed)
+
+    def read_error(self, error):
+        # сообщение об ошибке чтения, возвращает расстановку без ошибочных строк, если пользователь согласен ее открыть
+        if not isinstance(error, ArrangeFileError):
+            messagebox.showerror(
+            "Ошибка чтения файла!",
+            "Неверный формат или файл не существует!")
+            return None
+        if error.arrange is None:
+            messagebox.showerror("Ошибка чтения файла!", str(error))
+            return None
+        lines = ["строка {}: {}".format(line, reason) for line, text, reason in error.problems[:MAX_PROBLEMS]]
+        if len(error.problems) > MAX_PROBLEMS:
+            lines.append("... всего ошибок: {}".format(len(error.problems)))
+        if messagebox.askyesno("Ошибка чтения файла!", "\n".join(lines) + "\n\nОткрыть расстановку без ошибочных строк?"):
+            return error.arrange
+        return None
+
+    def write_file(self, name, title, message, *funcs):
+        # запись копии расстановки в self.filename в рабочем потоке функциями модели funcs (Arrange.save, Arrange.write_coord);
+        # изменения, сделанные во время записи, в файл не попадают
+        arrange, filename = self.arrange.snapshot(), self.filename
+        def write(progress):
+            for func in funcs:
+                func(arrange, filename, progress)
+        self.start_job(name, "Запись " + Path(filename).name, write,
+                       lambda result: messagebox.showinfo(title = title, message = message),
+                       lambda error: messagebox.showerror("Ошибка записи файла!", str(error)), write = True)
+
+    @profiled('open_file')
+    def open_file(self):
+        temp_filename =  filedialog.askopenfilename(initialdir = self.last_dir, title = "Выберите файл",filetypes = (("tvel files","*.{} *.{}".format(F_EXT, BIN_EXT)),("all files","*.*")))
+        self.open_arrange(temp_filename, lambda tmp: self.show_file(tmp, temp_filename))
+
+    def show_file(self, tmp, temp_filename):
+        self.set_arrange(tmp)
+        num_colors = len(self.colors) - 1   #актуальные цвета для твэлов в списке self.colors с 1-ой позиции
+        if self.arrange.get_tvel_types() > num_colors:
+            self.tvel_types.extend(["{}{}".format(M_TVEL,i) for i in range(num_colors+1, self.arrange.get_tvel_types()+1)])
+            self.colors.extend([rand_color() for _ in range(num_colors+1, self.arrange.get_tvel_types()+1)])
+            # перерисовываем меню 
+            for tag in range(len(self.menu_[M_PUT])):
+                App.menuitem[M_PUT].delete(self.menu_[M_PUT][tag]) #удаляем старые пункты
+            self.menu_[M_PUT] = [M_CLEAR, *[self.tvel_types[i] for i in range(1,len(self.tvel_types))], M_TVEL_ADD_TYPE]
+            self.create_menu_tvel()
+        self.config(menu=self.mainmenu)
+        self.get_scale()
+        self.draw_arrange()
+        self.filename = temp_filename
+        self.last_dir = Path(self.filename).parent  #https://python-scripts.com/pathlib
+
+   
+    @profiled('save_coord')
+    def save_coord(self):
+        if (self.arrange):
+            if self.filename=='':
+                messagebox.showinfo(title = M_SAVE_COORD, message = "Сначала сохраните расстановку!")   
+                if not self.choose_filename():
+                    return
+            self.write_file('save_coord.io', M_SAVE_COORD, "Координаты и расстановка сохранены!", Arrange.save, Arrange.write_coord)
+        
+    @profiled('save')
+    def save(self):
+        if (self.arrange):
+            if self.filename=='':
+                self.save_as_file()
+            else:
+                self.write_file('save.io', M_SAVE, "Расстановка сохранена!", Arrange.save)
+
+    def export_picture(self):
+        # изображение расстановки в PNG (разрешение - настройка export_dpi в ini файле), SVG или PDF, строится в рабочем потоке
+        if not self.arrange:
+            return
+        filename = filedialog.asksaveasfilename(initialdir = self.last_dir, title = M_EXPORT_IMAGE, defaultextension = ".png",
+                                                filetypes = [(kind.upper(), "*." + kind) for kind in IMAGE_FORMATS])
+        if filename == '':
+            return
+        colors = [to_hex(c // 256 for c in self.winfo_rgb(color)) for color in self.colors] # любые цвета Tk в виде #rrggbb
+        arrange, dpi = self.arrange.snapshot(), self.settings.get('export_dpi', EXPORT_DPI)
+        self.start_job('export_image.io', "Экспорт " + Path(filename).name, lambda progress: export_image(arrange, filename, colors, dpi, progress),
+                       lambda result: messagebox.showinfo(title = M_EXPORT_IMAGE, message = "Изображение сохранено!"),
+                       lambda error: messagebox.showerror("Ошибка записи файла!", str(error)), write = True)
+
+    def save_as_file(self):
+        if self.arrange and self.choose_filename():
+            self.save()
+
+    def choose_filename(self):
+        filename =  filedialog.asksaveasfilename(initialdir = self.last_dir, title = "Выберите файл",
+                                                    filetypes = (("tvel files","*.{}".format(F_EXT)),("tvel binary files","*.{}".format(BIN_EXT)),("all files","*.*")))
+        if(filename!=''):
+            if ".{}".format(F_EXT) not in filename and not filename.endswith(".{}".format(BIN_EXT)):
+                filename +=".{}".format(F_EXT)
+            self.last_dir = Path(filename).parent
+            self.filename=filename
+        return filename != ''
+
+    def quit(self):
+        answer = True
+        if self.job is not None:
+            answer = messagebox.askokcancel("Выйти", "Выполняется операция \"{}\". Прервать ее и выйти?".format(self.job.title))
+            if answer: # прерванная запись удаляет недописанные файлы, ее окончание ожидается
+                self.job.cancel()
+                self.job.thread.join(IO_QUIT_TIMEOUT)
+        elif (self.arrange != None):
+            answer = messagebox.askokcancel("Выйти", "Вы точно хотите закончить работу программы?")
+        if answer:
+            self.save_ini()
+            self.destroy()
+
+    def callback(self, tag):
+        if tag == M_CREATE:
+            self.create()
+        if tag == M_OPEN:
+            self.open_file()
+        if tag == M_SAVE:
+            self.save()
+        if tag == M_SAVE_AS:
+            self.save_as_file()
+        if tag == M_SAVE_COORD:
+            self.save_coord()
+        if tag == M_EXPORT_IMAGE:
+            self.export_picture()
+        if tag == M_COMPARE:
+            self.compare_file()
+        if tag == M_COMPARE_OFF:
+            self.close_compare()
+        if tag == M_QUIT:
+            return self.quit() # return, чтобы после уничтожения окна не вызывался self.update
+        if tag == M_MOVE_CENTER:
+            self.move_center()
+        if tag == M_REBUILD:
+            self.rebuild_new_step()
+        if tag == M_SCALE:
+            self.change_scale()
+        if tag == M_ROTATE:
+            self.rotate()
+        if tag == M_REFLECT:
+            self.reflect()
+        if tag == M_RESET:
+            self.reset()
+        if tag == M_UNDO:
+            self.undo()
+        if tag == M_REDO:
+            self.redo()
+        if tag == M_BEAM:
+            self.draw_beam()
+        if tag == M_CIRCLE:
+            self.draw_circle()
+        if tag == M_MARK:
+            self.mark_tvel()
+        if tag in (M_REGION_RING, M_REGION_SECTOR, M_REGION_BEAM):
+            self.select_region(tag)
+        if tag == M_REGION_POLYGON:
+            self.start_lasso()
+        if tag == M_SWEEP:
+            self.sweep_params()
+        if tag == M_LAYERS:
+            self.choose_layers()
+        if tag == M_COLORS:
+            self.choose_colors()
+        if tag == M_VERSION:
+            self.show_version()
+        if tag == M_ABOUT:
+            self.show_about()
+        if tag == M_PROFILE:
+            self.show_profile()
+        if tag == M_PROFILE_SAVE:
+            self.save_profile()
+        self.update()
+    
+
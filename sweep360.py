@@ -0,0 +1,155 @@
+'''Подбор параметров решетки: перебор сочетаний радиуса ТВЭЛ, шага, внутреннего и внешнего радиусов
+с расчетом числа ТВЭЛ, радиуса крайнего ТВЭЛ и доли заполнения кольца, как при создании расстановки (Arrange.new).
+Для каждого шага радиусы узлов решетки рассчитываются один раз и сортируются, число ТВЭЛ для всех сочетаний
+с этим шагом находится двоичным поиском; разные шаги обрабатываются параллельно в отдельных процессах.
+Результат - таблица (список словарей с полями SWEEP_FIELDS), записывается в CSV или JSON.
+'''
+import csv
+import json
+import math
+from pathlib import Path
+from itertools import product
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from arrange360 import Arrange, ArrangeDataError, data_consistency, radius
+
+
+#Системные параметры
+SWEEP_FIELDS = ('r_tvel', 'step', 'r_in', 'r_out', 'count', 'max_radius', 'fill')
+SWEEP_MAX_ROWS = 1000000  # наибольшее число сочетаний параметров в одном переборе
+TABLE_FORMATS = ('csv', 'json')
+
+def parse_values(text):
+    '''Значения параметра из строки: число, список через запятую или диапазон от:до:шаг (включая "до").
+    При ошибке формата - ArrangeDataError'''
+    try:
+        if ':' in text:
+            start, stop, step = (float(item) for item in text.split(':'))
+            if step <= 0:
+                raise ValueError
+            return np.round(np.arange(0, math.floor((stop - start) / step + 1e-9) + 1) * step + start, 9).tolist()
+        return [float(item) for item in text.split(',')]
+    except ValueError:
+        raise ArrangeDataError("Неверный формат значений: {} (ожидается число, список через запятую или от:до:шаг)".format(text))
+
+def get_radii(step, r_max, bounds, eps):
+    '''Отсортированные радиусы узлов решетки с шагом step в круге r_max. Радиусы считаются так же, как в
+    Arrange.annulus_sites: векторно, а ближе eps к границам bounds (радиусам, с которыми они будут сравниваться) - поштучно'''
+    arrange = Arrange(0, step, 0, r_max)
+    coords = arrange.get_coords(arrange.annulus_sites(0, r_max))
+    r = np.sqrt(coords[:, 0] * coords[:, 0] + coords[:, 1] * coords[:, 1])
+    bounds = np.unique(bounds)
+    k = np.clip(np.searchsorted(bounds, r), 1, len(bounds) - 1) if len(bounds) > 1 else np.zeros(len(r), dtype=np.int64)
+    distance = np.minimum(np.abs(r - bounds[k - 1]), np.abs(r - bounds[k])) if len(bounds) > 1 else np.abs(r - bounds[0])
+    for n in np.flatnonzero(distance <= eps).tolist():
+        r[n] = radius(*coords[n].tolist())
+    return np.sort(r)
+
+def sweep_step(step, points):
+    '''Перебор для одного шага: points - массив (N,3) (радиус ТВЭЛ, внутренний, внешний радиус).
+    Возвращает массивы: число ТВЭЛ и радиус крайнего ТВЭЛ (0 - ТВЭЛ нет)'''
+    r_tvel, r_in, r_out = points.T
+    r = get_radii(step, float((r_out - r_tvel).max()), np.concatenate((r_out - r_tvel, r_in + r_tvel)), 2e-9 * max(r_out.max(), 1))
+    count, far = np.zeros(len(points), dtype=np.int64), np.zeros(len(points))
+    for pad in np.unique(r_tvel).tolist():
+        # условия annulus_sites: r + pad <= r_out и (r - pad >= r_in или r_in == 0); r + pad и r - pad монотонны по r
+        rows = np.flatnonzero(r_tvel == pad)
+        outer = np.searchsorted(r + pad, r_out[rows], side='right')
+        inner = np.where(r_in[rows] != 0, np.searchsorted(r - pad, r_in[rows], side='left'), 0)
+        count[rows] = np.maximum(outer - inner, 0)
+        far[rows] = np.where(count[rows] > 0, r[np.maximum(outer - 1, 0)], 0)
+    return count, far
+
+def sweep(r_tvel, step, r_in, r_out, jobs=None, progress=None):
+    '''Таблица для всех согласованных сочетаний значений параметров (списки r_tvel, step, r_in, r_out), по порядку перебора.
+    jobs - число процессов (1 - без пула), progress(готово, всего, 'rows') вызывается после обработки каждого шага'''
+    if len(r_tvel) * len(step) * len(r_in) * len(r_out) > SWEEP_MAX_ROWS:
+        raise ArrangeDataError("Слишком много сочетаний параметров, допустимо не более {}".format(SWEEP_MAX_ROWS))
+    combos = [combo for combo in product(r_tvel, step, r_in, r_out) if data_consistency(*combo)]
+    if not combos:
+        raise ArrangeDataError("Нет согласованных сочетаний параметров!")
+    table = np.array(combos, dtype=float)
+    steps = np.unique(table[:, 1])
+    groups = [np.flatnonzero(table[:, 1] == value) for value in steps.tolist()]
+    count, far = np.zeros(len(table), dtype=np.int64), np.zeros(len(table))
+    done = 0
+    def store(rows, result):
+        nonlocal done
+        count[rows], far[rows] = result
+        done += len(rows)
+        if progress:
+            progress(done, len(table), 'rows')
+    if jobs == 1 or len(groups) == 1:
+        for value, rows in zip(steps.tolist(), groups):
+            store(rows, sweep_step(value, table[rows][:, [0, 2, 3]]))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            tasks = [executor.submit(sweep_step, value, table[rows][:, [0, 2, 3]]) for value, rows in zip(steps.tolist(), groups)]
+            for rows, task in zip(groups, tasks):
+                store(rows, task.result())
+    fill = count * table[:, 0]**2 / (table[:, 3]**2 - table[:, 2]**2)
+    return [dict(zip(SWEEP_FIELDS, (*combo, number, value, share)))
+            for combo, number, value, share in zip(combos, count.tolist(), far.tolist(), fill.tolist())]
+
+class LatticeCache():
+    '''Узлы решетки одного шага, отсортированные по радиусу, для предпросмотра создаваемой расстановки:
+    узлы, заполняемые Arrange.new при других r_tvel, r_in, r_out, находятся двоичным поиском по радиусу.
+    При увеличении внешнего радиуса досчитывается только новое кольцо узлов, при смене шага кэш строится заново'''
+    def __init__(self):
+        self.step = None
+        self.r_max = 0
+        self.coords = np.empty((0, 2))
+        self.radii = np.empty(0)
+
+    def extend(self, step, r_max):
+        if step != self.step:
+            self.step, self.r_max = step, 0
+            self.coords, self.radii = np.empty((0, 2)), np.empty(0)
+        if r_max <= self.r_max:
+            return
+        arrange = Arrange(0, step, 0, r_max)
+        ring = arrange.get_coords(arrange.annulus_sites(self.r_max, r_max))
+        r = np.sqrt(ring[:, 0] * ring[:, 0] + ring[:, 1] * ring[:, 1])
+        if self.r_max:
+            # узлы на прежней границе уже в кэше: они отбираются тем же сравнением, что и при расчете прежнего круга
+            exact = r.copy()
+            for k in np.flatnonzero(np.abs(r - self.r_max) <= 1e-9 * max(self.r_max, 1)).tolist():
+                exact[k] = radius(*ring[k].tolist())
+            ring, r = ring[exact > self.r_max], r[exact > self.r_max]
+        order = np.argsort(np.concatenate((self.radii, r)), kind='stable')
+        self.coords = np.concatenate((self.coords, ring))[order]
+        self.radii = np.concatenate((self.radii, r))[order]
+        self.r_max = r_max
+
+    def select(self, r_tvel, step, r_in, r_out):
+        '''Координаты (N,2) узлов, которые Arrange.new(r_tvel, step, r_in, r_out) заполнит ТВЭЛ, в порядке радиуса.
+        Условия и уточнение радиусов вблизи границ - как в Arrange.annulus_sites'''
+        if r_out - r_tvel < 0:
+            return np.empty((0, 2))
+        self.extend(step, r_out - r_tvel)
+        eps = 1e-9 * max(r_out, 1)
+        lo = np.searchsorted(self.radii, r_in + r_tvel - 2 * eps) if r_in != 0 else 0
+        hi = np.searchsorted(self.radii, r_out - r_tvel + 2 * eps, side='right')
+        coords, r = self.coords[lo:hi], self.radii[lo:hi].copy()
+        near = np.abs(r + r_tvel - r_out) <= eps
+        if r_in != 0:
+            near |= np.abs(r - r_tvel - r_in) <= eps
+        for k in np.flatnonzero(near).tolist():
+            r[k] = radius(*coords[k].tolist())
+        mask = r + r_tvel <= r_out
+        if r_in != 0:
+            mask &= r - r_tvel >= r_in
+        return coords[mask]
+
+def write_table(rows, filename):
+    # запись таблицы перебора, формат - по расширению (csv, json)
+    kind = Path(filename).suffix.lower().lstrip('.')
+    if kind == 'json':
+        Path(filename).write_text(json.dumps(rows, indent=1))
+    elif kind == 'csv':
+        with open(filename, 'w', newline='') as f:
+            writer = csv.DictWriter(f, SWEEP_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        raise ArrangeDataError("Формат таблицы должен быть одним из: {}".format(", ".join(TABLE_FORMATS)))
@@ -0,0 +1,55 @@
+'''Arrange.annulus_sites и Arrange.new в сравнении с прежним перебором квадрата узлов'''
+import random
+
+import numpy as np
+import pytest
+
+from arrange360 import Arrange, ArrangeDataError, SIN_60, data_consistency, radius
+
+
+def square_scan(arrange, r_in, r_out, pad):
+    # прежний алгоритм Arrange.new: проверка каждого узла квадрата, покрывающего круг r_out, в порядке столбец, ряд
+    index = int(r_out / (arrange.step * SIN_60) + 1)
+    sites = []
+    for i in range(-index, index + 1):
+        for j in range(-index, index + 1):
+            r = radius(*arrange.get_coord(i, j))
+            if r + pad <= r_out and (r - pad >= r_in or r_in == 0.0):
+                sites.append((i, j))
+    return np.array(sites, dtype=np.int64).reshape(-1, 2)
+
+
+def cases():
+    rnd = random.Random(360)
+    # узлы точно на границах: расстояния до узлов решетки - step, step*sqrt(3), 2*step
+    yield from [(0.5, 1, 0, 1.5), (0.5, 1, 0.5, 1.5), (0.4, 1, 0.6, 2.4), (0.5, 1, 3**0.5 - 0.5, 3**0.5 + 0.5),
+                (4.55, 12.75, 0, 12.75 * 2 + 4.55), (4.55, 12.75, 12.75 - 4.55, 12.75 * 3 + 4.55), (0.5, 1, 0, 0.5)]
+    for _ in range(150):
+        step = rnd.choice([1.0, 1.1, 12.75, rnd.uniform(0.5, 3)])
+        r_tvel = rnd.choice([step / 2, rnd.uniform(0.1, step / 2)])
+        r_out = rnd.choice([rnd.randint(1, 12) * step / 2 + r_tvel, rnd.uniform(step, 12 * step)])
+        r_in = rnd.choice([0, 0, rnd.randint(1, 6) * step / 2 - r_tvel, rnd.uniform(0, r_out)])
+        yield r_tvel, step, max(r_in, 0), r_out
+
+
+PARAMS = [case for case in cases() if data_consistency(*case)]
+
+
+@pytest.mark.parametrize('mirror', [False, True])
+@pytest.mark.parametrize('params', PARAMS)
+def test_annulus_sites(params, mirror):
+    r_tvel, step, r_in, r_out = params
+    arrange = Arrange(r_tvel, step, r_in, r_out)
+    arrange.mirror = mirror
+    assert np.array_equal(arrange.annulus_sites(r_in, r_out, r_tvel), square_scan(arrange, r_in, r_out, r_tvel))
+
+
+@pytest.mark.parametrize('params', PARAMS[::5])
+def test_new(params):
+    expected = square_scan(Arrange(*params), params[2], params[3], params[0])
+    try:
+        arrange = Arrange.new(*params)
+    except ArrangeDataError:
+        assert not len(expected)
+        return
+    assert arrange.get_index_array().tolist() == expected.tolist()
@@ -0,0 +1,184 @@
+'''Модель расстановки: пакетные операции и журнал отмены'''
+import numpy as np
+
+from arrange360 import TEXT_MIRROR, Arrange, Comparison, History
+
+
+def state(arrange):
+    return dict(arrange.index), {key: set(sites) for key, sites in arrange.tvel.items()}, arrange.spatial.cells
+
+
+def make():
+    arrange = Arrange.new(0.4, 1, 0, 5)
+    arrange.history = History()
+    return arrange
+
+
+def test_add_many_duplicates_undo():
+    # повторы позиции в пакетном добавлении: добавление, отмена и повтор без ошибок, модель согласована
+    arrange = make()
+    before = state(arrange)
+    sites = np.array([[10, 10], [10, 10], [11, 10], [0, 0], [0, 0]])
+    arrange.add_many(sites, 2)
+    assert arrange.get_tvel(10, 10) == 2 and arrange.get_tvel(0, 0) == 2
+    assert sum(map(len, arrange.spatial.cells.values())) == arrange.get_size()
+    arrange.history.undo(arrange)
+    assert state(arrange) == before
+    arrange.history.redo(arrange)
+    assert arrange.get_tvel(10, 10) == 2 and arrange.get_tvel(11, 10) == 2
+
+
+def test_pop_many_duplicates_undo():
+    arrange = make()
+    arrange.mark(0, 0)
+    before = state(arrange)
+    arrange.pop_many([[0, 0], [0, 0], [1, 0], [1, 0]])
+    assert arrange.get_tvel(0, 0) is None and arrange.get_tvel(1, 0) is None
+    assert sum(map(len, arrange.spatial.cells.values())) == arrange.get_size()
+    arrange.history.undo(arrange)
+    assert state(arrange) == before
+    assert arrange.is_marked(0, 0)
+
+
+def test_text_mirror_marker(tmp_path):
+    # признак отражения - нечисловое 8 поле: прежние версии, читающие все поля как числа, отвергают файл
+    arrange = make()
+    arrange.add(3, 2, 1)
+    arrange.mirror = True
+    arrange.position = [1.5, -2.0]
+    arrange.rotation = 30.0
+    path = tmp_path / 'mirror.tve'
+    arrange.save_text(path)
+    header = path.read_text(encoding='utf-8').splitlines()[0].split(',')
+    assert len(header) == 8 and header[7] == TEXT_MIRROR
+    loaded = Arrange.load(path)
+    assert loaded.mirror and list(loaded.position) == [1.5, -2.0] and loaded.rotation == 30.0
+    assert loaded.get_tvel(3, 2) == 1
+
+
+def problem_sets(arrange):
+    return {name: set(map(tuple, sites.tolist())) for name, sites in arrange.validate().items()}
+
+
+def full_check(arrange):
+    # та же проверка без кэша - эталон для инкрементного обновления
+    arrange._problems = None
+    return problem_sets(arrange)
+
+
+def test_validate_incremental():
+    # после правок проверяются только затронутые позиции, результат совпадает с полной проверкой
+    arrange = Arrange.new(0.4, 1, 2, 6)
+    arrange.history = History()
+    assert problem_sets(arrange) == {'outside': set(), 'inside': set()}
+    arrange.add(0, 0, 2)
+    arrange.add(20, 0, 1)
+    arrange.add_many([[0, 1], [1, 0], [0, 30], [0, 3]], 3)
+    problems = problem_sets(arrange)
+    assert problems['inside'] == {(0, 0), (0, 1), (1, 0)} and problems['outside'] == {(20, 0), (0, 30)}
+    assert problems == full_check(arrange)
+    arrange.pop(0, 0)
+    arrange.pop_many([[20, 0], [1, 0]])
+    arrange.add(0, 1, 1) # смена типа не меняет геометрию
+    assert problem_sets(arrange) == full_check(arrange) == {'outside': {(0, 30)}, 'inside': {(0, 1)}}
+    arrange.history.undo(arrange)
+    arrange.history.undo(arrange)
+    assert problem_sets(arrange) == full_check(arrange)
+
+
+def test_validate_after_transform():
+    # после изменения параметров результат пересчитывается целиком
+    arrange = Arrange.new(0.4, 1, 0, 6)
+    arrange.validate()
+    arrange.set_params(position=[3, 0])
+    problems = problem_sets(arrange)
+    assert problems['outside'] and problems == full_check(arrange)
+    arrange.add(-40, 0, 1)
+    arrange.reflect()
+    assert problem_sets(arrange) == full_check(arrange)
+
+
+def diff_sets(diff):
+    # отличия как множества (позиция, типы) - порядок позиций не важен
+    return ({(*site, type) for site, type in zip(map(tuple, diff['added'].tolist()), diff['added_types'].tolist())},
+            {(*site, type) for site, type in zip(map(tuple, diff['removed'].tolist()), diff['removed_types'].tolist())},
+            {(*site, old, new) for site, old, new in zip(map(tuple, diff['retyped'].tolist()), diff['old_types'].tolist(), diff['new_types'].tolist())},
+            diff['types'])
+
+
+def test_comparison_update():
+    # отличия, обновленные по затронутым позициям, совпадают с полным расчетом
+    reference = Arrange.new(0.4, 1, 0, 6)
+    arrange = make()
+    arrange.add_many([[0, 0], [1, 0]], 2)
+    comparison = Comparison(reference, arrange)
+    assert diff_sets(comparison.get()) == diff_sets(reference.diff(arrange))
+    rng = np.random.default_rng(1)
+    for _ in range(50):
+        sites = rng.integers(-8, 8, (int(rng.integers(1, 6)), 2))
+        action = rng.integers(3)
+        if action == 0:
+            arrange.add_many(sites, int(rng.integers(1, 4)))
+        elif action == 1:
+            arrange.pop_many(sites)
+        else:
+            arrange.add(*sites[0].tolist(), int(rng.integers(1, 4)))
+        comparison.update(arrange, arrange._get_items(sites)[1])
+        assert diff_sets(comparison.get()) == diff_sets(reference.diff(arrange))
+    arrange.history.undo(arrange)
+    comparison.reset(arrange)
+    assert diff_sets(comparison.get()) == diff_sets(reference.diff(arrange))
+
+
+def check_index(arrange, expected):
+    # индекс позиция -> тип, множества по типам и get_values согласованы с ожидаемым словарем
+    assert arrange.index == expected
+    assert {item: key for key, sites in arrange.tvel.items() for item in sites} == expected
+    assert all(arrange.tvel.values()) # пустые типы удаляются
+    assert sorted(arrange.get_values()) == sorted(expected) and arrange.get_size() == len(expected)
+    for key in set(expected.values()) | {0, 99}:
+        assert arrange.get_quantity(key) == list(expected.values()).count(key)
+    assert arrange.get_tvel_types() == max(expected.values(), default=0)
+
+
+def test_index_consistency():
+    # случайные правки в сравнении с обычным словарем
+    arrange = Arrange(0.4, 1, 0, 5)
+    expected = {}
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        i, j = rng.integers(-5, 5, 2).tolist()
+        type = int(rng.integers(1, 4))
+        action = rng.integers(4)
+        if action == 0:
+            arrange.add(i, j, type)
+            expected[(i, j)] = type
+        elif action == 1:
+            arrange.pop(i, j)
+            expected.pop((i, j), None)
+        elif action == 2:
+            sites = rng.integers(-5, 5, (5, 2))
+            arrange.add_many(sites, type)
+            expected.update(dict.fromkeys(map(tuple, sites.tolist()), type))
+        else:
+            sites = rng.integers(-5, 5, (5, 2))
+            arrange.pop_many(sites)
+            for item in map(tuple, sites.tolist()):
+                expected.pop(item, None)
+        assert arrange.get_tvel(i, j) == expected.get((i, j))
+        check_index(arrange, expected)
+
+
+def test_pop_releases_marks():
+    # удаление ТВЭЛ снимает его пометки, смена типа сохраняет
+    arrange = Arrange(0.4, 1, 0, 5)
+    arrange.add(0, 0, 1)
+    arrange.add(1, 0, 1)
+    arrange.mark(0, 0)
+    arrange.mark(1, 0)
+    arrange.add(0, 0, 2)
+    arrange.pop(1, 0)
+    assert arrange.is_marked(0, 0) and not arrange.is_marked(1, 0)
+    arrange.add(1, 0, 1)
+    assert not arrange.is_marked(1, 0)
+    check_index(arrange, {(0, 0): 2, (1, 0): 1})
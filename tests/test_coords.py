@@ -0,0 +1,47 @@
+'''Пакетное преобразование координат в сравнении с поштучным'''
+import numpy as np
+import pytest
+
+from arrange360 import Arrange
+
+
+PARAMS = [((0, 0), 0, False), ((1.5, -2.25), 30, False), ((-3, 0.5), -123.4, True), ((0, 0), 90, True), ((7.1, 2), 360 + 45, False)]
+
+
+def make(position, rotation, mirror):
+    arrange = Arrange(4.55, 12.75, 0, 200)
+    arrange.position = list(position)
+    arrange.rotation = rotation
+    arrange.mirror = mirror
+    return arrange
+
+
+@pytest.mark.parametrize('position, rotation, mirror', PARAMS)
+def test_get_coords(position, rotation, mirror):
+    # тот же порядок операций - совпадение до последнего знака
+    arrange = make(position, rotation, mirror)
+    indices = np.random.default_rng(2).integers(-20, 20, (500, 2))
+    expected = [arrange.get_coord(i, j) for i, j in indices.tolist()]
+    assert arrange.get_coords(indices).tolist() == [list(item) for item in expected]
+
+
+@pytest.mark.parametrize('position, rotation, mirror', PARAMS)
+def test_get_indices(position, rotation, mirror):
+    # узлы решетки переходят сами в себя, произвольные точки - в тот же узел, что и при поштучном расчете
+    arrange = make(position, rotation, mirror)
+    rng = np.random.default_rng(3)
+    indices = rng.integers(-20, 20, (500, 2))
+    assert arrange.get_indices(arrange.get_coords(indices)).tolist() == indices.tolist()
+    points = rng.uniform(-250, 250, (500, 2))
+    assert arrange.get_indices(points).tolist() == [list(arrange.get_index(x, y)) for x, y in points.tolist()]
+
+
+def test_transform_cache():
+    # кэш преобразования сбрасывается при изменении шага, смещения, поворота и отражения
+    arrange = make((0, 0), 0, False)
+    before = arrange.get_coord(3, 1)
+    for name, value in (('step', 13), ('position', [1, 0]), ('rotation', 10), ('mirror', True)):
+        setattr(arrange, name, value)
+        after = arrange.get_coord(3, 1)
+        assert after != before and arrange.get_coords([[3, 1]]).tolist() == [list(after)]
+        before = after
@@ -0,0 +1,24 @@
+'''Цвета изображения расстановки совпадают с цветами Tk на экране'''
+import pytest
+
+from arrange360 import ArrangeDataError
+from export360 import to_hex, to_rgb
+
+
+@pytest.mark.parametrize('color, rgb', [('green', (0, 255, 0)), ('gray', (190, 190, 190)), ('Grey', (190, 190, 190)),
+                                        ('purple', (160, 32, 240)), ('maroon', (176, 48, 96)), ('lime', (0, 255, 0)),
+                                        ('teal', (0, 128, 128)), ('#f80', (255, 136, 0)), ('#00ff7f', (0, 255, 127)),
+                                        ('#ffff80800000', (255, 128, 0))])
+def test_to_rgb(color, rgb):
+    # значения имен - из таблицы цветов Tk (X11), как их показывает холст
+    assert to_rgb(color) == rgb
+
+
+def test_to_hex():
+    assert to_hex(to_rgb('orange')) == '#ffa500'
+
+
+@pytest.mark.parametrize('color', ['nocolor', '#12', '#gggggg'])
+def test_unknown_color(color):
+    with pytest.raises(ArrangeDataError):
+        to_rgb(color)
@@ -0,0 +1,225 @@
+'''Чтение и запись файлов расстановки'''
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from arrange360 import (Arrange, ArrangeCancelled, ArrangeDataError, ArrangeFileError, BIN_HEADER, BIN_MAGIC, BIN_MIRROR, DEFAULT_LAYER,
+                        OUTPUT_FORMAT)
+
+
+def state(arrange):
+    # параметры, состав и пометки по слоям; порядок позиций не важен
+    return ((arrange.r_tvel, arrange.step, arrange.r_in, arrange.r_out, tuple(arrange.position), arrange.rotation, arrange.mirror),
+            dict(arrange.index), {name: set(map(tuple, arrange.get_layer(name).tolist())) for name in arrange.get_layers()})
+
+
+@pytest.fixture
+def arrange():
+    arrange = Arrange.new(0.4, 1, 0.5, 6)
+    sites = arrange.get_index_array()
+    arrange.add_many(sites[::3], 2)
+    arrange.add_many(sites[1::7], 300)
+    arrange.mark(*sites[5].tolist())
+    arrange.set_params(position=[1.25, -0.5], rotation=17.5)
+    arrange.reflect()
+    return arrange
+
+
+@pytest.mark.parametrize('ext', ['tvb', 'tve'])
+def test_round_trip(arrange, tmp_path, ext):
+    filename = str(tmp_path / ('a.' + ext))
+    arrange.save(filename)
+    assert state(Arrange.load(filename)) == state(arrange)
+
+
+def test_format_by_signature(arrange, tmp_path):
+    # формат определяется по содержимому, а не по расширению
+    binary, text = tmp_path / 'a.tvb', tmp_path / 'a.tve'
+    arrange.save_binary(binary)
+    arrange.save_text(text)
+    assert binary.read_bytes().startswith(BIN_MAGIC) and not text.read_bytes().startswith(BIN_MAGIC)
+    swapped_binary, swapped_text = binary.rename(tmp_path / 'b.tve'), text.rename(tmp_path / 'b.tvb')
+    assert state(Arrange.load(swapped_binary)) == state(Arrange.load(swapped_text)) == state(arrange)
+
+
+def test_binary_version_1(tmp_path):
+    # версия 1: помеченные ТВЭЛ - отдельные массивы столбцов и рядов, читаются в слой по умолчанию
+    cols, rows, types = np.array([0, 1, 2], '<i4'), np.array([0, 0, 1], '<i4'), np.array([1, 1, 3], '<u2')
+    data = BIN_HEADER.pack(BIN_MAGIC, 1, BIN_MIRROR, 0.4, 1, 0, 6, 0.5, 0, 10, 3, 1)
+    data += b''.join(array.tobytes() for array in (cols, rows, np.array([2], '<i4'), np.array([1], '<i4'), types))
+    (tmp_path / 'v1.tvb').write_bytes(data)
+    arrange = Arrange.load(tmp_path / 'v1.tvb')
+    assert arrange.index == {(0, 0): 1, (1, 0): 1, (2, 1): 3}
+    assert arrange.get_marked().tolist() == [[2, 1]] and arrange.mirror
+    assert (arrange.position, arrange.rotation) == ([0.5, 0], 10)
+
+
+def test_binary_type_range(arrange, tmp_path):
+    # тип хранится в uint16, расстановка с большим типом не записывается
+    arrange.add(0, 0, 70000)
+    with pytest.raises(ValueError):
+        arrange.save(str(tmp_path / 'a.tvb'))
+    assert not list(tmp_path.iterdir())
+
+
+def test_binary_empty(tmp_path):
+    arrange = Arrange(0.4, 1, 0, 6)
+    arrange.save_binary(tmp_path / 'empty.tvb')
+    assert state(Arrange.load(tmp_path / 'empty.tvb')) == state(arrange)
+
+
+def test_parse_text_problems():
+    # все ошибочные строки собираются с номерами, прочитанная без них расстановка передается в исключении
+    lines = ["0.4,1,0,6", "0,0,1", "1,0", "x,1,2", "", "2,0,0", "0,0,3", "3,0,2", "1,1,-1", "4,0,2,5"]
+    with pytest.raises(ArrangeFileError) as error:
+        Arrange.parse_text(lines)
+    problems = error.value.problems
+    assert [(n, line) for n, line, _ in problems] == [(3, "1,0"), (4, "x,1,2"), (6, "2,0,0"), (7, "0,0,3"), (9, "1,1,-1"), (10, "4,0,2,5")]
+    assert "первое вхождение в строке 2" in problems[3][2]
+    assert error.value.arrange.index == {(0, 0): 1, (3, 0): 2}
+
+
+def test_parse_text_layer_problems():
+    lines = ["0.4,1,0,6", "0,0,1", "1,0,2", "[absorber]", "0,0", "5,5", "1", "[bad name]", "1,0"]
+    with pytest.raises(ArrangeFileError) as error:
+        Arrange.parse_text(lines)
+    assert [n for n, _, _ in error.value.problems] == [6, 7, 8]
+    assert error.value.arrange.get_layer('absorber').tolist() == [[0, 0]]
+
+
+@pytest.mark.parametrize('lines', [[], ["0.4,1,0"], ["0.4,1,x,6"], ["0.6,1,0,6"], ["0.4,1,3,2"]])
+def test_parse_text_header(lines):
+    # без верной первой строки расстановку прочитать нельзя
+    with pytest.raises(ArrangeFileError) as error:
+        Arrange.parse_text(lines)
+    assert error.value.arrange is None and not error.value.problems
+
+
+def test_parse_text_header_fields():
+    # первая строка: только радиусы и шаг, старый формат, текущий, текущий с признаком отражения
+    assert Arrange.parse_text(["0.4,1,0,6"]).position == [0, 0]
+    arrange = Arrange.parse_text(["0.4,1,0,6,2,3,45", "0,0,1"])
+    assert (arrange.position, arrange.rotation, arrange.mirror) == ([2, 3], 45, False)
+    arrange = Arrange.parse_text(["0.4,1,0,6,2,3,45,mirror"])
+    assert (arrange.position, arrange.rotation, arrange.mirror) == ([2, 3], 45, True)
+
+
+def test_parse_text_fast_path():
+    # файл без ошибок разбирается одним вызовом, результат тот же, что и при построчном разборе
+    lines = ["0.4,1,0,6"] + ["{},{},{}".format(i, j, 1 + (i + j) % 3) for i in range(-3, 4) for j in range(-3, 4)]
+    good = Arrange.parse_text(lines)
+    with pytest.raises(ArrangeFileError) as error:
+        Arrange.parse_text(lines + ["bad"])
+    assert good.index == error.value.arrange.index and len(good.index) == 49
+
+
+def old_write_coord(arrange, filename):
+    # прежняя запись координат: поштучный get_coord и запись строки за строкой
+    newdir = filename.split('/')[-1].replace(".tve", '')
+    outpath = Path(filename).parent / newdir
+    outpath.mkdir()
+    for key in arrange.tvel:
+        with open("{}/{}.tve{}".format(outpath, newdir, key), 'w') as f:
+            for item in arrange.tvel[key]:
+                f.write(OUTPUT_FORMAT.format(*arrange.get_coord(*item)))
+    with open("{}/{}.mrkd".format(outpath, newdir), 'w') as f:
+        for item in arrange.get_layer(DEFAULT_LAYER).tolist():
+            f.write(OUTPUT_FORMAT.format(*arrange.get_coord(*item)))
+    return outpath
+
+
+def test_write_coord_same_bytes(arrange, tmp_path):
+    # файлы координат побайтно совпадают с прежней поштучной записью
+    (tmp_path / 'old').mkdir()
+    (tmp_path / 'new').mkdir()
+    old = old_write_coord(arrange, str(tmp_path / 'old' / 'a.tve'))
+    arrange.write_coord(str(tmp_path / 'new' / 'a.tve'))
+    new = tmp_path / 'new' / 'a'
+    assert sorted(path.name for path in new.iterdir()) == sorted(path.name for path in old.iterdir())
+    for path in old.iterdir():
+        assert (new / path.name).read_bytes() == path.read_bytes()
+
+
+def test_write_coord_atomic(arrange, tmp_path):
+    # при ошибке или отмене прежние файлы координат остаются нетронутыми, временная директория удаляется
+    filename = str(tmp_path / 'a.tve')
+    arrange.write_coord(filename)
+    before = {path.name: path.read_bytes() for path in (tmp_path / 'a').iterdir()}
+    arrange.set_params(rotation=90)
+    def cancel(done, total, unit):
+        raise ArrangeCancelled("Операция прервана")
+    with pytest.raises(ArrangeCancelled):
+        arrange.write_coord(filename, cancel)
+    assert {path.name: path.read_bytes() for path in (tmp_path / 'a').iterdir()} == before
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['a']
+    arrange.write_coord(filename)
+    after = {path.name: path.read_bytes() for path in (tmp_path / 'a').iterdir()}
+    assert after.keys() == before.keys() and after != before
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['a']
+
+
+def test_save_atomic(arrange, tmp_path):
+    # отмена сохранения оставляет прежний файл и координаты
+    filename = str(tmp_path / 'a.tvb')
+    arrange.save(filename)
+    arrange.write_coord(filename)
+    data = Path(filename).read_bytes()
+    arrange.add(20, 20, 5)
+    def cancel(done, total, unit):
+        raise ArrangeCancelled("Операция прервана")
+    with pytest.raises(ArrangeCancelled):
+        arrange.save(filename, cancel)
+    assert Path(filename).read_bytes() == data
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['a', 'a.tvb']
+
+
+@pytest.fixture
+def layered():
+    # позиция в нескольких слоях, пустой слой, слой с именем не латиницей
+    arrange = Arrange.new(0.4, 1, 0, 5)
+    sites = arrange.get_index_array()
+    arrange.mark_many(sites[::5])
+    arrange.mark_many(sites[::3], True, 'absorber')
+    arrange.mark_many(sites[:4], True, 'датчики')
+    arrange.add_layer('empty')
+    return arrange
+
+
+@pytest.mark.parametrize('ext', ['tvb', 'tve'])
+def test_layers_round_trip(layered, tmp_path, ext):
+    filename = str(tmp_path / ('a.' + ext))
+    layered.save(filename)
+    loaded = Arrange.load(filename)
+    assert loaded.get_layers() == layered.get_layers() == [DEFAULT_LAYER, 'absorber', 'датчики', 'empty']
+    assert state(loaded) == state(layered)
+
+
+def as_set(sites):
+    return set(map(tuple, sites.tolist()))
+
+
+def test_layers_queries(layered):
+    sites = layered.get_index_array()
+    default, absorber = as_set(sites[::5]), as_set(sites[::3])
+    assert as_set(layered.get_layer('absorber')) == absorber
+    assert as_set(layered.get_marked([DEFAULT_LAYER, 'absorber'])) == default | absorber
+    assert as_set(layered.get_marked([DEFAULT_LAYER, 'absorber'], how='all')) == default & absorber
+    assert as_set(layered.get_marked([DEFAULT_LAYER, 'missing'], how='all')) == set()
+    assert layered.get_stats()['layers'] == {DEFAULT_LAYER: len(default), 'absorber': len(absorber), 'датчики': 4, 'empty': 0}
+    assert layered.get_marks(*sites[0].tolist()) == (DEFAULT_LAYER, 'absorber', 'датчики')
+
+
+def test_layers_coord_files(layered, tmp_path):
+    # файл координат для каждого непустого слоя: <имя расстановки>.<имя слоя>
+    layered.write_coord(str(tmp_path / 'a.tve'))
+    names = sorted(path.name for path in (tmp_path / 'a').iterdir())
+    assert names == sorted(['a.tve1', 'a.' + DEFAULT_LAYER, 'a.absorber', 'a.датчики'])
+    lines = (tmp_path / 'a' / 'a.absorber').read_text().splitlines()
+    assert lines == [OUTPUT_FORMAT.format(*coord).rstrip() for coord in layered.get_coords(layered.get_layer('absorber')).tolist()]
+
+
+@pytest.mark.parametrize('name', ['', 'a b', 'tve1', 'a.b', '[x]'])
+def test_layer_names(name):
+    with pytest.raises(ArrangeDataError):
+        Arrange(0.4, 1, 0, 5).add_layer(name)
@@ -0,0 +1,107 @@
+'''Журнал отмены: каждая операция после отмены и повтора возвращает расстановку в прежнее состояние'''
+import numpy as np
+import pytest
+
+from arrange360 import Arrange, History
+
+
+def state(arrange):
+    # состав, пометки по слоям и параметры преобразования; порядок позиций не важен.
+    # Журнал хранит пометки, а не список слоев: слой, созданный отменяемой операцией, остается пустым
+    layers = {name: set(map(tuple, arrange.get_layer(name).tolist())) for name in arrange.get_layers()}
+    return ({key: set(sites) for key, sites in arrange.tvel.items()}, {name: sites for name, sites in layers.items() if sites},
+            (arrange.step, tuple(arrange.position), arrange.rotation, arrange.mirror))
+
+
+def make():
+    arrange = Arrange.new(0.4, 1, 0, 4)
+    arrange.history = History()
+    arrange.mark(0, 0)
+    arrange.mark_many([[1, 0], [2, 0]], True, 'absorber')
+    arrange.history = History()
+    return arrange
+
+
+OPERATIONS = {
+    'add': lambda arrange: arrange.add(20, 20, 2),
+    'retype': lambda arrange: arrange.add(0, 0, 3),
+    'pop': lambda arrange: arrange.pop(0, 0),
+    'mark': lambda arrange: arrange.mark(1, 1, 'absorber'),
+    'unmark': lambda arrange: arrange.unmark(1, 0, 'absorber'),
+    'add_many': lambda arrange: arrange.add_many([[0, 0], [1, 0], [30, 0]], 4),
+    'pop_many': lambda arrange: arrange.pop_many([[0, 0], [1, 0], [2, 0], [30, 0]]),
+    'mark_many': lambda arrange: arrange.mark_many([[0, 0], [0, 1], [0, 2]], True, 'sensor'),
+    'region': lambda arrange: arrange.apply_region(('sector', 0, 90), 'fill', 5),
+    'remove_layer': lambda arrange: arrange.remove_layer('absorber'),
+    'param': lambda arrange: arrange.set_params(step=1.5, position=[1, 2], rotation=30),
+    'reflect': lambda arrange: arrange.reflect(),
+}
+
+
+@pytest.mark.parametrize('name', OPERATIONS)
+def test_undo_redo_round_trip(name):
+    arrange = make()
+    before = state(arrange)
+    OPERATIONS[name](arrange)
+    after = state(arrange)
+    assert after != before
+    arrange.history.undo(arrange)
+    assert state(arrange) == before
+    arrange.history.redo(arrange)
+    assert state(arrange) == after
+
+
+def test_undo_redo_sequence():
+    # все операции подряд отменяются в обратном порядке и повторяются в прямом
+    arrange = make()
+    states = [state(arrange)]
+    for operation in OPERATIONS.values():
+        operation(arrange)
+        states.append(state(arrange))
+    for expected in reversed(states[:-1]):
+        arrange.history.undo(arrange)
+        assert state(arrange) == expected
+    assert arrange.history.undo(arrange) == []
+    for expected in states[1:]:
+        arrange.history.redo(arrange)
+        assert state(arrange) == expected
+
+
+def test_changed_sites():
+    # отмена правок возвращает затронутые позиции, отмена преобразований - None (нужна полная перерисовка)
+    arrange = make()
+    arrange.add(20, 20, 2)
+    arrange.pop_many([[0, 0], [1, 0]])
+    arrange.reflect()
+    assert arrange.history.undo(arrange) is None
+    assert sorted(arrange.history.undo(arrange)) == [(0, 0), (1, 0)]
+    assert arrange.history.undo(arrange) == [(20, 20)]
+
+
+def test_new_edit_clears_redo():
+    arrange = make()
+    arrange.add(20, 20, 2)
+    arrange.history.undo(arrange)
+    arrange.add(21, 20, 2)
+    assert arrange.history.redo(arrange) == []
+    assert arrange.get_tvel(20, 20) is None
+
+
+def test_budget():
+    # при превышении объема удаляются самые старые записи, последняя запись сохраняется всегда
+    arrange = make()
+    history = arrange.history = History(budget=3 * History.ENTRY_SIZE)
+    for k in range(10):
+        arrange.add(20 + k, 20, 2)
+    assert len(history.undo_stack) == 3 and history.size == 3 * History.ENTRY_SIZE
+    for _ in range(3):
+        history.undo(arrange)
+    assert history.undo(arrange) == []
+    assert [arrange.get_tvel(20 + k, 20) for k in range(10)] == [2] * 7 + [None] * 3
+    # пакетная запись больше объема журнала остается единственной
+    sites = np.column_stack((np.arange(100, 400), np.zeros(300, dtype=np.int64)))
+    arrange.add_many(sites, 3)
+    assert len(history.undo_stack) == 1 and not history.redo_stack
+    assert history.size == history.get_size(history.undo_stack[0]) > history.budget
+    history.undo(arrange)
+    assert arrange.get_tvel(100, 0) is None
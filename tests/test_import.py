@@ -0,0 +1,12 @@
+'''Точка входа и модель импортируются без tkinter и быстро (пакетный режим работает без графического интерфейса)'''
+import pytest
+
+# проверка та же, что и перед замерами benchmark.py; сам benchmark.py использует заменитель холста из gui360
+benchmark = pytest.importorskip('benchmark')
+
+
+def test_import_without_tkinter():
+    # лучшее из нескольких запусков, чтобы не зависеть от холодного кэша диска
+    results = [benchmark.check_import(benchmark.IMPORT_BUDGET) for _ in range(3)]
+    assert not all(problems for _, problems in results), results[0][1]
+    assert all("tkinter" not in problem for _, problems in results for problem in problems)
@@ -0,0 +1,79 @@
+'''Операции с файлами в рабочем потоке: независимая копия расстановки и отмена'''
+import threading
+import time
+
+import pytest
+
+from arrange360 import Arrange, ArrangeCancelled
+
+pytest.importorskip('tkinter')
+from gui360 import FileJob
+
+
+def wait(job, timeout=10):
+    # опрос очереди, как в интерфейсе, до завершения операции
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = job.poll()
+        if result is not None:
+            return result
+        time.sleep(0.001)
+    raise TimeoutError(job.title)
+
+
+def test_snapshot_independent():
+    # правки исходной расстановки не видны в копии и наоборот
+    arrange = Arrange.new(0.4, 1, 0, 5)
+    arrange.mark(0, 0)
+    arrange.set_params(position=[1, 2])
+    copy = arrange.snapshot()
+    index, layer, position = dict(copy.index), copy.get_layer('mrkd').tolist(), list(copy.position)
+    arrange.add(0, 0, 2)
+    arrange.pop(1, 0)
+    arrange.unmark(0, 0)
+    arrange.mark(0, 1)
+    arrange.add_many([[30, 30]], 3)
+    arrange.position[0] = 5
+    assert copy.index == index and copy.get_layer('mrkd').tolist() == layer and copy.position == position
+    assert {item for cell in copy.spatial.cells.values() for item in cell} == set(index)
+    assert copy.history is None
+    copy.pop(0, 0)
+    assert arrange.get_tvel(0, 0) == 2 and arrange.is_marked(0, 1)
+
+
+def test_job_done():
+    job = FileJob('test', "Проверка", lambda progress: (progress(1, 2, 'lines'), 42)[1], None, None)
+    assert wait(job) == ('done', 42)
+    assert job.progress == (1, 2, 'lines') and job.status() == "  Проверка: 1 из 2 строк"
+
+
+def test_job_error():
+    def func(progress):
+        raise OSError("нет доступа")
+    kind, error = wait(FileJob('test', "Проверка", func, None, None))
+    assert kind == 'error' and isinstance(error, OSError)
+
+
+def test_job_cancel(tmp_path):
+    # отмена прерывает запись при очередном сообщении о ходе, недописанный файл удаляется, прежний остается
+    arrange = Arrange.new(0.4, 1, 0, 60)
+    filename = str(tmp_path / 'a.tve')
+    arrange.save(filename)
+    data = (tmp_path / 'a.tve').read_bytes()
+    arrange.add(0, 0, 2)
+    started = threading.Event()
+    release = threading.Event()
+    def func(progress):
+        def report(done, total, unit):
+            started.set()
+            release.wait()
+            progress(done, total, unit)
+        arrange.snapshot().save(filename, report)
+    job = FileJob('test', "Сохранение", func, None, None, write=True)
+    assert started.wait(10)
+    job.cancel()
+    release.set()
+    kind, error = wait(job)
+    assert kind == 'error' and isinstance(error, ArrangeCancelled)
+    assert (tmp_path / 'a.tve').read_bytes() == data
+    assert [path.name for path in tmp_path.iterdir()] == ['a.tve']
@@ -0,0 +1,61 @@
+'''Пакетный режим reactor360: коды завершения при ошибочных файлах'''
+import pytest
+
+from arrange360 import Arrange, ArrangeFileError, BIN_HEADER
+from reactor360 import diff_files, image_file
+
+
+@pytest.fixture
+def files(tmp_path):
+    arrange = Arrange.new(0.4, 1, 0, 6)
+    arrange.mark(0, 0)
+    arrange.mark(1, 0, 'absorber')
+    text, binary = tmp_path / 'a.tve', tmp_path / 'a.tvb'
+    arrange.save(str(text))
+    arrange.save(str(binary))
+    return text, binary
+
+
+def corrupt(binary, data):
+    broken = binary.with_name('broken.tvb')
+    broken.write_bytes(data)
+    return broken
+
+
+@pytest.mark.parametrize('cut', [BIN_HEADER.size - 4, BIN_HEADER.size + 10, -3])
+def test_truncated_binary(files, cut, capsys):
+    text, binary = files
+    broken = corrupt(binary, binary.read_bytes()[:cut])
+    with pytest.raises(ArrangeFileError, match='broken.tvb: файл обрезан'):
+        Arrange.load(str(broken))
+    assert diff_files(str(text), str(broken)) == 2
+    assert 'Ошибка' in capsys.readouterr().err
+
+
+def test_binary_wrong_version(files):
+    _, binary = files
+    data = bytearray(binary.read_bytes())
+    data[8] = 99 # поле версии сразу после сигнатуры
+    with pytest.raises(ArrangeFileError, match='версия формата 99'):
+        Arrange.load(str(corrupt(binary, bytes(data))))
+
+
+def test_diff_same(files, capsys):
+    text, binary = files
+    assert diff_files(str(text), str(binary)) == 0
+
+
+def test_image_truncated_binary(files, tmp_path, capsys):
+    _, binary = files
+    broken = corrupt(binary, binary.read_bytes()[:BIN_HEADER.size - 4])
+    assert image_file(str(broken), str(tmp_path / 'a.svg'), ini=str(tmp_path / 'none.ini')) == 1
+    assert 'файл обрезан' in capsys.readouterr().err
+    assert not (tmp_path / 'a.svg').exists()
+
+
+def test_image_bad_ini(files, tmp_path):
+    _, binary = files
+    ini = tmp_path / 'bad.ini'
+    ini.write_text('.\n[not json\n')
+    assert image_file(str(binary), str(tmp_path / 'a.svg'), ini=str(ini)) == 1
+    assert image_file(str(binary), str(tmp_path / 'a.svg'), ini=str(tmp_path / 'none.ini')) == 0
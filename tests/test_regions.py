@@ -0,0 +1,85 @@
+'''Векторные маски областей и пакетные действия над областью'''
+import math
+
+import numpy as np
+import pytest
+
+from arrange360 import Arrange, History
+
+
+def inside_polygon(x, y, vertices):
+    # поштучная проверка многоугольника правилом четности
+    inside = False
+    for (x1, y1), (x2, y2) in zip(vertices[-1:] + vertices[:-1], vertices):
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+def expected(region, x, y):
+    kind = region[0]
+    if kind == 'ring':
+        return region[1] <= math.hypot(x, y) <= region[2]
+    if kind == 'sector':
+        return region[2] - region[1] >= 360 or (math.degrees(math.atan2(y, x)) - region[1]) % 360 <= (region[2] - region[1]) % 360
+    if kind == 'beam':
+        return x * math.sin(math.radians(region[1])) - y * math.cos(math.radians(region[1])) <= 0
+    return inside_polygon(x, y, region[1])
+
+
+REGIONS = [('ring', 0, 3), ('ring', 2.5, 4), ('sector', 0, 90), ('sector', 350, 10), ('sector', -45, 200), ('sector', 30, 390),
+           ('beam', 0), ('beam', 135), ('beam', -60),
+           ('polygon', [(-3, -3), (3, -3), (3, 3), (-3, 3)]), ('polygon', [(0, 0), (4, 1), (1, 1.5), (2, 4), (-1, 3)])]
+
+
+@pytest.mark.parametrize('region', REGIONS)
+def test_region_mask(region):
+    arrange = Arrange(0.4, 1, 0, 6)
+    coords = np.random.default_rng(4).uniform(-5, 5, (400, 2))
+    mask = arrange.region_mask(coords, region)
+    assert mask.tolist() == [expected(region, x, y) for x, y in coords.tolist()]
+
+
+def test_unknown_region():
+    with pytest.raises(ValueError):
+        Arrange(0.4, 1, 0, 6).region_mask(np.zeros((1, 2)), ('square', 1))
+
+
+@pytest.mark.parametrize('region', REGIONS)
+def test_select(region):
+    # ТВЭЛ и узлы решетки области - те, чьи координаты попадают в маску (кольцо - через пространственный индекс)
+    arrange = Arrange.new(0.4, 1, 0, 5)
+    arrange.pop_many(arrange.get_index_array()[::4])
+    arrange.set_params(position=[0.3, -0.2], rotation=20)
+    sites = arrange.get_index_array()
+    selected = {tuple(site) for site in sites.tolist() if expected(region, *arrange.get_coord(*site))}
+    assert set(map(tuple, arrange.select(region).tolist())) == selected
+    lattice = arrange.annulus_sites(arrange.r_in, arrange.r_out, arrange.r_tvel)
+    assert set(map(tuple, arrange.select(region, lattice=True).tolist())) == {
+        tuple(site) for site in lattice.tolist() if expected(region, *arrange.get_coord(*site))}
+
+
+def test_apply_region():
+    # действия над областью выполняются одной записью журнала отмены
+    arrange = Arrange.new(0.4, 1, 0, 5)
+    arrange.pop_many(arrange.get_index_array()[::3])
+    arrange.history = History()
+    region = ('sector', 0, 90)
+    before = dict(arrange.index)
+    sites = arrange.apply_region(region, 'fill', 2)
+    assert sorted(sites) == sorted(map(tuple, arrange.select(region, lattice=True).tolist()))
+    assert all(arrange.get_tvel(*site) == 2 for site in sites)
+    arrange.apply_region(region, 'mark', layer='absorber')
+    assert sorted(map(tuple, arrange.get_layer('absorber').tolist())) == sorted(sites)
+    arrange.apply_region(('beam', 45), 'unmark', layer='absorber')
+    assert all(not expected(('beam', 45), *arrange.get_coord(*site)) for site in arrange.get_layer('absorber').tolist())
+    arrange.apply_region(region, 'retype', 3)
+    assert all(arrange.get_tvel(*site) == 3 for site in sites)
+    arrange.apply_region(region, 'clear')
+    assert all(arrange.get_tvel(*site) is None for site in sites) and arrange.get_layer('absorber').size == 0
+    assert len(arrange.history.undo_stack) == 5
+    for _ in range(5):
+        arrange.history.undo(arrange)
+    assert arrange.index == before
+    with pytest.raises(ValueError):
+        arrange.apply_region(region, 'flip')
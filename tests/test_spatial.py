@@ -0,0 +1,72 @@
+'''Запросы пространственного индекса в сравнении с полным перебором'''
+import numpy as np
+import pytest
+
+from arrange360 import Arrange
+
+
+TRANSFORMS = [((0, 0), 0, False), ((3.5, -1.25), 33, False), ((-2, 4), 250, True)]
+
+
+def make(position, rotation, mirror):
+    # расстановка с пропусками и ТВЭЛ далеко за пределами ячеек вблизи центра
+    arrange = Arrange.new(0.4, 1, 0, 40)
+    sites = arrange.get_index_array()
+    arrange.pop_many(sites[np.random.default_rng(5).random(len(sites)) < 0.3])
+    arrange.add_many([[200, 3], [-150, -90], [7, 400]], 2)
+    arrange.position = list(position)
+    arrange.rotation = rotation
+    arrange.mirror = mirror
+    return arrange
+
+
+def distances(arrange, x=0, y=0):
+    sites = arrange.get_index_array()
+    coords = arrange.get_coords(sites)
+    return sites, np.hypot(coords[:, 0] - x, coords[:, 1] - y)
+
+
+def as_set(sites):
+    return set(map(tuple, np.asarray(sites).tolist()))
+
+
+@pytest.mark.parametrize('position, rotation, mirror', TRANSFORMS)
+def test_sites_in_ring(position, rotation, mirror):
+    arrange = make(position, rotation, mirror)
+    for r1, r2, x, y in ((0, 10, 0, 0), (15.5, 22, 0, 0), (0, 3, 12, -7), (5, 6, -30, 25), (0, 1000, 0, 0), (50, 60, 100, 100)):
+        sites, r = distances(arrange, x, y)
+        assert as_set(arrange.sites_in_ring(r1, r2, x, y)) == as_set(sites[(r >= r1) & (r <= r2)])
+
+
+@pytest.mark.parametrize('position, rotation, mirror', TRANSFORMS)
+def test_nearest(position, rotation, mirror):
+    # расстояния до k ближайших совпадают с перебором (при равных расстояниях позиции могут отличаться)
+    arrange = make(position, rotation, mirror)
+    for x, y, k in ((0, 0, 1), (10.3, -4.1, 5), (-35, 20, 12), (300, 300, 3), (0, 0, 0), (1, 1, 10**6)):
+        _, r = distances(arrange, x, y)
+        found = arrange.nearest(x, y, k)
+        coords = arrange.get_coords(found)
+        assert np.allclose(np.hypot(coords[:, 0] - x, coords[:, 1] - y), np.sort(r)[:k])
+        assert len(as_set(found)) == len(found)
+
+
+@pytest.mark.parametrize('position, rotation, mirror', TRANSFORMS)
+def test_max_radius(position, rotation, mirror):
+    # кэш наибольшего радиуса обновляется при добавлении, удалении крайнего ТВЭЛ и изменении преобразования
+    arrange = make(position, rotation, mirror)
+    assert arrange.max_radius() == distances(arrange)[1].max()
+    arrange.add(0, 900, 3)
+    assert arrange.max_radius() == distances(arrange)[1].max()
+    for _ in range(3):
+        sites, r = distances(arrange)
+        arrange.pop(*sites[r.argmax()].tolist())
+        assert arrange.max_radius() == distances(arrange)[1].max()
+    arrange.set_params(position=[50, 0], rotation=arrange.rotation + 90)
+    assert arrange.max_radius() == distances(arrange)[1].max()
+
+
+def test_empty():
+    arrange = Arrange(0.4, 1, 0, 5)
+    assert arrange.max_radius() == 0
+    assert arrange.nearest(0, 0, 3).shape == (0, 2)
+    assert arrange.sites_in_ring(0, 10).shape == (0, 2)